@@ -139,6 +139,11 @@ def main(page: ft.Page):
                     # Alternative message type from server
                     page.run_thread(lambda d=data: add_feed_to_ui(d["data"], True))
                 
+                elif message_type == "feeds_added":
+                    # Bulk import: one event for every feed it added
+                    for feed in data["data"]["feeds"]:
+                        page.run_thread(lambda f=feed: add_feed_to_ui(f, True))
+                
                 elif message_type == "keyword_added_success":
                     # Alternative message type from server
                     page.run_thread(lambda d=data: add_keyword_to_ui(d["data"], True))
@@ -230,15 +235,8 @@ def main(page: ft.Page):
         page.open(dialog)
         
     def add_new_entries_to_ui(entries: list):
-        for row in entries:
-            entry = {
-                "feed_url": row[0],
-                "title": row[1],
-                "published_parsed_tz": row[2],
-                "published": row[3],
-                "summary": row[4],
-                "link": row[5],
-            }
+        # Same shape as the entries returned by get_entries
+        for entry in entries:
             add_new_entry_to_ui(entry)
         results_table_ui.update()
         state.last_refresh_time = time.time()
@@ -0,0 +1,212 @@
+"""
+Benchmark entry normalization on the seed.txt corpus.
+
+Compares the legacy path, where save_entry and entry_to_dict each walked the
+feedparser entry, re-parsed `published` and encoded the detail fields, with
+a single normalize_entry() pass whose record feeds both the INSERT and the
+broadcast payload.
+
+    python bench_records.py [rounds]
+"""
+import json
+import sqlite3
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import mktime
+
+from feedparser import FeedParserDict
+
+from records import DETAIL_COLUMNS, ENTRY_COLUMNS, normalize_entry
+from seeding import SEED_FILE
+
+DETAIL_FIELDS = ("title_detail", "links", "authors", "author_detail", "summary_detail", "content")
+
+
+def load_corpus(seed_file: str = SEED_FILE):
+    """Rebuild feedparser-like entries from the rows stored in seed.txt"""
+    conn = sqlite3.connect(":memory:")
+    with open(seed_file, "r") as f:
+        conn.executescript(f.read())
+    conn.row_factory = sqlite3.Row
+    corpus = []
+    for row in conn.execute("SELECT * FROM entries"):
+        entry = FeedParserDict(
+            id=row["id"], title=row["title"], link=row["link"], author=row["author"],
+            published=row["published"], summary=row["summary"], guidislink=bool(row["guidislink"]),
+        )
+        for field in DETAIL_FIELDS:
+            if row[field]:
+                entry[field] = json.loads(row[field])
+        if row["tags"]:
+            entry["tags"] = [FeedParserDict(term=term) for term in json.loads(row["tags"])]
+        if row["published_parsed"]:
+            entry["published_parsed"] = time.strptime(row["published_parsed"], "%Y-%m-%dT%H:%M:%S")
+        corpus.append((row["feed_url"], entry))
+    conn.close()
+    return corpus
+
+
+def legacy_entry_to_dict(entry, feed_url):
+    def attr(e, name, default=""):
+        try:
+            return e.get(name, default) if isinstance(e, dict) else getattr(e, name, default)
+        except Exception:
+            return default
+
+    published_parsed_tz_iso = None
+    if attr(entry, "published", ""):
+        try:
+            dt = parsedate_to_datetime(attr(entry, "published"))
+            published_parsed_tz_iso = dt.astimezone(timezone.utc).isoformat()
+        except Exception:
+            pass
+
+    return {
+        "id": attr(entry, "id") or attr(entry, "guid") or attr(entry, "link", ""),
+        "feed_url": feed_url,
+        "title": attr(entry, "title", ""),
+        "link": attr(entry, "link", ""),
+        "published": attr(entry, "published", ""),
+        "published_parsed_tz": published_parsed_tz_iso,
+        "summary": attr(entry, "summary", ""),
+    }
+
+
+def legacy_save_entry(conn, feed_url, entry):
+    def attr(e, name, default=""):
+        try:
+            return e.get(name, default) if isinstance(e, dict) else getattr(e, name, default)
+        except Exception:
+            return default
+
+    def to_json(attr_name):
+        try:
+            val = attr(entry, attr_name)
+            return json.dumps(val) if val else None
+        except Exception:
+            return None
+
+    published_parsed_tz_iso = None
+    if attr(entry, "published", ""):
+        try:
+            dt = parsedate_to_datetime(attr(entry, "published"))
+            published_parsed_tz_iso = dt.astimezone(timezone.utc).isoformat()
+        except Exception:
+            pass
+
+    published_parsed_iso = None
+    if attr(entry, "published_parsed", None):
+        try:
+            published_parsed_iso = datetime.fromtimestamp(mktime(attr(entry, "published_parsed"))).isoformat()
+        except Exception:
+            pass
+
+    tags_json = None
+    try:
+        tags_json = json.dumps([t.term for t in entry.tags]) if hasattr(entry, "tags") else None
+    except Exception:
+        pass
+
+    conn.execute(LEGACY_INSERT_SQL, (
+        attr(entry, "id", None) or attr(entry, "guid", None) or attr(entry, "link", ""),
+        feed_url,
+        attr(entry, "title", ""),
+        to_json("title_detail"),
+        attr(entry, "link", ""),
+        to_json("links"),
+        to_json("authors"),
+        attr(entry, "author", ""),
+        to_json("author_detail"),
+        attr(entry, "published", ""),
+        published_parsed_iso,
+        published_parsed_tz_iso,
+        tags_json,
+        int(attr(entry, "guidislink", False)),
+        attr(entry, "summary", ""),
+        to_json("summary_detail"),
+        to_json("content"),
+        datetime.now(timezone.utc).isoformat(),
+    ))
+
+
+# Single wide entries table used before the hot/cold split
+LEGACY_COLUMNS = (
+    "id", "feed_url", "title", "title_detail", "link", "links", "authors", "author", "author_detail",
+    "published", "published_parsed", "published_parsed_tz", "tags", "guidislink", "summary",
+    "summary_detail", "content", "fetched_at",
+)
+
+
+def insert_sql(table, columns):
+    return f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+LEGACY_INSERT_SQL = insert_sql("legacy_entries", LEGACY_COLUMNS)
+INSERT_SQL = insert_sql("entries", ENTRY_COLUMNS)
+INSERT_DETAIL_SQL = insert_sql("entry_details", DETAIL_COLUMNS)
+
+
+def fresh_db():
+    conn = sqlite3.connect(":memory:")
+    for table, columns in (("legacy_entries", LEGACY_COLUMNS), ("entries", ENTRY_COLUMNS), ("entry_details", DETAIL_COLUMNS)):
+        conn.execute(f"CREATE TABLE {table} ({', '.join(columns)}, PRIMARY KEY (id))")
+    return conn
+
+
+def legacy_step(conn, feed_url, entry, fetched_at):
+    legacy_save_entry(conn, feed_url, entry)
+    return legacy_entry_to_dict(entry, feed_url)
+
+
+def records_step(conn, feed_url, entry, fetched_at):
+    record = normalize_entry(entry, feed_url, fetched_at)
+    conn.execute(INSERT_SQL, record.row())
+    conn.execute(INSERT_DETAIL_SQL, record.detail_row())
+    return record.to_dict()
+
+
+def run(step, corpus):
+    conn = fresh_db()
+    fetched_at = datetime.now(timezone.utc).isoformat()
+    payload = [step(conn, feed_url, entry, fetched_at) for feed_url, entry in corpus]
+    conn.close()
+    return payload
+
+
+def measure(step, corpus, rounds):
+    run(step, corpus)  # Warm up
+    started = time.perf_counter()
+    for _ in range(rounds):
+        run(step, corpus)
+    per_entry_us = (time.perf_counter() - started) / (rounds * len(corpus)) * 1e6
+
+    # Peak traced memory while handling one entry, averaged over the corpus
+    conn = fresh_db()
+    fetched_at = datetime.now(timezone.utc).isoformat()
+    tracemalloc.start()
+    peak_total = 0
+    for feed_url, entry in corpus:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        step(conn, feed_url, entry, fetched_at)
+        peak_total += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    conn.close()
+    return per_entry_us, peak_total / len(corpus)
+
+
+def bench(rounds: int = 20):
+    corpus = load_corpus()
+    assert run(legacy_step, corpus) == run(records_step, corpus), "legacy and record payloads differ"
+    print(f"{len(corpus)} entries from {SEED_FILE}, {rounds} rounds")
+    print(f"{'':<10} {'time/entry':>12} {'peak alloc/entry':>18}")
+    for name, step in (("legacy", legacy_step), ("records", records_step)):
+        per_entry_us, peak_per_entry = measure(step, corpus, rounds)
+        print(f"{name:<10} {per_entry_us:9.1f} us {peak_per_entry:15.0f} B")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
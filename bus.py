@@ -0,0 +1,397 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+import traceback
+
+# Identifies this worker process on the shared bus and in leader leases
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Event:
+    """A broadcast message, JSON-encoded once and shared by every subscriber"""
+    __slots__ = ("id", "type", "feed_url", "text", "sse_frame")
+
+    def __init__(self, id: int, type: str, text: str, feed_url: str = None):
+        self.id = id
+        self.type = type
+        self.feed_url = feed_url
+        self.text = text
+        self.sse_frame = None
+
+    def sse(self):
+        """Server-Sent Events frame for this event, built once for all listeners"""
+        if self.sse_frame is None:
+            self.sse_frame = f"id: {self.id}\nevent: {self.type}\ndata: {self.text}\n\n"
+        return self.sse_frame
+
+
+class LocalBus:
+    """In-process bus, used when the service runs as a single worker"""
+
+    def __init__(self):
+        self.subscribers = []
+        self.last_id = 0
+        self.dispatch_lock = asyncio.Lock()  # Subscribers see events one at a time, in id order
+        self.dispatching = None  # Task holding dispatch_lock
+
+    def subscribe(self, handler):
+        """Register an async handler called with every Event"""
+        self.subscribers.append(handler)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, message: dict):
+        if self.dispatching is asyncio.current_task():
+            # Published by a subscriber: waiting for the lock would deadlock
+            return await self.dispatch_next(message)
+        async with self.dispatch_lock:
+            self.dispatching = asyncio.current_task()
+            try:
+                await self.dispatch_next(message)
+            finally:
+                self.dispatching = None
+
+    async def dispatch_next(self, message: dict):
+        self.last_id += 1
+        await self.dispatch(Event(self.last_id, message.get("type"), json.dumps(message), message.get("feed_url")))
+
+    async def dispatch(self, event: Event):
+        for handler in self.subscribers:
+            try:
+                await handler(event)
+            except Exception as e:
+                print(f"Bus subscriber error: {e}")
+                traceback.print_exc()
+
+
+class SQLiteBus(LocalBus):
+    """Bus backed by an append-only SQLite event log shared by all workers.
+
+    Every worker appends the events it publishes and polls the log, delivering
+    all events, its own included, strictly in log order so SSE ids only grow
+    and Last-Event-ID resumes miss nothing. publish() returns once the poller
+    has delivered the event. Old rows are pruned after `retention` seconds.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.05, retention: float = 300.0):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.conn = None
+        self.lock = asyncio.Lock()
+        self.poll_task = None
+        self.wake = asyncio.Event()  # Set by publish() so the poller doesn't wait out poll_interval
+        self.waiting = {}  # event id -> Future resolved once the poller has delivered it
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS bus_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                origin TEXT,
+                type TEXT,
+                feed_url TEXT,
+                payload TEXT,
+                created_at REAL
+            )
+        """)
+        conn.commit()
+        return conn
+
+    async def start(self):
+        self.conn = await asyncio.to_thread(self._connect)
+        row = self.conn.execute("SELECT MAX(id) FROM bus_events").fetchone()
+        self.last_id = row[0] or 0
+        self.poll_task = asyncio.create_task(self.poll_loop())
+        print(f"Broadcast bus started on {self.path} as {WORKER_ID}")
+
+    async def stop(self):
+        if self.poll_task:
+            self.poll_task.cancel()
+            self.poll_task = None
+        for future in self.waiting.values():
+            if not future.done():
+                future.set_result(None)
+        self.waiting.clear()
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    def _append(self, type: str, feed_url: str, text: str):
+        cursor = self.conn.execute(
+            "INSERT INTO bus_events (origin, type, feed_url, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (WORKER_ID, type, feed_url, text, time.time())
+        )
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def _read_since(self, last_id: int):
+        return self.conn.execute(
+            "SELECT id, origin, type, feed_url, payload FROM bus_events WHERE id > ? ORDER BY id",
+            (last_id,)
+        ).fetchall()
+
+    def _prune(self):
+        self.conn.execute("DELETE FROM bus_events WHERE created_at < ?", (time.time() - self.retention,))
+        self.conn.commit()
+
+    async def publish(self, message: dict):
+        text = json.dumps(message)
+        type = message.get("type")
+        feed_url = message.get("feed_url")
+        async with self.lock:
+            event_id = await asyncio.to_thread(self._append, type, feed_url, text)
+            delivered = self.waiting[event_id] = asyncio.get_running_loop().create_future()
+        # Delivered by the poller, after any other worker's events that came before it in the log
+        self.wake.set()
+        if asyncio.current_task() is not self.poll_task:  # A subscriber publishing can't wait for itself
+            await delivered
+
+    async def poll_loop(self):
+        last_prune = time.time()
+        while True:
+            try:
+                async with self.lock:
+                    rows = await asyncio.to_thread(self._read_since, self.last_id)
+                for event_id, origin, type, feed_url, payload in rows:
+                    self.last_id = event_id
+                    await self.dispatch(Event(event_id, type, payload, feed_url))
+                    delivered = self.waiting.pop(event_id, None)
+                    if delivered is not None and not delivered.done():
+                        delivered.set_result(None)
+                if time.time() - last_prune > 30:
+                    async with self.lock:
+                        await asyncio.to_thread(self._prune)
+                    last_prune = time.time()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Bus poll error: {e}")
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+
+
+class LocalLease:
+    """Leader lease for a single worker, which is always the leader"""
+
+    def __init__(self):
+        self.is_leader = True
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class SQLiteLease:
+    """Time-bound leader lease stored in SQLite.
+
+    Exactly one worker holds the lease at a time. The holder renews it every
+    ttl/3 seconds; if it dies, another worker takes over once it expires.
+    """
+
+    def __init__(self, path: str, name: str, ttl: float = 30.0):
+        self.path = path
+        self.name = name
+        self.ttl = ttl
+        self.is_leader = False
+        self.task = None
+
+    def _try_acquire(self):
+        now = time.time()
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT,
+                    expires_at REAL
+                )
+            """)
+            conn.execute("""
+                INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+            """, (self.name, WORKER_ID, now + self.ttl, now))
+            conn.commit()
+            row = conn.execute("SELECT holder FROM leases WHERE name = ?", (self.name,)).fetchone()
+            return bool(row) and row[0] == WORKER_ID
+        finally:
+            conn.close()
+
+    def _release(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, WORKER_ID))
+            conn.commit()
+        finally:
+            conn.close()
+
+    async def start(self):
+        self.task = asyncio.create_task(self.renew_loop())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        if self.is_leader:
+            self.is_leader = False
+            await asyncio.to_thread(self._release)
+
+    async def renew_loop(self):
+        while True:
+            try:
+                leader = await asyncio.to_thread(self._try_acquire)
+                if leader != self.is_leader:
+                    print(f"Lease '{self.name}' {'acquired' if leader else 'lost'} by {WORKER_ID}")
+                self.is_leader = leader
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Lease renew error: {e}")
+                self.is_leader = False
+            await asyncio.sleep(self.ttl / 3)
+
+
+class LocalRunLock:
+    """Run lock for a single worker, where nothing else can hold it"""
+
+    def __init__(self):
+        self.last_id = 0
+
+    async def acquire(self):
+        self.last_id += 1
+        return True, self.last_id
+
+    async def release(self, run_id: int):
+        pass
+
+    async def running(self, run_id: int):
+        return False
+
+
+class SQLiteRunLock:
+    """Cross-worker lock for work only one worker may do at a time, like a refresh.
+
+    acquire() either takes the lock with a new run id, numbered across all
+    workers, or returns the id of the run holding it. The holder renews the
+    lock every ttl/3 seconds until release(); if it dies, the lock frees up
+    once it expires.
+    """
+
+    def __init__(self, path: str, name: str, ttl: float = 30.0):
+        self.path = path
+        self.name = name
+        self.ttl = ttl
+        self.task = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS run_locks (
+                name TEXT PRIMARY KEY,
+                holder TEXT,
+                run_id INTEGER,
+                expires_at REAL
+            )
+        """)
+        return conn
+
+    def _try_acquire(self):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT holder, run_id, expires_at FROM run_locks WHERE name = ?", (self.name,)).fetchone()
+            if row and row[0] and row[2] >= now:
+                conn.execute("COMMIT")
+                return False, row[1]
+            run_id = (row[1] if row else 0) + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO run_locks (name, holder, run_id, expires_at) VALUES (?, ?, ?, ?)",
+                (self.name, WORKER_ID, run_id, now + self.ttl)
+            )
+            conn.execute("COMMIT")
+            return True, run_id
+        finally:
+            conn.close()
+
+    def _update(self, sql: str, run_id: int, *params):
+        conn = self._connect()
+        try:
+            conn.execute(sql, params + (self.name, WORKER_ID, run_id))
+        finally:
+            conn.close()
+
+    def _running(self, run_id: int):
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT 1 FROM run_locks WHERE name = ? AND run_id = ? AND holder IS NOT NULL AND expires_at >= ?",
+                (self.name, run_id, time.time())
+            ).fetchone() is not None
+        finally:
+            conn.close()
+
+    async def acquire(self):
+        """(True, new run id) if this worker now holds the lock, else (False, id of the run holding it)"""
+        acquired, run_id = await asyncio.to_thread(self._try_acquire)
+        if acquired:
+            self.task = asyncio.create_task(self.renew_loop(run_id))
+        return acquired, run_id
+
+    async def release(self, run_id: int):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        await asyncio.to_thread(
+            self._update, "UPDATE run_locks SET holder = NULL WHERE name = ? AND holder = ? AND run_id = ?", run_id
+        )
+
+    async def running(self, run_id: int):
+        """Whether run_id still holds the lock, on any worker"""
+        return await asyncio.to_thread(self._running, run_id)
+
+    async def renew_loop(self, run_id: int):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                await asyncio.to_thread(
+                    self._update, "UPDATE run_locks SET expires_at = ? WHERE name = ? AND holder = ? AND run_id = ?",
+                    run_id, time.time() + self.ttl
+                )
+            except Exception as e:
+                print(f"Run lock renew error: {e}")
+
+
+def create_bus(backend: str, path: str):
+    if backend == "sqlite":
+        return SQLiteBus(path)
+    if backend != "local":
+        print(f"Unknown broadcast backend '{backend}', using local")
+    return LocalBus()
+
+
+def create_lease(backend: str, path: str, name: str, ttl: float = 30.0):
+    if backend == "sqlite":
+        return SQLiteLease(path, name, ttl)
+    return LocalLease()
+
+
+def create_run_lock(backend: str, path: str, name: str, ttl: float = 30.0):
+    if backend == "sqlite":
+        return SQLiteRunLock(path, name, ttl)
+    return LocalRunLock()
@@ -0,0 +1,328 @@
+"""
+Optional column compression for the large entry text fields.
+
+`summary`, `summary_detail` and `content` are mostly repetitive HTML and
+JSON. When COLUMN_COMPRESSION is on, values above MIN_SIZE are stored as raw
+deflate BLOBs, primed with a dictionary trained on the database's own
+entries. Stored values carry a one byte header:
+
+    0x01  deflate, no dictionary
+    0x02  deflate with the dictionary stored in meta.compression_dictionary
+
+Plain TEXT values are left as they are, so compressed and uncompressed rows
+can coexist and reads never depend on the setting. Values are decoded by
+the read paths that return them; list queries that don't select a column
+never pay for it.
+
+Compress or restore existing rows and measure the effect with:
+    python compression.py compress [db]
+    python compression.py decompress [db]
+    python compression.py report [db]
+These cover every partition and shard of the layout set by STORAGE_MODE,
+STORAGE_SHARDS and SHARD_DIR, as the service uses them.
+"""
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter, defaultdict
+
+from seeding import get_meta, ensure_meta
+from storage import create_storage
+
+# Compressed columns per table
+COMPRESSED_COLUMNS = {
+    "entries": ("summary",),
+    "entry_details": ("summary_detail", "content"),
+}
+MIN_SIZE = 64  # Shorter values stay plain text; deflate can't win much on them
+DICTIONARY_SIZE = 32 * 1024  # Largest window deflate can use
+DICTIONARY_SAMPLES = 2000
+PLAIN, WITH_DICTIONARY = b"\x01", b"\x02"
+DEFAULT_DB = "./data/feeds.db"
+
+FRAGMENT_PATTERN = re.compile(r"<[^<>]{1,200}>|\"[\w@$-]{1,40}\": \"?|(?:\w+\W+){3}")
+
+
+def train_dictionary(samples, size: int = DICTIONARY_SIZE):
+    """Build a deflate preset dictionary from recurring fragments in samples.
+
+    Tags, JSON keys and word trigrams are scored by occurrences times length;
+    the best fit in `size` bytes, with the most valuable fragments last since
+    deflate reaches recent bytes with the shortest distances.
+    """
+    counts = Counter()
+    for sample in samples:
+        counts.update(FRAGMENT_PATTERN.findall(sample))
+    scored = sorted(
+        ((count * len(fragment), fragment) for fragment, count in counts.items() if count > 1),
+        reverse=True,
+    )
+    chosen, total = [], 0
+    for _, fragment in scored:
+        encoded = fragment.encode()
+        if total + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        total += len(encoded)
+    return b"".join(reversed(chosen))
+
+
+class ColumnCodec:
+    def __init__(self, enabled: bool = False, dictionary: bytes = None, level: int = 6):
+        self.enabled = enabled
+        self.dictionary = dictionary
+        self.level = level
+        self.positions = {}  # column tuple -> indexes of compressed columns
+
+    def load(self, conn, enabled: bool, storage):
+        """Read the database's dictionary, training and storing one if compression is on and none exists.
+
+        conn is the main database, which keeps the dictionary; samples come from all of storage.
+        """
+        self.enabled = enabled
+        self.dictionary = get_meta(conn, "compression_dictionary")
+        if enabled and self.dictionary is None:
+            dictionary = train_dictionary(sample_values(storage))
+            if dictionary:
+                ensure_meta(conn)
+                # Another worker may have trained one first; keep whichever was stored
+                conn.execute(
+                    "INSERT OR IGNORE INTO meta (name, value) VALUES ('compression_dictionary', ?)", (dictionary,)
+                )
+                conn.commit()
+                self.dictionary = get_meta(conn, "compression_dictionary")
+        return self
+
+    def encode(self, value):
+        if not self.enabled or value is None or len(value) < MIN_SIZE:
+            return value
+        data = value.encode()
+        if self.dictionary:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15, zdict=self.dictionary)
+            encoded = WITH_DICTIONARY + compressor.compress(data) + compressor.flush()
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+            encoded = PLAIN + compressor.compress(data) + compressor.flush()
+        return encoded if len(encoded) < len(data) else value
+
+    def decode(self, value):
+        if not isinstance(value, bytes):
+            return value
+        header, data = value[:1], value[1:]
+        if header == WITH_DICTIONARY:
+            return zlib.decompressobj(-15, zdict=self.dictionary).decompress(data).decode()
+        if header == PLAIN:
+            return zlib.decompressobj(-15).decompress(data).decode()
+        return value.decode()
+
+    def compressed_positions(self, columns):
+        columns = tuple(columns)
+        positions = self.positions.get(columns)
+        if positions is None:
+            names = {name for names in COMPRESSED_COLUMNS.values() for name in names}
+            positions = self.positions[columns] = [i for i, column in enumerate(columns) if column in names]
+        return positions
+
+    def encode_row(self, columns, row):
+        """Stored form of a row given in `columns` order"""
+        positions = self.compressed_positions(columns)
+        if not self.enabled or not positions:
+            return row
+        row = list(row)
+        for i in positions:
+            row[i] = self.encode(row[i])
+        return row
+
+    def decode_row(self, columns, row):
+        """Row with compressed columns decoded, as a dict"""
+        values = dict(zip(columns, row))
+        for i in self.compressed_positions(columns):
+            values[columns[i]] = self.decode(row[i])
+        return values
+
+
+def compressed_tables(storage):
+    """(db_file, table, columns) of every table with compressed columns, newest partitions first"""
+    for db_file in storage.db_files():
+        conn = sqlite3.connect(db_file)
+        try:
+            partitions = storage.partitions(conn, db_file)
+        finally:
+            conn.close()
+        for partition in partitions:
+            yield db_file, partition.entries, COMPRESSED_COLUMNS["entries"]
+            yield db_file, partition.details, COMPRESSED_COLUMNS["entry_details"]
+
+
+def sample_values(storage, limit: int = DICTIONARY_SAMPLES):
+    """Up to limit recent plain values per column, across every partition and shard"""
+    samples = []
+    remaining = {column: limit for columns in COMPRESSED_COLUMNS.values() for column in columns}
+    for db_file, table, columns in compressed_tables(storage):
+        conn = sqlite3.connect(db_file)
+        try:
+            for column in columns:
+                if remaining[column] <= 0:
+                    continue
+                try:
+                    rows = conn.execute(
+                        f"SELECT {column} FROM {table} WHERE typeof({column}) = 'text' AND length({column}) >= ? "
+                        f"ORDER BY rowid DESC LIMIT ?",
+                        (MIN_SIZE, remaining[column]),
+                    ).fetchall()
+                except sqlite3.OperationalError:
+                    continue  # Table not created yet
+                samples.extend(row[0] for row in rows)
+                remaining[column] -= len(rows)
+        finally:
+            conn.close()
+    return samples
+
+
+def recode_existing(storage, codec: ColumnCodec, compress: bool = True, batch_size: int = 500):
+    """One-shot migration: compress (or decompress) every stored value in every partition. Returns rows updated"""
+    source_type = "text" if compress else "blob"
+    tables = defaultdict(list)
+    for db_file, table, columns in compressed_tables(storage):
+        tables[db_file].append((table, columns))
+    updated = 0
+    for db_file, file_tables in tables.items():
+        conn = sqlite3.connect(db_file)
+        try:
+            for table, columns in file_tables:
+                for column in columns:
+                    updated += recode_column(conn, codec, table, column, compress, source_type, batch_size)
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    return updated
+
+
+def recode_column(conn, codec, table, column, compress, source_type, batch_size):
+    updated, last_rowid = 0, 0
+    while True:
+        rows = conn.execute(
+            f"SELECT rowid, {column} FROM {table} WHERE rowid > ? AND typeof({column}) = ? "
+            f"ORDER BY rowid LIMIT ?",
+            (last_rowid, source_type, batch_size),
+        ).fetchall()
+        if not rows:
+            return updated
+        last_rowid = rows[-1][0]
+        changes = []
+        for rowid, value in rows:
+            recoded = codec.encode(value) if compress else codec.decode(value)
+            if recoded is not value:
+                changes.append((recoded, rowid))
+        conn.executemany(f"UPDATE {table} SET {column} = ? WHERE rowid = ?", changes)
+        conn.commit()
+        updated += len(changes)
+
+
+def column_bytes(storage):
+    """Stored bytes per compressed column, summed over every partition"""
+    totals = {f"{table}.{column}": 0 for table, columns in COMPRESSED_COLUMNS.items() for column in columns}
+    for db_file, table, columns in compressed_tables(storage):
+        conn = sqlite3.connect(db_file)
+        try:
+            base = "entries" if columns == COMPRESSED_COLUMNS["entries"] else "entry_details"
+            for column in columns:
+                totals[f"{base}.{column}"] += conn.execute(
+                    f"SELECT coalesce(sum(length(CAST({column} AS BLOB))), 0) FROM {table}"
+                ).fetchone()[0]
+        finally:
+            conn.close()
+    return totals
+
+
+def file_bytes(storage):
+    total = 0
+    for db_file in dict.fromkeys([storage.db_file] + storage.db_files()):
+        conn = sqlite3.connect(db_file)
+        try:
+            total += conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+        finally:
+            conn.close()
+    return total
+
+
+def open_storage(db_file: str, codec=None):
+    """The entry storage of db_file, laid out as STORAGE_MODE / STORAGE_SHARDS / SHARD_DIR configure the service"""
+    return create_storage(
+        os.getenv("STORAGE_MODE", "single"), db_file, codec, os.getenv("SHARD_DIR"), int(os.getenv("STORAGE_SHARDS", 4))
+    )
+
+
+def report(db_file: str = DEFAULT_DB):
+    """Compress a copy of the database and print size reduction and decode cost"""
+    storage = open_storage(db_file)
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = os.path.join(tmp, "report.db")
+        shutil.copyfile(db_file, copy)
+        for shard in set(storage.db_files()) - {db_file}:
+            shutil.copyfile(shard, os.path.join(tmp, os.path.basename(shard)))
+        storage = create_storage(storage.mode, copy, None, tmp, getattr(storage, "shard_count", 4))
+        conn = sqlite3.connect(copy)
+        # Start from plain text with no dictionary, whatever state the database is in
+        recode_existing(storage, ColumnCodec().load(conn, False, storage), compress=False)
+        conn.execute("DELETE FROM meta WHERE name = 'compression_dictionary'")
+        conn.commit()
+        before_columns, before_file = column_bytes(storage), file_bytes(storage)
+
+        started = time.perf_counter()
+        codec = ColumnCodec().load(conn, True, storage)
+        train_ms = (time.perf_counter() - started) * 1000
+        conn.close()
+        recode_existing(storage, codec)
+        after_columns, after_file = column_bytes(storage), file_bytes(storage)
+
+        values = []
+        for table_file, table, columns in compressed_tables(storage):
+            table_conn = sqlite3.connect(table_file)
+            try:
+                for column in columns:
+                    values.extend(
+                        row[0] for row in table_conn.execute(f"SELECT {column} FROM {table} WHERE typeof({column}) = 'blob'")
+                    )
+            finally:
+                table_conn.close()
+        started = time.perf_counter()
+        decoded_bytes = sum(len(codec.decode(value)) for value in values)
+        decode_s = time.perf_counter() - started
+
+    print(f"dictionary: {len(codec.dictionary or b'')} bytes, trained in {train_ms:.1f} ms")
+    for name in before_columns:
+        before, after = before_columns[name], after_columns[name]
+        print(f"{name:<30} {before:>10} -> {after:>10} bytes ({ratio(before, after)})")
+    print(f"{'database file':<30} {before_file:>10} -> {after_file:>10} bytes ({ratio(before_file, after_file)})")
+    if values:
+        print(
+            f"decode: {len(values)} values, {decode_s / len(values) * 1e6:.1f} us/value, "
+            f"{decoded_bytes / decode_s / 1e6:.0f} MB/s"
+        )
+
+
+def ratio(before, after):
+    return f"-{(1 - after / before) * 100:.0f}%" if before else "n/a"
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "report"
+    db_file = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DB
+    if command == "report":
+        report(db_file)
+    elif command in ("compress", "decompress"):
+        storage = open_storage(db_file)
+        conn = sqlite3.connect(db_file)
+        codec = ColumnCodec().load(conn, command == "compress", storage)
+        conn.close()
+        updated = recode_existing(storage, codec, compress=command == "compress")
+        print(f"{command}ed {updated} values in {', '.join(dict.fromkeys([db_file] + storage.db_files()))}")
+    else:
+        print(f"Unknown command '{command}', expected compress, decompress or report")
+        sys.exit(1)
@@ -0,0 +1,141 @@
+"""
+In-memory copy of the feeds, keywords and settings tables.
+
+Loaded once at startup, then kept current without reading the database:
+every mutation bumps meta.config_version in the same transaction, applies
+itself to the local store (write-through) and is broadcast with its
+version. Other workers apply broadcast changes in version order; a change
+that skips a version means one was missed, and the store reloads from the
+database instead. Changes arriving during a reload are replayed on top of
+the fresh snapshot.
+"""
+import asyncio
+
+from seeding import get_meta, set_meta
+
+# Bus event types that change the config
+CONFIG_EVENTS = (
+    "feed_added", "feeds_added", "feed_deleted", "feeds_deleted", "feed_retention_updated",
+    "keyword_added", "keywords_added", "keyword_deleted", "keywords_deleted", "setting_updated",
+)
+
+
+def bump_version(conn):
+    """Increment meta.config_version inside the caller's transaction and return it"""
+    version = int(get_meta(conn, "config_version") or 0) + 1
+    set_meta(conn, "config_version", str(version))
+    return version
+
+
+def read_snapshot(conn):
+    """(version, feeds, keywords, settings) read in one transaction"""
+    conn.execute("BEGIN")
+    try:
+        version = int(get_meta(conn, "config_version") or 0)
+        feeds = {
+            url: {"id": id, "url": url, "max_age_days": max_age_days, "max_entries": max_entries}
+            for id, url, max_age_days, max_entries in conn.execute(
+                "SELECT id, url, max_age_days, max_entries FROM feeds ORDER BY id"
+            )
+        }
+        keywords = dict(conn.execute("SELECT word, type FROM keywords ORDER BY rowid").fetchall())
+        settings = dict(conn.execute("SELECT name, value FROM settings").fetchall())
+    finally:
+        conn.execute("COMMIT")
+    return version, feeds, keywords, settings
+
+
+class ConfigStore:
+    def __init__(self):
+        self.version = 0
+        self.feeds = {}  # url -> {"id", "url", "max_age_days", "max_entries"}, in id order
+        self.keywords = {}  # word -> "whitelist" or "blacklist"
+        self.settings = {}
+        self.loaded = False
+        self.pending = None  # Changes received while a reload is reading the database
+        self.lock = asyncio.Lock()
+
+    def load(self, version, feeds, keywords, settings):
+        self.version = version
+        self.feeds = feeds
+        self.keywords = keywords
+        self.settings = settings
+        self.loaded = True
+
+    async def reload(self, read):
+        """Load a snapshot from read() in a thread, then replay changes received meanwhile"""
+        async with self.lock:
+            self.pending = []
+            try:
+                while True:
+                    self.load(*await asyncio.to_thread(read))
+                    pending, self.pending = sorted(self.pending, key=lambda change: change[2]), []
+                    if all(self.replay(*change) for change in pending):
+                        break
+                    # A change newer than the snapshot is still missing its predecessor; read again
+            finally:
+                self.pending = None
+
+    async def receive(self, type: str, data: dict, version: int, read):
+        """Apply a committed change in version order, reloading if one was missed"""
+        if self.pending is not None:
+            self.pending.append((type, data, version))
+            async with self.lock:
+                pass  # Return once the reload has replayed it
+        elif not self.replay(type, data, version):
+            await self.reload(read)
+
+    def replay(self, type: str, data: dict, version: int):
+        """Apply the change if it is the next version; False if versions are missing before it"""
+        if version <= self.version:
+            return True  # Already applied, e.g. our own write-through
+        if version > self.version + 1:
+            return False
+        self.apply(type, data)
+        self.version = version
+        return True
+
+    def apply(self, type: str, data: dict):
+        if type == "feed_added":
+            self.add_feed(data)
+        elif type == "feeds_added":
+            for feed in data["feeds"]:
+                self.add_feed(feed)
+        elif type == "feed_deleted":
+            self.feeds.pop(data["url"], None)
+        elif type == "feeds_deleted":
+            for feed in data["feeds"]:
+                self.feeds.pop(feed["url"], None)
+        elif type == "feed_retention_updated":
+            if data["url"] in self.feeds:
+                self.feeds[data["url"]].update(max_age_days=data["max_age_days"], max_entries=data["max_entries"])
+        elif type == "keyword_added":
+            self.keywords[data["word"]] = data["type"]
+        elif type == "keywords_added":
+            for keyword in data["keywords"]:
+                self.keywords[keyword["word"]] = keyword["type"]
+        elif type == "keyword_deleted":
+            self.keywords.pop(data["word"], None)
+        elif type == "keywords_deleted":
+            for keyword in data["keywords"]:
+                self.keywords.pop(keyword["word"], None)
+        elif type == "setting_updated":
+            self.settings[data["name"]] = data["value"]
+
+    def add_feed(self, feed: dict):
+        self.feeds[feed["url"]] = {"id": feed.get("id"), "url": feed["url"], "max_age_days": None, "max_entries": None}
+
+    def has_feed(self, url: str):
+        return url in self.feeds
+
+    def has_keyword(self, word: str):
+        return word in self.keywords
+
+    def status(self):
+        return {
+            "version": self.version,
+            "loaded": self.loaded,
+            "feeds": len(self.feeds),
+            "keywords": len(self.keywords),
+            "settings": len(self.settings),
+        }
@@ -0,0 +1,159 @@
+import asyncio
+import time
+import traceback
+from collections import deque
+
+
+class RateLimited(Exception):
+    """Raised when a fetch trigger exceeds the per-client or global rate limit"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FetchRun:
+    """One refresh cycle; every trigger that joins it awaits the same future"""
+
+    def __init__(self):
+        self.id = None  # Assigned by the run lock when the run starts
+        self.local = False  # False when the refresh runs on another worker and this mirrors it
+        self.future = asyncio.get_running_loop().create_future()
+        self.started = asyncio.Event()
+        self.started_at = None
+        # Avoid "exception was never retrieved" when nobody awaits the run
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
+class FetchCoordinator:
+    """Single-flight coordinator for feed refreshes.
+
+    At most one refresh runs at a time, across workers: a run starts by
+    taking the run lock, and if another worker holds it the run mirrors that
+    worker's refresh instead, resolving with the result of its fetch_complete
+    broadcast (see completed_elsewhere). A trigger arriving shortly after a
+    refresh started joins it; later triggers share one queued follow-up run
+    that starts as soon as the current one finishes. Triggers from clients
+    are rate limited per client and globally (per worker); scheduler
+    triggers are not.
+    """
+
+    def __init__(self, run_fetch, lock, join_window: float = 5.0, client_interval: float = 10.0,
+                 global_max_triggers: int = 6, global_period: float = 60.0, lost_check_interval: float = 10.0):
+        self.run_fetch = run_fetch  # async callable(fetch_id) -> result dict
+        self.lock = lock  # Run lock shared by the workers, see bus.create_run_lock
+        self.lost_check_interval = lost_check_interval  # How often a mirrored run checks its worker still holds the lock
+        self.join_window = join_window
+        self.client_interval = client_interval
+        self.global_max_triggers = global_max_triggers
+        self.global_period = global_period
+        self.current = None
+        self.follow_up = None
+        self.last_completed = None  # Latest fetch_complete broadcast seen
+        self.client_triggers = {}
+        self.global_triggers = deque()
+
+    @property
+    def running(self):
+        return self.current is not None
+
+    async def trigger(self, client_id: str = None):
+        """Start, join or queue a refresh. Returns (status, FetchRun); queued runs get their id once they start"""
+        now = time.monotonic()
+        if client_id is not None:
+            self._check_client_rate(client_id, now)
+
+        if self.current is None:
+            self._check_global_rate(client_id, now)
+            self._record_client(client_id, now)
+            run = self._start(FetchRun())
+            await run.started.wait()
+            return ("started" if run.local else "joined"), run
+        if now - self.current.started_at <= self.join_window:
+            self._record_client(client_id, now)
+            await self.current.started.wait()
+            return "joined", self.current
+        if self.follow_up is None:
+            self._check_global_rate(client_id, now)
+            self.follow_up = FetchRun()
+        self._record_client(client_id, now)
+        return "queued", self.follow_up
+
+    def completed_elsewhere(self, result: dict):
+        """Resolve the mirrored run a fetch_complete broadcast from another worker reports on"""
+        self.last_completed = result  # In case it beat the mirror to learning its run id
+        run = self.current
+        if run is not None and not run.local and run.id == result.get("fetch_id") and not run.future.done():
+            run.future.set_result(result)
+
+    def _check_client_rate(self, client_id, now):
+        last = self.client_triggers.get(client_id)
+        if last is not None and now - last < self.client_interval:
+            raise RateLimited("Fetch triggered too often, try again later",
+                              self.client_interval - (now - last))
+
+    def _record_client(self, client_id, now):
+        # Only once the trigger passed every check, so a rejected one doesn't use up the client's window
+        if client_id is None:
+            return
+        self.client_triggers[client_id] = now
+        if len(self.client_triggers) > 1000:
+            self.client_triggers = {
+                client: ts for client, ts in self.client_triggers.items()
+                if now - ts < self.client_interval
+            }
+
+    def _check_global_rate(self, client_id, now):
+        if client_id is None:
+            return
+        while self.global_triggers and now - self.global_triggers[0] > self.global_period:
+            self.global_triggers.popleft()
+        if len(self.global_triggers) >= self.global_max_triggers:
+            raise RateLimited("Too many fetches triggered, try again later",
+                              self.global_period - (now - self.global_triggers[0]))
+        self.global_triggers.append(now)
+
+    def _start(self, run: FetchRun):
+        # Current before the lock is taken, so triggers arriving meanwhile join instead of starting another
+        run.started_at = time.monotonic()
+        self.current = run
+        asyncio.create_task(self._run(run))
+        return run
+
+    async def _run(self, run: FetchRun):
+        try:
+            try:
+                run.local, run.id = await self.lock.acquire()
+            finally:
+                run.started.set()
+            if run.local:
+                try:
+                    run.future.set_result(await self.run_fetch(run.id))
+                finally:
+                    await self.lock.release(run.id)
+            else:
+                await self._follow(run)
+        except Exception as e:
+            print(f"Fetch {run.id} failed: {e}")
+            traceback.print_exc()
+            if not run.future.done():
+                run.future.set_exception(e)
+        finally:
+            self.current = None
+            if self.follow_up is not None:
+                follow_up, self.follow_up = self.follow_up, None
+                self._start(follow_up)
+
+    async def _follow(self, run: FetchRun):
+        """Wait for another worker's refresh to broadcast its result, giving up if that worker lost the lock"""
+        missed = 0
+        if self.last_completed and self.last_completed.get("fetch_id") == run.id:
+            run.future.set_result(self.last_completed)
+        while not run.future.done():
+            await asyncio.wait([run.future], timeout=self.lost_check_interval)
+            if run.future.done():
+                return
+            # Give the broadcast a check's grace to arrive after the lock was released
+            missed = 0 if await self.lock.running(run.id) else missed + 1
+            if missed >= 2:
+                raise RuntimeError(f"Refresh {run.id} on another worker ended without a result")
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import aiohttp
+import feedparser
+
+USER_AGENT = f"RSSFeedService {feedparser.USER_AGENT}"
+
+
+class FeedResult:
+    """Outcome of downloading and parsing one feed, with per-stage timings in seconds"""
+    __slots__ = ("url", "parsed", "error", "download_time", "parse_time")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.parsed = None
+        self.error = None
+        self.download_time = 0.0
+        self.parse_time = 0.0
+
+    @property
+    def entries(self):
+        return self.parsed.entries if self.parsed is not None else []
+
+
+def create_session(timeout: float = 30.0):
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        headers={"User-Agent": USER_AGENT},
+    )
+
+
+async def download(session: aiohttp.ClientSession, url: str):
+    """Download a feed without blocking the event loop. Returns (body, headers)"""
+    async with session.get(url) as response:
+        response.raise_for_status()
+        body = await response.read()
+        return body, {key.lower(): value for key, value in response.headers.items()}
+
+
+def parse(body: bytes, headers: dict):
+    # Headers let feedparser pick the right character encoding
+    return feedparser.parse(body, response_headers=headers)
+
+
+async def fetch_feed(session: aiohttp.ClientSession, url: str) -> FeedResult:
+    """Download with aiohttp, then parse in a worker thread. Errors are reported, not raised"""
+    result = FeedResult(url)
+    try:
+        started = time.perf_counter()
+        body, headers = await download(session, url)
+        downloaded = time.perf_counter()
+        result.download_time = downloaded - started
+        result.parsed = await asyncio.to_thread(parse, body, headers)
+        result.parse_time = time.perf_counter() - downloaded
+    except Exception as e:
+        result.error = str(e) or type(e).__name__
+    return result
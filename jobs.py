@@ -0,0 +1,123 @@
+"""
+Background jobs for requests too slow to answer inline, like adding a feed.
+
+An endpoint creates a job, starts it and answers 202 with its id right
+away. The job reports every state change to `on_update`, which the service
+broadcasts as a job_updated event; every worker records those, so
+/jobs/{id} answers on any worker. Finished jobs are kept up to `keep`,
+oldest dropped first.
+"""
+import asyncio
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+
+PENDING, RUNNING, SUCCEEDED, FAILED = "pending", "running", "succeeded", "failed"
+
+
+class JobError(Exception):
+    """A job failure whose message is meant for the client"""
+
+
+class Job:
+    def __init__(self, kind: str, key: str = None, id: str = None):
+        self.id = id or uuid.uuid4().hex
+        self.kind = kind
+        self.key = key  # What the job works on, e.g. the feed URL
+        self.status = PENDING
+        self.progress = None  # Job-specific, e.g. {"done": 3, "total": 10}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.task = None  # Only set on the worker running the job
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "key": self.key,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        job = cls(data["kind"], data.get("key"), data["id"])
+        for name in ("status", "progress", "result", "error", "created_at", "finished_at"):
+            setattr(job, name, data.get(name))
+        return job
+
+
+class JobRegistry:
+    def __init__(self, on_update=None, keep: int = 500):
+        self.on_update = on_update  # async callback(job) on every state change
+        self.keep = keep
+        self.jobs = OrderedDict()
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def active(self, kind: str, key: str):
+        """The unfinished job of this kind for key running on this worker, if any"""
+        for job in reversed(self.jobs.values()):
+            if job.kind == kind and job.key == key and job.task is not None and not job.done:
+                return job
+        return None
+
+    def record(self, data: dict):
+        """Mirror a job reported by another worker"""
+        job = self.jobs.get(data["id"])
+        if job is not None and job.task is not None:
+            return  # Ours; already current
+        self.add(Job.from_dict(data))
+
+    def add(self, job: Job):
+        self.jobs[job.id] = job
+        self.jobs.move_to_end(job.id)
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.keep)]:
+            del self.jobs[job_id]
+
+    def start(self, kind: str, key: str, run):
+        """Create a job and run `await run(job)` in the background; its return value is the result"""
+        job = Job(kind, key)
+        self.add(job)
+        job.task = asyncio.create_task(self.execute(job, run))
+        return job
+
+    async def execute(self, job: Job, run):
+        job.status = RUNNING
+        await self.notify(job)
+        try:
+            job.result = await run(job)
+            job.status = SUCCEEDED
+        except JobError as e:
+            job.error = str(e)
+            job.status = FAILED
+        except Exception as e:
+            print(f"Job {job.kind} {job.key} failed: {e}")
+            traceback.print_exc()
+            job.error = "Internal error"
+            job.status = FAILED
+        job.finished_at = time.time()
+        self.add(job)  # Apply the history limit now that it is done
+        await self.notify(job)
+        return job
+
+    async def notify(self, job: Job):
+        if self.on_update is None:
+            return
+        try:
+            await self.on_update(job)
+        except Exception as e:
+            print(f"Job update error: {e}")
@@ -0,0 +1,308 @@
+"""
+Load test for the /ws endpoint.
+
+Starts service.app in a subprocess with a stubbed fetch pipeline, connects N
+simulated WebSocket clients sending a mix of get_entries, ping and fetch_feeds,
+and reports:
+    - connection capacity (clients connected / failed, peak concurrent)
+    - new_entries broadcast delivery latency (p50/p99), measured from the moment
+      the stub produced the entries to the moment a client received them
+    - request latency per message type (p50/p99)
+    - server CPU and RSS (from /proc, Linux only)
+
+Usage:
+    python loadtest.py --clients 2000 --duration 60
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import websockets
+
+MESSAGE_MIX = {"get_entries": 0.6, "ping": 0.35, "fetch_feeds": 0.05}
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def fmt_ms(seconds):
+    return "n/a" if seconds is None else f"{seconds * 1000:.1f} ms"
+
+
+# ----- Server side -----
+
+def serve(args):
+    """Run service.app with fetcher.download replaced by a synthetic feed generator"""
+    raise_fd_limit()
+    import uvicorn
+    import fetcher
+    import service
+
+    counter = itertools.count()
+
+    async def stub_download(session, url):
+        await asyncio.sleep(random.uniform(0.01, 0.05))
+        batch = next(counter)
+        produced_at = time.time()
+        items = "".join(
+            f"<item><guid>loadtest-{batch}-{i}-{produced_at:.6f}</guid><title>Load test {batch}/{i}</title>"
+            f"<link>{url}/{batch}/{i}</link><pubDate>Wed, 12 Nov 2025 02:25:08 +0000</pubDate>"
+            f"<description>Synthetic entry</description></item>"
+            for i in range(args.burst_size)
+        )
+        body = f"<?xml version='1.0'?><rss version='2.0'><channel><title>{url}</title>{items}</channel></rss>"
+        return body.encode(), {"content-type": "application/rss+xml"}
+
+    fetcher.download = stub_download
+
+    async def add_feeds():
+        # Through the config store, which refreshes read their feed list from
+        urls = [f"https://loadtest.invalid/feed/{i}" for i in range(args.feeds)]
+        added, version = await service.db_writer.execute(service.insert_feeds, urls, rows=len(urls))
+        if added:
+            await service.apply_config_change("feeds_added", {"feeds": added}, version)
+
+    service.app.router.on_startup.append(add_feeds)
+    uvicorn.run(service.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+class ProcessSampler:
+    """Samples CPU time and RSS of the server process from /proc"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK")
+        self.cpu_samples = []
+        self.rss_samples = []
+
+    def cpu_seconds(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def rss_bytes(self):
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    async def run(self, interval=1.0):
+        try:
+            last_cpu, last_time = self.cpu_seconds(), time.monotonic()
+            while True:
+                await asyncio.sleep(interval)
+                cpu, now = self.cpu_seconds(), time.monotonic()
+                self.cpu_samples.append((cpu - last_cpu) / (now - last_time) * 100)
+                self.rss_samples.append(self.rss_bytes())
+                last_cpu, last_time = cpu, now
+        except (FileNotFoundError, ProcessLookupError):
+            pass
+
+
+# ----- Client side -----
+
+class Stats:
+    def __init__(self):
+        self.connected = 0
+        self.connect_failures = 0
+        self.disconnects = 0
+        self.current = 0
+        self.peak = 0
+        self.request_latency = {name: [] for name in MESSAGE_MIX}
+        self.request_errors = {name: 0 for name in MESSAGE_MIX}
+        self.broadcast_latency = []
+        self.broadcast_messages = 0
+
+
+async def simulated_client(n, args, url, stats, stop):
+    try:
+        ws = await websockets.connect(url, open_timeout=args.connect_timeout, max_size=None)
+    except Exception:
+        stats.connect_failures += 1
+        return
+    stats.connected += 1
+    stats.current += 1
+    stats.peak = max(stats.peak, stats.current)
+    pending = {}
+    names, weights = zip(*MESSAGE_MIX.items())
+
+    async def reader():
+        async for raw in ws:
+            received = time.time()
+            message = json.loads(raw)
+            request_id = message.get("request_id")
+            if request_id in pending:
+                name, sent = pending.pop(request_id)
+                stats.request_latency[name].append(time.perf_counter() - sent)
+                if message.get("type") == "error":
+                    stats.request_errors[name] += 1
+            elif message.get("type") == "new_entries" and message.get("data"):
+                entry_id = message["data"][0].get("id", "")
+                if entry_id.startswith("loadtest-"):
+                    stats.broadcast_messages += 1
+                    stats.broadcast_latency.append(received - float(entry_id.rsplit("-", 1)[1]))
+
+    async def writer():
+        for seq in itertools.count():
+            await asyncio.sleep(args.request_interval * random.uniform(0.5, 1.5))
+            name = random.choices(names, weights)[0]
+            request_id = f"{n}-{seq}"
+            pending[request_id] = (name, time.perf_counter())
+            await ws.send(json.dumps({"type": name, "request_id": request_id, "limit": 100}))
+
+    tasks = [asyncio.create_task(reader()), asyncio.create_task(writer()), asyncio.create_task(stop.wait())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        if not stop.is_set():
+            stats.disconnects += 1
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        stats.current -= 1
+        await ws.close()
+
+
+async def wait_for_server(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base_url}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Service did not become healthy")
+
+
+async def inject_bursts(base_url, interval, stop):
+    """Trigger stubbed refreshes so every client receives new_entries bursts"""
+    async with aiohttp.ClientSession() as session:
+        while not stop.is_set():
+            try:
+                async with session.post(f"{base_url}/fetch", params={"wait": "true"}) as response:
+                    await response.read()
+            except aiohttp.ClientError as e:
+                print(f"Burst trigger failed: {e}")
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def run(args):
+    raise_fd_limit()
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    data_dir = tempfile.mkdtemp(prefix="loadtest-")
+    env = dict(
+        os.environ,
+        MOUNT_PATH=data_dir,
+        OVERRIDE_DB_FILE=f"{data_dir}/feeds.db",
+        FETCH_CLIENT_MIN_INTERVAL="0",
+        FETCH_GLOBAL_MAX_TRIGGERS="1000000",
+    )
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+         "--feeds", str(args.feeds), "--burst-size", str(args.burst_size)],
+        env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=None if args.verbose else subprocess.DEVNULL,
+    )
+    sampler = ProcessSampler(server.pid)
+    stats = Stats()
+    stop = asyncio.Event()
+    try:
+        await wait_for_server(base_url)
+        sampler_task = asyncio.create_task(sampler.run())
+        print(f"Connecting {args.clients} clients at {args.ramp}/s...")
+        clients = []
+        for n in range(args.clients):
+            clients.append(asyncio.create_task(simulated_client(n, args, f"ws://127.0.0.1:{port}/ws", stats, stop)))
+            await asyncio.sleep(1 / args.ramp)
+        injector = asyncio.create_task(inject_bursts(base_url, args.burst_interval, stop))
+        print(f"{stats.current} clients connected, running for {args.duration}s...")
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(injector, *clients, return_exceptions=True)
+        sampler_task.cancel()
+    finally:
+        server.terminate()
+        server.wait()
+
+    report(args, stats, sampler)
+
+
+def report(args, stats, sampler):
+    print()
+    print("=" * 60)
+    print(f"Clients requested:     {args.clients}")
+    print(f"Connected:             {stats.connected}  (failed {stats.connect_failures}, peak concurrent {stats.peak})")
+    print(f"Dropped during run:    {stats.disconnects}")
+    print(f"Broadcasts received:   {stats.broadcast_messages}")
+    print(f"Broadcast latency:     p50 {fmt_ms(percentile(stats.broadcast_latency, 50))}"
+          f"  p99 {fmt_ms(percentile(stats.broadcast_latency, 99))}")
+    print("Request latency:")
+    for name, values in stats.request_latency.items():
+        print(f"  {name:<14} n={len(values):<7} errors={stats.request_errors[name]:<5}"
+              f" p50 {fmt_ms(percentile(values, 50))}  p99 {fmt_ms(percentile(values, 99))}")
+    if sampler.cpu_samples:
+        print(f"Server CPU:            avg {sum(sampler.cpu_samples) / len(sampler.cpu_samples):.0f}%"
+              f"  max {max(sampler.cpu_samples):.0f}%")
+        print(f"Server RSS:            peak {max(sampler.rss_samples) / 2**20:.1f} MiB")
+    else:
+        print("Server CPU/RSS:        n/a (no /proc)")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500, help="number of simulated WebSocket clients")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run after all clients connected")
+    parser.add_argument("--ramp", type=float, default=200, help="new connections per second")
+    parser.add_argument("--request-interval", type=float, default=5, help="mean seconds between requests per client")
+    parser.add_argument("--burst-interval", type=float, default=2, help="seconds between injected fetches")
+    parser.add_argument("--burst-size", type=int, default=10, help="new entries per feed per injected fetch")
+    parser.add_argument("--feeds", type=int, default=5, help="extra stub feeds to register")
+    parser.add_argument("--connect-timeout", type=float, default=10)
+    parser.add_argument("--verbose", action="store_true", help="show server output")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=8000, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
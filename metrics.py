@@ -0,0 +1,221 @@
+"""
+Minimal in-process metrics registry with Prometheus text exposition.
+
+Metrics are plain Python objects updated from the event loop or worker
+threads; observing a value is a dict lookup, a bisect and a few additions,
+so instrumenting hot paths stays cheap.
+"""
+import re
+import sqlite3
+import time
+from bisect import bisect_left
+
+from profiling import slow_ops
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def format_labels(names, values, extra=""):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value):
+    return "+Inf" if value == float("inf") else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in list(self.values.items()):
+            yield self.name, format_labels(self.labels, label_values), value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labels=(), function=None):
+        super().__init__(name, help, labels)
+        self.function = function  # Called at scrape time for unlabelled gauges
+
+    def set(self, value, *label_values):
+        self.values[label_values] = value
+
+    def samples(self):
+        if self.function is not None:
+            yield self.name, "", self.function()
+        else:
+            yield from super().samples()
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *label_values):
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *label_values):
+        return Timer(self, label_values)
+
+    def samples(self):
+        for label_values, series in list(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                yield f"{self.name}_bucket", format_labels(self.labels, label_values, f'le="{format_value(bound)}"'), cumulative
+            yield f"{self.name}_sum", format_labels(self.labels, label_values), series[-1]
+            yield f"{self.name}_count", format_labels(self.labels, label_values), cumulative
+
+
+class Timer:
+    """Context manager observing elapsed seconds into a histogram"""
+    __slots__ = ("histogram", "label_values", "started")
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.label_values)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=(), function=None):
+        return self.register(Gauge(name, help, labels, function))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Fetch pipeline
+feed_download_seconds = registry.histogram("rss_feed_download_seconds", "Feed download duration", ["feed_url"])
+feed_parse_seconds = registry.histogram("rss_feed_parse_seconds", "Feed parse duration", ["feed_url"])
+feed_errors = registry.counter("rss_feed_errors_total", "Feeds that failed to download, parse or store", ["feed_url"])
+fetch_cycle_seconds = registry.histogram("rss_fetch_cycle_seconds", "Full refresh duration")
+fetch_cycle_entries = registry.histogram(
+    "rss_fetch_cycle_entries", "Entries per refresh: parsed, inserted or deduplicated", ["kind"], COUNT_BUCKETS
+)
+
+# Database
+db_query_seconds = registry.histogram("rss_db_query_seconds", "SQLite statement latency", ["statement"])
+
+# Entry reads: served from the in-memory window or from SQLite
+entry_reads = registry.counter("rss_entry_reads_total", "Entry list reads by source", ["source"])
+
+# WebSub pushes: accepted, rejected (bad signature) or unknown (no such subscription)
+websub_pushes = registry.counter("rss_websub_pushes_total", "Content pushed by WebSub hubs", ["result"])
+
+# Group-commit writer
+write_batch_operations = registry.histogram("rss_write_batch_operations", "Operations per group commit", buckets=COUNT_BUCKETS)
+write_batch_rows = registry.histogram("rss_write_batch_rows", "Rows per group commit", buckets=COUNT_BUCKETS)
+write_commit_seconds = registry.histogram("rss_write_commit_seconds", "Time to apply and commit one group commit")
+
+# Broadcast and clients
+broadcast_seconds = registry.histogram("rss_broadcast_seconds", "Time to fan one event out to all local clients")
+broadcast_bytes = registry.histogram("rss_broadcast_bytes", "Encoded size of broadcast events", buckets=BYTES_BUCKETS)
+broadcast_sent_bytes = registry.counter("rss_broadcast_sent_bytes_total", "Bytes sent to clients by broadcasts")
+
+# Requests
+http_request_seconds = registry.histogram("rss_http_request_seconds", "REST request latency", ["method", "route", "status"])
+ws_message_seconds = registry.histogram("rss_ws_message_seconds", "WebSocket message handling latency", ["type"])
+
+
+STATEMENT_PATTERN = re.compile(r"^\s*(\w+)(?:.*?\b(?:FROM|INTO|UPDATE|TABLE(?: IF NOT EXISTS)?)\s+[\"']?(\w+))?", re.I | re.S)
+statement_labels = {}
+
+
+def statement_label(sql: str):
+    """Short, low-cardinality label for a statement, e.g. "SELECT entries" """
+    label = statement_labels.get(sql)
+    if label is None:
+        match = STATEMENT_PATTERN.match(sql)
+        if match:
+            verb, table = match.groups()
+            label = f"{verb.upper()} {table}" if table else verb.upper()
+        else:
+            label = "OTHER"
+        if len(statement_labels) < 1000:
+            statement_labels[sql] = label
+    return label
+
+
+def observe_statement(sql, args, duration):
+    label = statement_label(sql)
+    db_query_seconds.observe(duration, label)
+    slow_ops.record("db", label, duration, params=args[0] if args else None)
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection that records execute() latency per statement.
+
+    For SELECTs this covers preparing and stepping to the first row; rows
+    fetched afterwards are not included.
+    """
+
+    def execute(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            observe_statement(sql, args, time.perf_counter() - started)
+
+    def executemany(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            observe_statement(sql, (), time.perf_counter() - started)
@@ -0,0 +1,163 @@
+"""
+Schema migrations for the feeds database.
+
+Each migration runs once per database and is recorded in the `meta` table
+as migration:<name>. Migrations also check the live schema before changing
+anything, so they are safe on fresh databases created in the new shape and
+on databases restored from an older seed snapshot.
+"""
+import sqlite3
+import sys
+
+from records import DETAIL_COLUMNS, ENTRY_COLUMNS
+from seeding import get_meta, set_meta
+
+ENTRIES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id TEXT PRIMARY KEY,
+        feed_url TEXT,
+        title TEXT,
+        link TEXT,
+        published TEXT,
+        published_parsed_tz TEXT,
+        summary TEXT,
+        fetched_at TEXT
+    )
+"""
+
+ENTRY_DETAILS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id TEXT PRIMARY KEY,
+        title_detail TEXT,
+        links TEXT,
+        authors TEXT,
+        author TEXT,
+        author_detail TEXT,
+        published_parsed TEXT,
+        tags TEXT,
+        guidislink INTEGER,
+        summary_detail TEXT,
+        content TEXT
+    )
+"""
+
+WEBSUB_SUBSCRIPTIONS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS websub_subscriptions (
+        id TEXT PRIMARY KEY,
+        feed_url TEXT UNIQUE,
+        hub TEXT,
+        topic TEXT,
+        secret TEXT,
+        state TEXT,
+        lease_seconds INTEGER,
+        expires_at REAL,
+        requested_at REAL,
+        last_push_at REAL
+    )
+"""
+
+
+def table_columns(conn, table: str):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+def split_entry_details(conn):
+    """Move the detail columns out of entries into entry_details.
+
+    List queries scan entries in published order; with the JSON blobs inline
+    each row spans several times more pages than the list view needs. The
+    hot table is rebuilt with only ENTRY_COLUMNS so it packs densely.
+    """
+    columns = table_columns(conn, "entries")
+    if "title_detail" not in columns:
+        return False
+    conn.execute(ENTRY_DETAILS_SCHEMA.format(name="entry_details"))
+    detail_columns = ", ".join(DETAIL_COLUMNS)
+    conn.execute(f"INSERT OR IGNORE INTO entry_details ({detail_columns}) SELECT {detail_columns} FROM entries")
+    conn.execute(ENTRIES_SCHEMA.format(name="entries_hot"))
+    hot_columns = ", ".join(ENTRY_COLUMNS)
+    conn.execute(f"INSERT INTO entries_hot ({hot_columns}) SELECT {hot_columns} FROM entries")
+    conn.execute("DROP TABLE entries")
+    conn.execute("ALTER TABLE entries_hot RENAME TO entries")
+    return True
+
+
+def add_feed_retention(conn):
+    """Per-feed retention overrides, and an index for per-feed pruning in published order"""
+    columns = table_columns(conn, "feeds")
+    for column, type in (("max_age_days", "REAL"), ("max_entries", "INTEGER")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE feeds ADD COLUMN {column} {type}")
+    conn.execute("CREATE INDEX IF NOT EXISTS entries_feed_published ON entries (feed_url, published_parsed_tz)")
+    return True
+
+
+def enable_incremental_vacuum(conn):
+    """Let the pruner hand freed pages back with PRAGMA incremental_vacuum.
+
+    Takes effect with the VACUUM migrate() runs after applying migrations.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    return True
+
+
+def add_websub_subscriptions(conn):
+    """Hub subscriptions of pushed feeds; see websub.py"""
+    conn.execute(WEBSUB_SUBSCRIPTIONS_SCHEMA)
+    return False  # A new table frees no pages, so no VACUUM needed
+
+
+def add_entries_published_index(conn):
+    """Serve the newest-first list (ORDER BY published_parsed_tz DESC LIMIT n) without a full scan.
+
+    Partitions and shards create theirs in storage.py; the single table never had one.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS entries_published ON entries (published_parsed_tz)")
+    return False
+
+
+# Applied in order; append new migrations at the end
+MIGRATIONS = [
+    ("split_entry_details", split_entry_details),
+    ("add_feed_retention", add_feed_retention),
+    ("enable_incremental_vacuum", enable_incremental_vacuum),
+    ("add_websub_subscriptions", add_websub_subscriptions),
+    ("add_entries_published_index", add_entries_published_index),
+]
+
+
+def migrate(conn):
+    """Apply pending migrations, each in its own transaction. Returns the names applied"""
+    applied = []
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # Explicit transactions, so DDL and DML commit together
+    try:
+        for name, migration in MIGRATIONS:
+            if get_meta(conn, f"migration:{name}"):
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                changed = migration(conn)
+                set_meta(conn, f"migration:{name}", "applied")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if changed:
+                applied.append(name)
+        if applied:
+            # Hand pages freed by rebuilt tables back to the filesystem
+            conn.execute("VACUUM")
+    finally:
+        conn.isolation_level = isolation_level
+    for name in applied:
+        print(f"Applied migration {name}")
+    return applied
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(sys.argv[1])
+    print(migrate(conn) or "Nothing to migrate")
+    conn.close()
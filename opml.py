@@ -0,0 +1,45 @@
+"""
+Feed lists in and out: OPML, a JSON array or one URL per line.
+"""
+import json
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from xml.sax.saxutils import quoteattr
+
+
+def parse_feed_urls(text: str):
+    """Feed URLs from an OPML document, a JSON array of URLs or a newline-separated list.
+
+    Order is kept and duplicates dropped. Raises ValueError for malformed OPML or JSON.
+    """
+    text = text.strip()
+    if text.startswith("<"):
+        try:
+            root = ET.fromstring(text)
+        except ET.ParseError as e:
+            raise ValueError(f"Invalid OPML: {e}")
+        urls = [outline.get("xmlUrl") for outline in root.iter("outline")]
+    elif text.startswith("["):
+        try:
+            urls = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if not all(isinstance(url, str) for url in urls):
+            raise ValueError("Expected a JSON array of URLs")
+    else:
+        urls = [line for line in text.splitlines() if not line.lstrip().startswith("#")]
+    return list(dict.fromkeys(url.strip() for url in urls if url and url.strip()))
+
+
+def build_opml(urls, title: str = "RSS Feed Service feeds"):
+    created = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S +0000")
+    outlines = "".join(
+        f"    <outline type=\"rss\" text={quoteattr(url)} xmlUrl={quoteattr(url)}/>\n" for url in urls
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<opml version="2.0">\n'
+        f"  <head>\n    <title>{title}</title>\n    <dateCreated>{created}</dateCreated>\n  </head>\n"
+        f"  <body>\n{outlines}  </body>\n"
+        "</opml>\n"
+    )
@@ -0,0 +1,111 @@
+"""
+On-demand profiling and slow-operation tracing.
+
+    - sample_stacks(): wall-clock sampling of every thread's stack, returned in
+      collapsed format (one "frame;frame;frame count" line per stack), ready
+      for flamegraph.pl or speedscope
+    - profile_event_loop(): deterministic cProfile of the event loop thread
+    - SlowOpLog: ring buffer of handlers, statements and fetches slower than a
+      threshold, with their parameters and a duration breakdown
+"""
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+# Keys pstats.Stats.sort_stats accepts
+SORT_KEYS = tuple(pstats.Stats.sort_arg_dict_default)
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def sample_stacks(duration: float, interval: float = 0.005):
+    """Sample all threads' stacks for `duration` seconds; blocks the calling thread"""
+    own_id = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks = Counter()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(frame_label(frame))
+                frame = frame.f_back
+            frames.append(names.get(thread_id, str(thread_id)))
+            stacks[";".join(reversed(frames))] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+async def profile_event_loop(duration: float):
+    """cProfile everything the event loop thread runs for `duration` seconds.
+
+    Work handed to worker threads (feed parsing, DB calls) is not included;
+    use sample_stacks() to see it.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        profiler.disable()
+    return profiler
+
+
+def format_pstats(profiler, sort: str = "cumulative", limit: int = 60):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def dump_pstats(profiler):
+    """Binary pstats dump, loadable with pstats.Stats(path) or snakeviz"""
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+
+def short_repr(value, limit: int = 200):
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class SlowOpLog:
+    """Keeps the most recent operations that took longer than threshold_ms"""
+
+    def __init__(self, threshold_ms: float = 1000, capacity: int = 200):
+        self.threshold_ms = threshold_ms
+        self.entries = deque(maxlen=capacity)
+
+    def record(self, kind: str, name: str, duration: float, params=None, breakdown: dict = None):
+        """Record an operation if it was slow. duration is in seconds"""
+        duration_ms = duration * 1000
+        if self.threshold_ms <= 0 or duration_ms < self.threshold_ms:
+            return
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "kind": kind,
+            "name": name,
+            "duration_ms": round(duration_ms, 1),
+            "params": short_repr(params) if params is not None else None,
+            "breakdown": breakdown,
+        }
+        self.entries.append(entry)
+        print(f"Slow {kind} {name}: {duration_ms:.1f} ms {entry['params'] or ''} {breakdown or ''}")
+
+    def recent(self, kind: str = None):
+        return [entry for entry in self.entries if kind is None or entry["kind"] == kind]
+
+
+slow_ops = SlowOpLog(float(os.getenv("SLOW_OP_THRESHOLD_MS", 1000)))
@@ -0,0 +1,131 @@
+import json
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import mktime
+
+# Hot entries table: the columns list queries read, plus fetched_at
+ENTRY_COLUMNS = ("id", "feed_url", "title", "link", "published", "published_parsed_tz", "summary", "fetched_at")
+
+# Cold entry_details table, keyed by id and only read by the detail endpoint
+DETAIL_COLUMNS = (
+    "id", "title_detail", "links", "authors", "author", "author_detail", "published_parsed", "tags",
+    "guidislink", "summary_detail", "content",
+)
+
+# Detail columns holding encoded JSON
+JSON_COLUMNS = ("title_detail", "links", "authors", "author_detail", "tags", "summary_detail", "content")
+
+# Fields returned by /entries and carried by new_entries broadcasts
+LIST_COLUMNS = ("id", "feed_url", "title", "link", "published", "published_parsed_tz", "summary")
+
+
+def attr(e, name, default=""):
+    try:
+        return e.get(name, default) if isinstance(e, dict) else getattr(e, name, default)
+    except Exception:
+        return default
+
+
+def decode_json_columns(entry: dict):
+    """Decode a stored entry's JSON columns in place"""
+    for column in JSON_COLUMNS:
+        if column in entry:
+            try:
+                entry[column] = json.loads(entry[column]) if entry[column] else None
+            except ValueError:
+                entry[column] = None
+    return entry
+
+
+def to_json(value):
+    try:
+        return json.dumps(value) if value else None
+    except Exception:
+        return None
+
+
+class EntryRecord:
+    """A feed entry normalized once, shared by storage, broadcast and the API.
+
+    Timestamps are ISO strings and the detail fields are pre-encoded JSON, so
+    nothing downstream touches the feedparser object again.
+    """
+    __slots__ = ENTRY_COLUMNS + DETAIL_COLUMNS[1:]
+
+    def row(self):
+        """Values in ENTRY_COLUMNS order, for the entries INSERT"""
+        return (
+            self.id, self.feed_url, self.title, self.link, self.published, self.published_parsed_tz,
+            self.summary, self.fetched_at,
+        )
+
+    def detail_row(self):
+        """Values in DETAIL_COLUMNS order, for the entry_details INSERT"""
+        return (
+            self.id, self.title_detail, self.links, self.authors, self.author, self.author_detail,
+            self.published_parsed, self.tags, self.guidislink, self.summary_detail, self.content,
+        )
+
+    def to_dict(self):
+        """List view, the same shape as an /entries item"""
+        return {
+            "id": self.id,
+            "feed_url": self.feed_url,
+            "title": self.title,
+            "link": self.link,
+            "published": self.published,
+            "published_parsed_tz": self.published_parsed_tz,
+            "summary": self.summary,
+        }
+
+
+def normalize_entry(entry, feed_url: str, fetched_at: str = None) -> EntryRecord:
+    """Turn a feedparser entry into an EntryRecord, parsing dates and encoding JSON exactly once"""
+    record = EntryRecord()
+    record.id = attr(entry, "id", None) or attr(entry, "guid", None) or attr(entry, "link", "")
+    record.feed_url = feed_url
+    record.title = attr(entry, "title", "")
+    record.link = attr(entry, "link", "")
+    record.author = attr(entry, "author", "")
+    record.summary = attr(entry, "summary", "")
+    record.guidislink = int(attr(entry, "guidislink", False))
+
+    record.published = attr(entry, "published", "")
+    record.published_parsed_tz = None
+    if record.published:
+        try:
+            dt = parsedate_to_datetime(record.published)
+            record.published_parsed_tz = dt.astimezone(timezone.utc).isoformat()
+        except Exception:
+            pass
+
+    record.published_parsed = None
+    published_parsed = attr(entry, "published_parsed", None)
+    if published_parsed:
+        try:
+            record.published_parsed = datetime.fromtimestamp(mktime(published_parsed)).isoformat()
+        except Exception:
+            pass
+
+    record.title_detail = to_json(attr(entry, "title_detail"))
+    record.links = to_json(attr(entry, "links"))
+    record.authors = to_json(attr(entry, "authors"))
+    record.author_detail = to_json(attr(entry, "author_detail"))
+    record.summary_detail = to_json(attr(entry, "summary_detail"))
+    record.content = to_json(attr(entry, "content"))
+
+    record.tags = None
+    try:
+        tags = attr(entry, "tags", None)
+        record.tags = json.dumps([t.term for t in tags]) if tags is not None else None
+    except Exception:
+        pass
+
+    record.fetched_at = fetched_at or datetime.now(timezone.utc).isoformat()
+    return record
+
+
+def normalize_entries(entries, feed_url: str):
+    """Normalize a feed's entries with one shared fetched_at timestamp"""
+    fetched_at = datetime.now(timezone.utc).isoformat()
+    return [normalize_entry(entry, feed_url, fetched_at) for entry in entries]
@@ -0,0 +1,278 @@
+"""
+Entry retention: prune old entries in small batches, optionally archiving them.
+
+A policy limits a feed's entries by age (max_age_days) and by count
+(max_entries, newest kept). The global policy comes from the environment;
+feeds can override either limit through their max_age_days / max_entries
+columns, where NULL inherits the global value and 0 means unlimited.
+Entries whose feed no longer exists are always removed, checked again as
+each batch is deleted so a feed added during a prune keeps its entries.
+
+Deletes run in batches of batch_size, each one an operation of the file's
+group-commit writer, with a pause in between, so fetches and API writes are
+never locked out for long. With partitioned storage, partitions older than
+every feed's age limit are dropped whole instead. With an archive directory
+set, rows are appended to a gzipped NDJSON file per day before they are
+deleted. Freed pages are returned to the filesystem with PRAGMA
+incremental_vacuum.
+"""
+import asyncio
+import gzip
+import json
+import os
+import time
+import traceback
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from records import decode_json_columns
+from scheduler import iso
+from storage import detail_query
+from writer import get_writer
+
+Policy = namedtuple("Policy", ["max_age_days", "max_entries"])
+REMOVED_KEYS = ("dropped_partitions", "expired", "over_limit", "orphaned")
+
+
+def release_pages(conn, pages: int):
+    """Hand up to `pages` free pages back to the filesystem. Returns how many were released"""
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    for _ in range(min(pages, free)):
+        conn.execute("PRAGMA incremental_vacuum(1)")  # sqlite3 steps a pragma once, which frees one page
+    return free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def removed_any(result):
+    """Whether a prune result removed anything"""
+    return any(result[key] for key in REMOVED_KEYS)
+
+
+class Pruner:
+    def __init__(self, storage, default_policy: Policy, batch_size: int = 500, pause: float = 0.05,
+                 archive_dir: str = None, vacuum_pages: int = 2000):
+        self.storage = storage
+        self.default_policy = default_policy
+        self.batch_size = batch_size
+        self.pause = pause
+        self.archive_dir = archive_dir
+        self.vacuum_pages = vacuum_pages
+        self.last_run = None
+        self.last_result = None
+
+    def policies(self):
+        """Effective policy per feed URL"""
+        default = self.default_policy
+        conn = self.storage.connect(self.storage.db_file)
+        try:
+            return {
+                url: Policy(
+                    default.max_age_days if max_age_days is None else max_age_days,
+                    default.max_entries if max_entries is None else max_entries,
+                )
+                for url, max_age_days, max_entries in conn.execute("SELECT url, max_age_days, max_entries FROM feeds")
+            }
+        finally:
+            conn.close()
+
+    def status(self):
+        return {
+            "default_policy": self.default_policy._asdict(),
+            "storage": self.storage.mode,
+            "archive_dir": self.archive_dir,
+            "last_run": iso(self.last_run),
+            "last_result": self.last_result,
+        }
+
+    def prune(self):
+        """Apply retention to every feed and remove orphaned entries. Blocks; run it in a thread"""
+        started = time.perf_counter()
+        result = {
+            "dropped_partitions": 0, "expired": 0, "over_limit": 0, "orphaned": 0, "archived": 0, "vacuumed_pages": 0,
+        }
+        policies = self.policies()
+        now = datetime.now(timezone.utc)
+        cutoffs = {
+            url: (now - timedelta(days=policy.max_age_days)).isoformat()
+            for url, policy in policies.items() if policy.max_age_days
+        }
+        # Partitions can only be dropped once they are past every feed's age limit
+        drop_cutoff = min(cutoffs.values()) if cutoffs and len(cutoffs) == len(policies) else None
+        oldest_kept = {}  # url -> timestamp of the oldest entry within max_entries
+
+        for db_file in self.storage.db_files():
+            conn = self.storage.connect(db_file)
+            try:
+                if drop_cutoff:
+                    for partition in self.storage.expired_partitions(conn, db_file, drop_cutoff):
+                        if self.archive_dir:
+                            result["archived"] += self.archive_partition(conn, partition)
+                        get_writer(db_file).submit(self.storage.drop_partition, partition)
+                        result["dropped_partitions"] += 1
+                for partition in self.storage.partitions(conn, db_file):
+                    stored_feeds = [row[0] for row in conn.execute(f"SELECT DISTINCT feed_url FROM {partition.entries}")]
+                    for url in stored_feeds:
+                        policy = policies.get(url)
+                        if policy is None:
+                            result["orphaned"] += self.delete_matching(conn, db_file, partition, """
+                                SELECT id FROM {entries} WHERE feed_url = ? LIMIT ?
+                            """, (url,), "orphaned", result, unless_feed=url)
+                            continue
+                        if url in cutoffs:
+                            cutoff = cutoffs[url]
+                            result["expired"] += self.delete_matching(conn, db_file, partition, """
+                                SELECT id FROM {entries}
+                                WHERE feed_url = ? AND (published_parsed_tz < ? OR (published_parsed_tz IS NULL AND fetched_at < ?))
+                                LIMIT ?
+                            """, (url, cutoff, cutoff), "expired", result)
+                        if policy.max_entries:
+                            if url not in oldest_kept:
+                                oldest_kept[url] = self.oldest_kept(url, policy.max_entries)
+                            if oldest_kept[url]:
+                                # NULL dates sort after every dated entry, so they are beyond the limit too
+                                result["over_limit"] += self.delete_matching(conn, db_file, partition, """
+                                    SELECT id FROM {entries}
+                                    WHERE feed_url = ? AND (published_parsed_tz < ? OR published_parsed_tz IS NULL)
+                                    LIMIT ?
+                                """, (url, oldest_kept[url]), "over_limit", result)
+                if removed_any(result):
+                    result["vacuumed_pages"] += self.incremental_vacuum(db_file)
+            finally:
+                conn.close()
+        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self.last_run = time.time()
+        self.last_result = result
+        if removed_any(result):
+            print(f"Pruned entries: {result}")
+        return result
+
+    def oldest_kept(self, url: str, max_entries: int):
+        """published_parsed_tz of the feed's max_entries-th newest entry, if it has more than that.
+
+        Entries sharing that timestamp are all kept, so a feed can end up
+        slightly above its limit.
+        """
+        rows = list(self.storage.iter_newest(feed_url=url, limit=max_entries + 1))
+        if len(rows) <= max_entries:
+            return None
+        return rows[max_entries - 1][5]  # published_parsed_tz
+
+    def remove_feed(self, url: str):
+        """Delete (or archive) all entries of a removed feed. Returns the number removed"""
+        result = {"archived": 0}
+        removed = 0
+        for db_file in self.storage.db_files():
+            conn = self.storage.connect(db_file)
+            try:
+                removed_here = 0
+                for partition in self.storage.partitions(conn, db_file):
+                    removed_here += self.delete_matching(
+                        conn, db_file, partition, "SELECT id FROM {entries} WHERE feed_url = ? LIMIT ?", (url,),
+                        "feed_deleted", result, unless_feed=url,
+                    )
+                if removed_here:
+                    self.incremental_vacuum(db_file)
+                removed += removed_here
+            finally:
+                conn.close()
+        return removed
+
+    def delete_matching(self, conn, db_file, partition, query, params, reason, result, unless_feed=None):
+        """Delete rows selected by `query` a batch at a time until none are left.
+
+        With unless_feed set, stops as soon as that feed exists again.
+        """
+        query = query.format(entries=partition.entries)
+        deleted = 0
+        while True:
+            ids = [row[0] for row in conn.execute(query, params + (self.batch_size,))]
+            if not ids:
+                return deleted
+            removed, archived = get_writer(db_file).submit(
+                self.delete_batch, db_file, partition, ids, reason, unless_feed, rows=len(ids)
+            )
+            result["archived"] += archived
+            deleted += removed
+            if not removed or len(ids) < self.batch_size:
+                return deleted
+            time.sleep(self.pause)  # Let other writers in between batches
+
+    def delete_batch(self, conn, db_file, partition, ids, reason, unless_feed):
+        """Writer operation: archive and delete ids. Returns (deleted, archived)"""
+        if unless_feed is not None and self.feed_exists(conn, db_file, unless_feed):
+            return 0, 0
+        archived = self.archive(conn, partition, ids, reason) if self.archive_dir else 0
+        placeholders = ",".join("?" * len(ids))
+        conn.execute(f"DELETE FROM {partition.details} WHERE id IN ({placeholders})", ids)
+        conn.execute(f"DELETE FROM {partition.entries} WHERE id IN ({placeholders})", ids)
+        return len(ids), archived
+
+    def feed_exists(self, conn, db_file, url: str):
+        """Whether url is in the feeds table, read inside the writer's transaction when it shares the file.
+
+        Shards can't see the main database's transaction, but a feed's entries are
+        only stored after it is committed there, and then through this shard's writer.
+        """
+        main = conn if db_file == self.storage.db_file else self.storage.connect(self.storage.db_file)
+        try:
+            return main.execute("SELECT 1 FROM feeds WHERE url = ?", (url,)).fetchone() is not None
+        finally:
+            if main is not conn:
+                main.close()
+
+    def archive_partition(self, conn, partition):
+        """Archive every row of a partition about to be dropped"""
+        archived, last_rowid = 0, 0
+        while True:
+            rows = conn.execute(
+                f"SELECT rowid, id FROM {partition.entries} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last_rowid, self.batch_size),
+            ).fetchall()
+            if not rows:
+                return archived
+            last_rowid = rows[-1][0]
+            archived += self.archive(conn, partition, [row[1] for row in rows], "expired")
+
+    def archive(self, conn, partition, ids, reason):
+        """Append full rows to today's gzipped NDJSON archive"""
+        cursor = conn.execute(detail_query(partition).format(placeholders=",".join("?" * len(ids))), ids)
+        columns = [description[0] for description in cursor.description]
+        pruned_at = datetime.now(timezone.utc).isoformat()
+        lines = []
+        for row in cursor:
+            entry = decode_json_columns(self.storage.codec.decode_row(columns, row))
+            entry["pruned_at"] = pruned_at
+            entry["pruned_reason"] = reason
+            lines.append(json.dumps(entry) + "\n")
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"entries-{pruned_at[:10]}.ndjson.gz")
+        # Each append is a separate gzip member; gzip readers concatenate them
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            f.writelines(lines)
+        return len(lines)
+
+    def incremental_vacuum(self, db_file, step: int = 200):
+        """Release up to vacuum_pages free pages, a writer operation per step. Returns pages released"""
+        released = 0
+        while released < self.vacuum_pages:
+            freed = get_writer(db_file).submit(release_pages, min(step, self.vacuum_pages - released))
+            if not freed:
+                break  # No free pages left, or auto_vacuum is not INCREMENTAL on this database
+            released += freed
+        return released
+
+    async def run(self, lease, interval: float, initial_delay: float = 0, on_pruned=None):
+        """Prune every `interval` seconds while holding the leader lease.
+
+        on_pruned, if given, is awaited with the result of runs that removed entries.
+        """
+        await asyncio.sleep(initial_delay)
+        while True:
+            if lease.is_leader:
+                try:
+                    result = await asyncio.to_thread(self.prune)
+                    if on_pruned and removed_any(result):
+                        await on_pruned(result)
+                except Exception:
+                    print("Error pruning entries")
+                    traceback.print_exc()
+            await asyncio.sleep(interval)
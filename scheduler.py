@@ -0,0 +1,92 @@
+import asyncio
+import time
+import traceback
+from datetime import datetime, timezone
+
+
+# Helper function to sleep with interruption
+async def interruptible_sleep(event, seconds):
+    """Sleep but can be interrupted by event. seconds=None sleeps until the event is set"""
+    try:
+        await asyncio.wait_for(event.wait(), timeout=seconds)
+        event.clear()  # Reset event
+        return True  # Was interrupted
+    except asyncio.TimeoutError:
+        return False  # Sleep completed normally
+
+
+def iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+
+
+class FetchScheduler:
+    """Runs scheduled refreshes, sleeping until the next one is due.
+
+    The next run is last_run + interval, where last_run is the completion time
+    of the most recent refresh, scheduled or manual. reschedule() wakes the
+    loop immediately, e.g. when the interval changes or a refresh completes.
+    Only the holder of the leader lease fetches.
+    """
+
+    def __init__(self, get_interval, trigger, lease, lease_check_interval: float = 10.0, on_error=None):
+        self.get_interval = get_interval  # callable -> seconds between refreshes, <= 0 disables
+        self.trigger = trigger  # async callable -> (status, FetchRun)
+        self.lease = lease
+        self.lease_check_interval = lease_check_interval
+        self.on_error = on_error  # async callable(exception)
+        self.wake = asyncio.Event()
+        self.last_run = None
+        self.next_run = None
+
+    def reschedule(self):
+        self.wake.set()
+
+    def fetch_completed(self, timestamp: float = None):
+        """Record a finished refresh; the next one is due a full interval later"""
+        self.last_run = timestamp or time.time()
+        self.wake.set()
+
+    def status(self):
+        return {
+            "interval_seconds": self.get_interval(),
+            "leader": self.lease.is_leader,
+            "last_run": iso(self.last_run),
+            "next_run": iso(self.next_run),
+        }
+
+    async def run(self, initial_delay: float = 0):
+        await asyncio.sleep(initial_delay)
+        while True:
+            try:
+                if not self.lease.is_leader:
+                    # Another worker owns scheduled fetching
+                    self.next_run = None
+                    await interruptible_sleep(self.wake, self.lease_check_interval)
+                    continue
+
+                interval = self.get_interval()
+                if interval <= 0:
+                    self.next_run = None
+                    await interruptible_sleep(self.wake, None)
+                    continue
+
+                now = time.time()
+                self.next_run = self.last_run + interval if self.last_run else now
+                if self.next_run > now:
+                    await interruptible_sleep(self.wake, self.next_run - now)
+                    continue
+
+                print(f"Auto-fetching feeds... (interval: {interval / 60:g} mins)")
+                status, run = await self.trigger()
+                await run.future
+                # A refresh that fails without completing still pushes the schedule forward
+                if self.last_run is None or self.last_run < now:
+                    self.fetch_completed()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Background fetch error: {e}")
+                traceback.print_exc()
+                if self.on_error:
+                    await self.on_error(e)
+                await asyncio.sleep(30)
@@ -0,0 +1,216 @@
+"""
+Database seeding from seed.txt.
+
+seed.txt is an SQL dump. Running it through executescript on every boot is
+slow, so seeding is versioned and restored from a binary snapshot instead:
+
+    - the seed version is a hash of seed.txt, recorded in the `meta` table
+      once applied; later boots see it and skip seeding entirely
+    - seed.txt is compiled into a SQLite snapshot (seed.db, committed next
+      to it), which is copied into a fresh database with the SQLite backup
+      API. Without a snapshot of the current version, a fresh database runs
+      seed.txt itself; nothing is written outside the database at runtime
+    - an existing database only gets seed rows for tables that are missing
+      or empty, so user data is never overwritten and deleted seed rows
+      stay deleted
+
+Rebuild the snapshot whenever seed.txt changes, and compare cold start
+timings, with:
+    python seeding.py build
+    python seeding.py bench
+"""
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+SEED_FILE = "seed.txt"
+SEED_SNAPSHOT = os.getenv("SEED_SNAPSHOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed.db"))
+
+
+def seed_version(seed_file: str = SEED_FILE):
+    with open(seed_file, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def ensure_meta(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+
+def get_meta(conn, name: str):
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+    except sqlite3.OperationalError:
+        return None  # No meta table yet
+    return row[0] if row else None
+
+
+def set_meta(conn, name: str, value: str):
+    ensure_meta(conn)
+    conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+
+def build_snapshot(seed_file: str = SEED_FILE, snapshot_file: str = SEED_SNAPSHOT, version: str = None):
+    """Compile seed.txt into a SQLite snapshot tagged with its seed version"""
+    version = version or seed_version(seed_file)
+    with open(seed_file, "r") as f:
+        script = f.read()
+    # Build next to the target and rename, so a crash never leaves half a snapshot
+    fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=os.path.dirname(os.path.abspath(snapshot_file)))
+    os.close(fd)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(script)
+        set_meta(conn, "seed_version", version)
+        conn.commit()
+    finally:
+        conn.close()
+    os.chmod(tmp_path, 0o644)  # mkstemp creates files readable by their owner only
+    os.replace(tmp_path, snapshot_file)
+    print(f"Seed snapshot {version} written to {snapshot_file}")
+
+
+def user_tables(conn, schema: str = "main"):
+    return [
+        row[0] for row in conn.execute(
+            f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name != 'meta'"
+        )
+    ]
+
+
+def snapshot_version(snapshot_file: str):
+    """Seed version of a snapshot, or None if there is no readable one"""
+    if not os.path.exists(snapshot_file):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{snapshot_file}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return None
+    try:
+        return get_meta(conn, "seed_version")
+    except sqlite3.DatabaseError:
+        return None  # Not an SQLite file
+    finally:
+        conn.close()
+
+
+def merge_snapshot(conn, snapshot_file: str):
+    """Copy snapshot rows into tables of an existing database that are missing or empty.
+
+    Tables already holding rows are left alone, so seed rows the user deleted are not brought back.
+    """
+    conn.execute("ATTACH DATABASE ? AS seed", (snapshot_file,))
+    try:
+        existing = set(user_tables(conn))
+        for table in user_tables(conn, "seed"):
+            if table in existing:
+                if conn.execute(f'SELECT 1 FROM main."{table}" LIMIT 1').fetchone():
+                    continue
+            else:
+                sql = conn.execute(
+                    "SELECT sql FROM seed.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()[0]
+                conn.execute(sql)
+            main_columns = {row[1] for row in conn.execute(f'PRAGMA main.table_info("{table}")')}
+            seed_columns = conn.execute(f'PRAGMA seed.table_info("{table}")').fetchall()
+            # Let INTEGER PRIMARY KEY ids be reassigned so seed rows never collide with user rows
+            columns = ", ".join(
+                f'"{name}"' for cid, name, type, notnull, default, pk in seed_columns
+                if name in main_columns and not (pk and type.upper() == "INTEGER")
+            )
+            conn.execute(f'INSERT OR IGNORE INTO main."{table}" ({columns}) SELECT {columns} FROM seed."{table}"')
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE seed")
+
+
+def seed_database(db_file: str, seed_file: str = SEED_FILE, snapshot_file: str = SEED_SNAPSHOT):
+    """Apply the seed once per seed version. Returns "skipped", "restored", "seeded" or "merged" """
+    version = seed_version(seed_file)
+    conn = sqlite3.connect(db_file)
+    try:
+        if get_meta(conn, "seed_version") == version:
+            return "skipped"
+        usable = snapshot_version(snapshot_file) == version
+
+        if not user_tables(conn):
+            if usable:
+                # Fresh database: page-level copy, no SQL parsing
+                snapshot = sqlite3.connect(f"file:{snapshot_file}?mode=ro", uri=True)
+                try:
+                    snapshot.backup(conn)
+                finally:
+                    snapshot.close()
+                return "restored"
+            # Stale or missing snapshot: running seed.txt here beats compiling a snapshot first
+            with open(seed_file, "r") as f:
+                conn.executescript(f.read())
+            set_meta(conn, "seed_version", version)
+            conn.commit()
+            return "seeded"
+
+        if usable:
+            merge_snapshot(conn, snapshot_file)
+        else:
+            # Compile a throwaway snapshot to merge from; the shipped one may sit in a read-only directory
+            with tempfile.TemporaryDirectory() as tmp:
+                tmp_snapshot = os.path.join(tmp, "seed.db")
+                build_snapshot(seed_file, tmp_snapshot, version)
+                merge_snapshot(conn, tmp_snapshot)
+        set_meta(conn, "seed_version", version)
+        conn.commit()
+        return "merged"
+    finally:
+        conn.close()
+
+
+def bench(seed_file: str = SEED_FILE):
+    """Compare seeding a fresh database with executescript, with and without a snapshot, and the skip path"""
+    with open(seed_file, "r") as f:
+        script = f.read()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "bench.db")
+        snapshot_file = os.path.join(tmp, "seed.db")
+
+        started = time.perf_counter()
+        conn = sqlite3.connect(db_file)
+        conn.executescript(script)
+        conn.close()
+        executescript_ms = (time.perf_counter() - started) * 1000
+        os.remove(db_file)
+
+        started = time.perf_counter()
+        direct = seed_database(db_file, seed_file, snapshot_file)
+        direct_ms = (time.perf_counter() - started) * 1000
+        os.remove(db_file)
+
+        started = time.perf_counter()
+        build_snapshot(seed_file, snapshot_file)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        result = seed_database(db_file, seed_file, snapshot_file)
+        restore_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        skipped = seed_database(db_file, seed_file, snapshot_file)
+        skip_ms = (time.perf_counter() - started) * 1000
+
+    print(f"executescript(seed.txt):     {executescript_ms:8.2f} ms")
+    print(f"no snapshot, {direct}:         {direct_ms:8.2f} ms")
+    print(f"snapshot build (at release): {build_ms:8.2f} ms")
+    print(f"snapshot {result}:           {restore_ms:8.2f} ms")
+    print(f"already seeded, {skipped}:     {skip_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command == "build":
+        build_snapshot()
+    elif command == "bench":
+        bench()
+    else:
+        print(f"Unknown command '{command}', expected build or bench")
+        sys.exit(1)
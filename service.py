@@ -1,17 +1,44 @@
 import os
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from startup import profile, Readiness
+# Imports are timed individually; pydantic first so fastapi's time excludes it
+with profile.phase("import pydantic"):
+    from pydantic import BaseModel
+with profile.phase("import fastapi"):
+    from fastapi import Depends, FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from websockets.exceptions import ConnectionClosed
 import sqlite3
-import feedparser
 import json, time
 from datetime import datetime, timezone
-from time import mktime
-from email.utils import parsedate_to_datetime
 import asyncio
+from collections import defaultdict, deque
+from itertools import islice
 from typing import List, Optional, Set
 import traceback, sys,io
 from shared import *
+from bus import create_bus, create_lease, create_run_lock
+from coordinator import FetchCoordinator, RateLimited
+from scheduler import FetchScheduler
+from seeding import seed_database
+# fetcher pulls in aiohttp and feedparser, the slowest imports after fastapi
+with profile.phase("import fetcher"):
+    import fetcher
+import metrics
+from metrics import TimedConnection
+from records import LIST_COLUMNS, decode_json_columns, normalize_entries
+from compression import ColumnCodec
+from retention import Policy, Pruner, removed_any
+from storage import create_storage
+from writer import get_writer, stop_writers
+from window import EntryWindow
+from jobs import SUCCEEDED, JobError, JobRegistry
+from opml import build_opml, parse_feed_urls
+from websub import WebSubManager
+from config import CONFIG_EVENTS, ConfigStore, bump_version, read_snapshot
+from migrations import ENTRIES_SCHEMA, ENTRY_DETAILS_SCHEMA, migrate
+import profiling
+from profiling import slow_ops
 
 PORT = int(os.getenv("PORT", 8000))
 OVERRIDE_DB_FILE = os.getenv('OVERRIDE_DB_FILE', None)
@@ -19,9 +46,66 @@ SQLITE_SERVICE_PATH = os.getenv('SQLITE_PRIVATE_PATH', None)
 VOLUME_NAME = os.getenv("RAILWAY_VOLUME_NAME", "no volume name")
 MOUNT_PATH = SQLITE_SERVICE_PATH if SQLITE_SERVICE_PATH else os.getenv("RAILWAY_VOLUME_MOUNT_PATH", os.getenv("MOUNT_PATH","./data"))
 DB_FILE = f"{MOUNT_PATH}/feeds" if SQLITE_SERVICE_PATH else f"{MOUNT_PATH}/feeds.db"
+# Token for /admin endpoints (sent as X-Admin-Token); admin endpoints are disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 DEBUG = os.getenv("DEBUG", "0").lower() in ("1", "true", "yes")  or (hasattr(sys, "gettrace") and sys.gettrace() is not None)
 
 DB_FILE = OVERRIDE_DB_FILE if OVERRIDE_DB_FILE else DB_FILE
+# Print environment and filesystem info at startup
+STARTUP_DIAGNOSTICS = os.getenv("STARTUP_DIAGNOSTICS", "0").lower() in ("1", "true", "yes")
+
+# Cross-worker broadcasts: "local" for a single process, "sqlite" when running several uvicorn workers
+BROADCAST_BACKEND = os.getenv("BROADCAST_BACKEND", "local")
+BROADCAST_DB_FILE = os.getenv("BROADCAST_DB_FILE", f"{MOUNT_PATH}/broadcast.db")
+LEASE_TTL = float(os.getenv("LEASE_TTL", 30))
+# Maximum number of requests in flight for one WebSocket client; reads run concurrently, changes in order
+WS_MAX_CONCURRENCY = int(os.getenv("WS_MAX_CONCURRENCY", 8))
+# Fetch triggers: join a refresh started less than FETCH_JOIN_WINDOW seconds ago, and rate limit clients
+FETCH_JOIN_WINDOW = float(os.getenv("FETCH_JOIN_WINDOW", 5))
+FETCH_CLIENT_MIN_INTERVAL = float(os.getenv("FETCH_CLIENT_MIN_INTERVAL", 10))
+FETCH_GLOBAL_MAX_TRIGGERS = int(os.getenv("FETCH_GLOBAL_MAX_TRIGGERS", 6))
+FETCH_GLOBAL_PERIOD = float(os.getenv("FETCH_GLOBAL_PERIOD", 60))
+# Feeds downloaded in parallel per refresh, per-feed timeout, and max entries per new_entries message
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", 8))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", 30))
+NEW_ENTRIES_CHUNK_SIZE = int(os.getenv("NEW_ENTRIES_CHUNK_SIZE", 50))
+# Feeds validated at once by a bulk import, and the most one import may add
+FEED_IMPORT_CONCURRENCY = int(os.getenv("FEED_IMPORT_CONCURRENCY", 8))
+FEED_IMPORT_MAX = int(os.getenv("FEED_IMPORT_MAX", 1000))
+# Most items one batch command (add_keywords, delete_feeds, ...) may carry
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 1000))
+# Store summary, summary_detail and content as dictionary-primed deflate BLOBs (see compression.py)
+COLUMN_COMPRESSION = os.getenv("COLUMN_COMPRESSION", "0").lower() in ("1", "true", "yes")
+# Entry layout: "single" table pair, "monthly" partitions or "sharded" files (see storage.py)
+STORAGE_MODE = os.getenv("STORAGE_MODE", "single")
+STORAGE_SHARDS = int(os.getenv("STORAGE_SHARDS", 4))
+SHARD_DIR = os.getenv("SHARD_DIR", MOUNT_PATH)
+# Retention: default per-feed limits (0 = unlimited; feeds can override), pruning cadence and batch size,
+# and where pruned entries are archived as gzipped NDJSON (unset = delete without archiving)
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", 0))
+RETENTION_MAX_ENTRIES = int(os.getenv("RETENTION_MAX_ENTRIES", 0))
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", 3600))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", 500))
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR") or None
+# Rows read and encoded per step by /entries/export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 500))
+# Newest entries kept in memory to answer entry list reads without SQLite
+ENTRY_WINDOW_SIZE = int(os.getenv("ENTRY_WINDOW_SIZE", 1000))
+# Server-Sent Events: per-listener queue bound, resume buffer length and keepalive interval (seconds)
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", 1000))
+SSE_REPLAY_SIZE = int(os.getenv("SSE_REPLAY_SIZE", 1000))
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", 15))
+
+# Finished background jobs (e.g. feed additions) kept for /jobs/{id}
+JOBS_KEEP = int(os.getenv("JOBS_KEEP", 500))
+
+# WebSub push ingestion: public base URL hubs call back (unset disables it), requested lease,
+# how long before expiry subscriptions are renewed, and how often pushed feeds are still polled
+WEBSUB_CALLBACK_URL = os.getenv("WEBSUB_CALLBACK_URL") or None
+WEBSUB_LEASE_SECONDS = int(os.getenv("WEBSUB_LEASE_SECONDS", 604800))
+WEBSUB_RENEW_BEFORE = float(os.getenv("WEBSUB_RENEW_BEFORE", 86400))
+WEBSUB_SAFETY_POLL_INTERVAL = float(os.getenv("WEBSUB_SAFETY_POLL_INTERVAL", 21600))
+WEBSUB_CHECK_INTERVAL = float(os.getenv("WEBSUB_CHECK_INTERVAL", 600))
 
 app = FastAPI(title="RSS Feed Service")
 
@@ -33,19 +117,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class AppState:
-    def __init__(self):
-        self.time_since_refresh = 0.0
-        self.settings = {"refresh_rate" : 0}
-        self.refresh_event = None
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    duration = time.perf_counter() - started
+    route = request.scope.get("route")
+    route_path = route.path if route else "unmatched"
+    metrics.http_request_seconds.observe(duration, request.method, route_path, response.status_code)
+    slow_ops.record("http", f"{request.method} {route_path}", duration, params=dict(request.query_params))
+    return response
+
+# Feeds, keywords and settings, kept in memory and written through
+config = ConfigStore()
+# Checks that must pass before /ready reports this instance as ready
+readiness = Readiness("database", "config", "entry_window")
+
+# Server-Sent Events listener
+class EventStream:
+    """A Server-Sent Events listener with its own queue and optional filters"""
 
+    def __init__(self, types: Optional[Set[str]] = None, feed_url: Optional[str] = None):
+        self.types = types
+        self.feed_url = feed_url
+        self.queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+
+    def wants(self, event):
+        if self.types and event.type not in self.types:
+            return False
+        if self.feed_url and event.feed_url and event.feed_url != self.feed_url:
+            return False
+        return True
 
-state = AppState()
 
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Set[WebSocket] = set()
+        self.event_streams: Set[EventStream] = set()
+        # Recent events, replayed to SSE clients resuming with Last-Event-ID
+        self.recent_events = deque(maxlen=SSE_REPLAY_SIZE)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
@@ -57,23 +168,166 @@ class ConnectionManager:
         print(f"Client disconnected. Total: {len(self.active_connections)}")
 
     async def broadcast(self, message: dict):
-        """Send message to all connected clients"""
+        """Publish message on the bus so clients of every worker receive it"""
+        await bus.publish(message)
+
+    async def deliver(self, event):
+        """Send an already encoded bus event to this worker's clients"""
+        started = time.perf_counter()
         disconnected = set()
-        for connection in self.active_connections:
+        for connection in list(self.active_connections):
             try:
-                await connection.send_json(message)
+                await connection.send_text(event.text)
             except Exception as e:
                 print(f"Error sending to client: {e}")
                 disconnected.add(connection)
         
         # Remove disconnected clients
         self.active_connections -= disconnected
+        metrics.broadcast_seconds.observe(time.perf_counter() - started)
+        metrics.broadcast_bytes.observe(len(event.text))
+        metrics.broadcast_sent_bytes.inc(amount=len(event.text) * (len(self.active_connections) + len(disconnected)))
+
+        self.recent_events.append(event)
+        for stream in list(self.event_streams):
+            if not stream.wants(event):
+                continue
+            try:
+                stream.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too slow to keep up; it can reconnect and resume with Last-Event-ID
+                print("Dropping slow event stream")
+                self.event_streams.discard(stream)
+                stream.queue = None
+
+    def open_stream(self, stream: EventStream, last_event_id: Optional[int] = None):
+        """Register an SSE listener and return the buffered events it missed"""
+        self.event_streams.add(stream)
+        if last_event_id is None:
+            return []
+        return [event for event in self.recent_events if event.id > last_event_id and stream.wants(event)]
+
+    def close_stream(self, stream: EventStream):
+        self.event_streams.discard(stream)
 
+bus = create_bus(BROADCAST_BACKEND, BROADCAST_DB_FILE)
+fetch_lease = create_lease(BROADCAST_BACKEND, BROADCAST_DB_FILE, "fetch_scheduler", LEASE_TTL)
+# Held by whichever worker is refreshing, so a /fetch on one worker joins a refresh running on another
+fetch_run_lock = create_run_lock(BROADCAST_BACKEND, BROADCAST_DB_FILE, "fetch", LEASE_TTL)
 manager = ConnectionManager()
+bus.subscribe(manager.deliver)
+
+async def apply_bus_event(event):
+    """Keep per-worker state in sync with mutations made on other workers"""
+    if event.type in CONFIG_EVENTS:
+        message = json.loads(event.text)
+        if "config_version" in message:
+            refresh_rate = config.settings.get("refresh_rate")
+            await config.receive(event.type, message["data"], message["config_version"], read_config)
+            if config.settings.get("refresh_rate") != refresh_rate:
+                scheduler.reschedule()
+    if event.type == "fetch_complete":
+        # Schedule from actual completions, including manual and other workers' refreshes
+        scheduler.fetch_completed()
+        message = json.loads(event.text)
+        message.pop("type", None)
+        fetch_coordinator.completed_elsewhere(message)
+    elif event.type == "new_entries":
+        entry_window.add(json.loads(event.text)["data"])
+    elif event.type in ("feed_deleted", "feeds_deleted", "entries_pruned"):
+        await reload_entry_window()
+    elif event.type == "job_updated":
+        jobs.record(json.loads(event.text)["data"])
+
+bus.subscribe(apply_bus_event)
+
+metrics.registry.gauge("rss_websocket_connections", "Open /ws connections on this worker",
+                       function=lambda: len(manager.active_connections))
+metrics.registry.gauge("rss_event_streams", "Open /events streams on this worker",
+                       function=lambda: len(manager.event_streams))
+metrics.registry.gauge("rss_config_version", "Config version applied on this worker",
+                       function=lambda: config.version)
 
 # Database helper
+# Encodes compressed columns on insert and decodes them on read
+codec = ColumnCodec()
+
+storage = create_storage(STORAGE_MODE, DB_FILE, codec, SHARD_DIR, STORAGE_SHARDS)
+pruner = Pruner(
+    storage,
+    Policy(RETENTION_MAX_AGE_DAYS, RETENTION_MAX_ENTRIES),
+    batch_size=RETENTION_BATCH_SIZE,
+    archive_dir=RETENTION_ARCHIVE_DIR,
+)
+
+entry_window = EntryWindow(ENTRY_WINDOW_SIZE)
+metrics.registry.gauge("rss_entry_window_entries", "Entries held in the in-memory window",
+                       function=lambda: len(entry_window.entries))
+
+async def broadcast_job(job):
+    await manager.broadcast({"type": "job_updated", "data": job.to_dict()})
+
+jobs = JobRegistry(on_update=broadcast_job, keep=JOBS_KEEP)
+
+# Once serving, every mutation of the main database (API writes, stored entries, retention)
+# goes through its group-commit writer; only init_db's migrations and seeding write directly
+db_writer = get_writer(DB_FILE)
+
+websub = WebSubManager(
+    DB_FILE,
+    WEBSUB_CALLBACK_URL,
+    db_writer.execute,
+    lease_seconds=WEBSUB_LEASE_SECONDS,
+    renew_before=WEBSUB_RENEW_BEFORE,
+    safety_poll_interval=WEBSUB_SAFETY_POLL_INTERVAL,
+)
+
+def execute_write(conn, sql, params):
+    cursor = conn.execute(sql, params)
+    return cursor.rowcount, cursor.lastrowid
+
+async def db_write(sql, params=()):
+    """Run one write statement in the next group commit. Returns (rowcount, lastrowid)"""
+    return await db_writer.execute(execute_write, sql, params)
+
+def execute_config_write(conn, sql, params):
+    rowcount, lastrowid = execute_write(conn, sql, params)
+    version = bump_version(conn) if rowcount else None
+    return rowcount, lastrowid, version
+
+async def config_write(sql, params=()):
+    """Write to feeds, keywords or settings, bumping the config version if a row changed.
+
+    Returns (rowcount, lastrowid, version); pass the change to apply_config_change once it succeeded.
+    """
+    return await db_writer.execute(execute_config_write, sql, params)
+
+def execute_config_batch(conn, sql, params_list):
+    rowcounts = [conn.execute(sql, params).rowcount for params in params_list]
+    return rowcounts, bump_version(conn) if any(rowcounts) else None
+
+async def config_batch_write(sql, params_list):
+    """Run one statement per params in a single transaction, bumping the config version once.
+
+    Returns (rowcount per params, version).
+    """
+    if not params_list:
+        return [], None
+    return await db_writer.execute(execute_config_batch, sql, params_list, rows=len(params_list))
+
+async def apply_config_change(type, data, version):
+    """Write a committed change through to this worker's config store"""
+    await config.receive(type, data, version, read_config)
+
+def read_config():
+    conn = get_db()
+    try:
+        return read_snapshot(conn)
+    finally:
+        conn.close()
+
 def get_db():
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, factory=TimedConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -88,28 +342,8 @@ def init_db():
         )
     """)
     
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS entries (
-            id TEXT PRIMARY KEY,
-            feed_url TEXT,
-            title TEXT,
-            title_detail TEXT,
-            link TEXT,
-            links TEXT,
-            authors TEXT,
-            author TEXT,
-            author_detail TEXT,
-            published TEXT,
-            published_parsed TEXT,
-            published_parsed_tz TEXT,
-            tags TEXT,
-            guidislink INTEGER,
-            summary TEXT,
-            summary_detail TEXT,
-            content TEXT,
-            fetched_at TEXT
-        )
-    """)
+    c.execute(ENTRIES_SCHEMA.format(name="entries"))
+    c.execute(ENTRY_DETAILS_SCHEMA.format(name="entry_details"))
     
     c.execute("""
         CREATE TABLE IF NOT EXISTS settings (
@@ -126,6 +360,11 @@ def init_db():
     """)
     
     conn.commit()
+    # Older databases and seed snapshots still have the pre-split entries table
+    migrate(conn)
+    storage.init()
+    # Trained on entries wherever the layout keeps them, so after storage.init moved them there
+    codec.load(conn, COLUMN_COMPRESSION, storage)
     conn.close()
 def dump_database_to_file():
     """
@@ -162,125 +401,201 @@ def dump_database_to_file():
 # Replace 'your_database.db' with the path to your database file
 # Replace 'database_dump.sql' with your desired output file name
 
-def seed_initial_data():
+def print_startup_diagnostics():
+    """Dump environment and filesystem info, useful when debugging volume mounts"""
+    print(VOLUME_NAME)
+    print("=" * 50)
     print("SQLite Library Version:", sqlite3.sqlite_version)
-    print("pysqlite Wrapper Version:", sqlite3.version)
     print("MOUNT_PATH ", MOUNT_PATH)
     print("DB_FILE ", DB_FILE)
-    path = "."
-    print(f"--- Subdirectories in {os.path.abspath(path)} ---")
-    subdirs = []
-    try:
-        # Use os.scandir for efficiency
-        with os.scandir(path) as entries:
-            for entry in entries:
-                if entry.is_dir():
-                    subdirs.append(entry.name)
-                    print(entry.name)
-    except FileNotFoundError:
-        print(f"The directory '{path}' was not found.")
-    except PermissionError:
-        print(f"Permission denied for directory '{path}'.")
-    except OSError as e:
-        print(f"An OS error occurred: {e}")
-
-    """Seed database with initial data if empty"""
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    print("ENVIRONMENT VARIABLES:")
+    for key, value in os.environ.items():
+        if 'RAILWAY' in key or 'VOLUME' in key or 'MOUNT' in key:
+            print(f"{key} = {value}")
+    
+    print("\nROOT DIRECTORY CONTENTS:")
+    print(os.listdir('/'))
+    
+    if os.path.isdir('/app'):
+        print("\nAPP DIRECTORY CONTENTS:")
+        print(os.listdir('/app'))
+    
+    print("\nCURRENT WORKING DIRECTORY:")
+    print(os.getcwd())
+    
+    print("\nCHECKING MOUNT PATHS:")
+    possible_paths = ['/data', '/app/data', '/mnt/data', '/volume/data']
+    for path in possible_paths:
+        exists = os.path.exists(path)
+        print(f"{path}: {'EXISTS' if exists else 'NOT FOUND'}")
+        if exists:
+            print(f"  Contents: {os.listdir(path)}")
+            print(f"  Writable: {os.access(path, os.W_OK)}")
     
-    print("Seeding initial data...")
-    file_path = "seed.txt"  # Replace with your file's path
+    print("=" * 50)
 
+def seed_initial_data():
+    """Seed the database once per seed.txt version, restoring from a binary snapshot"""
     try:
-        with open(file_path, 'r') as file:
-            content = file.read()
-        conn.executescript(content)
-        conn.commit()
-        conn.close()
+        result = seed_database(DB_FILE)
     except Exception as e:
         print(f"Database seed Failed {e}")
         return
-    print("Database seeded successfully!")
+    print(f"Database seed {result}")
 
-# Helper function to sleep with interruption
-async def interruptible_sleep(event, seconds):
-    """Sleep but can be interrupted by event"""
-    try:
-        await asyncio.wait_for(event.wait(), timeout=seconds)
-        event.clear()  # Reset event
-        return True  # Was interrupted
-    except asyncio.TimeoutError:
-        return False  # Sleep completed normally
-
-def load_settings():
-    conn = get_db()
-    rows = conn.execute(
-        "SELECT name, value FROM settings"
-    ).fetchall()
-    conn.close()
-    if rows:
-        for row in rows:
-            state.settings[row[0]] = row[1]
+def load_config():
+    config.load(*read_config())
 
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of this worker's metrics"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+profile_lock = asyncio.Lock()
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def admin_profile(seconds: float = 5, format: str = "collapsed", sort: str = "cumulative"):
+    """Profile the running service for a few seconds.
+
+    format=collapsed samples every thread's stack (flamegraph input),
+    format=pstats returns a cProfile report of the event loop thread,
+    format=pstats-raw returns the binary pstats dump.
+    """
+    if not 0 < seconds <= 60:
+        raise HTTPException(status_code=400, detail="seconds must be between 0 and 60")
+    if format not in ("collapsed", "pstats", "pstats-raw"):
+        raise HTTPException(status_code=400, detail="format must be collapsed, pstats or pstats-raw")
+    if sort not in profiling.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(profiling.SORT_KEYS)}")
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with profile_lock:
+        if format == "collapsed":
+            return PlainTextResponse(await asyncio.to_thread(profiling.sample_stacks, seconds))
+        profiler = await profiling.profile_event_loop(seconds)
+    if format == "pstats":
+        return PlainTextResponse(profiling.format_pstats(profiler, sort))
+    return Response(profiling.dump_pstats(profiler), media_type="application/octet-stream",
+                    headers={"Content-Disposition": "attachment; filename=service.pstats"})
+
+@app.get("/admin/slow-ops", dependencies=[Depends(require_admin)])
+async def admin_slow_ops(kind: Optional[str] = None):
+    """Recent slow handlers, statements and fetches"""
+    return {"threshold_ms": slow_ops.threshold_ms, "entries": slow_ops.recent(kind)}
+
+@app.put("/admin/slow-ops", dependencies=[Depends(require_admin)])
+async def admin_set_slow_ops_threshold(threshold_ms: float):
+    """Change the slow-operation threshold at runtime; 0 disables the log"""
+    slow_ops.threshold_ms = threshold_ms
+    return {"threshold_ms": slow_ops.threshold_ms}
+
+@app.get("/health/startup")
+async def health_startup():
+    """Import and startup phase timings for this process"""
+    return profile.summary()
+
+@app.get("/ready")
+async def ready():
+    """200 once the database is open and caches are warm, 503 before that"""
+    body = {"ready": readiness.ready, "checks": readiness.checks}
+    return JSONResponse(body, status_code=200 if readiness.ready else 503)
+
 # WebSocket endpoint
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
+    limiter = asyncio.Semaphore(WS_MAX_CONCURRENCY)
+    pending = set()
+    commands = asyncio.Queue()  # Mutating messages, applied one at a time in arrival order
+    
+    async def reply(data, message):
+        """Send a response, echoing the client's request_id so pipelined requests can be matched"""
+        request_id = data.get("request_id")
+        if request_id is not None:
+            message["request_id"] = request_id
+        await websocket.send_json(message)
     
-    async def handle_ping():
+    def reply_when_done(data, job, success):
+        """Reply with success(job.result) or the job's error once it finishes, without holding up the command queue"""
+        async def wait():
+            await asyncio.shield(job.task)
+            try:
+                if job.status == SUCCEEDED:
+                    await reply(data, success(job.result))
+                else:
+                    await reply(data, {
+                        "type": "error",
+                        "message": job.error
+                    })
+            except (WebSocketDisconnect, ConnectionClosed):
+                pass  # Client went away before the job finished
+        
+        task = asyncio.create_task(wait())
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    
+    async def handle_ping(data):
         """Ping/pong for connection health"""
-        await websocket.send_json({"type": "pong"})
+        await reply(data, {"type": "pong"})
     
-    async def handle_get_feeds():
+    async def handle_get_feeds(data):
         """Get all feeds - reuses REST logic"""
         feeds = await get_feeds()
-        await websocket.send_json({"type": "feeds", "data": feeds})
+        await reply(data, {"type": "feeds", "data": feeds})
     
-    async def handle_get_keywords():
+    async def handle_get_keywords(data):
         """Get all keywords - reuses REST logic"""
         keywords = await get_keywords()
-        await websocket.send_json({"type": "keywords", "data": keywords})
+        await reply(data, {"type": "keywords", "data": keywords})
     
-    async def handle_get_entries():
+    async def handle_get_entries(data):
         """Get entries with optional keyword filter - reuses REST logic"""
         keyword = data.get("keyword")
         limit = data.get("limit", 100)
         entries = await get_entries(keyword=keyword, limit=limit)
-        await websocket.send_json({"type": "entries", "data": entries})
+        await reply(data, {"type": "entries", "data": entries})
     
-    async def handle_add_feed():
+    async def handle_add_feed(data):
         """Add a new feed - reuses REST logic"""
         url = data.get("url")
         if not url:
-            await websocket.send_json({
+            await reply(data, {
                 "type": "error",
                 "message": "URL is required"
             })
             return
         
         try:
-            feed = Feed(url=url)
-            result = await add_feed(feed)
-            # Broadcast already happens in add_feed
-            await websocket.send_json({
-                "type": "feed_added_success",
-                "data": result
-            })
+            job = start_add_feed(url)
         except HTTPException as e:
-            await websocket.send_json({
+            await reply(data, {
                 "type": "error",
                 "message": e.detail
             })
+            return
+        await reply(data, {"type": "job_accepted", "data": job.to_dict()})
+        
+        # Broadcasts already happen in the job
+        reply_when_done(data, job, lambda result: {
+            "type": "feed_added_success",
+            "data": {"id": result["id"], "url": url}
+        })
     
-    async def handle_delete_feed():
+    async def handle_delete_feed(data):
         """Delete a feed - reuses REST logic"""
         url = data.get("url")  # Changed from feed_id to url
         if not url:
-            await websocket.send_json({
+            await reply(data, {
                 "type": "error",
                 "message": "url is required"
             })
@@ -288,23 +603,23 @@ async def websocket_endpoint(websocket: WebSocket):
         
         try:
             result = await delete_feed_by_url(url)
-            await websocket.send_json({
+            await reply(data, {
                 "type": "feed_deleted_success",
                 "data": {"url": url}
             })
         except Exception as e:
-            await websocket.send_json({
+            await reply(data, {
                 "type": "error",
                 "message": str(e)
             })
     
-    async def handle_add_keyword():
+    async def handle_add_keyword(data):
         """Add a keyword - reuses REST logic"""
         word = data.get("word")
         keyword_type = data.get("keyword_type")
         
         if not word or not keyword_type:
-            await websocket.send_json({
+            await reply(data, {
                 "type": "error",
                 "message": "word and keyword_type are required"
             })
@@ -314,22 +629,22 @@ async def websocket_endpoint(websocket: WebSocket):
             keyword = Keyword(word=word, type=keyword_type)
             result = await add_keyword(keyword)
             # Broadcast already happens in add_keyword
-            await websocket.send_json({
+            await reply(data, {
                 "type": "keyword_added_success",
                 "data": result
             })
         except HTTPException as e:
-            await websocket.send_json({
+            await reply(data, {
                 "type": "error",
                 "message": e.detail
             })
     
-    async def handle_delete_keyword():
+    async def handle_delete_keyword(data):
         """Delete a keyword - reuses REST logic"""
         word = data.get("word")
         type = data.get("word_type")
         if not word or not type:
-            await websocket.send_json({
+            await reply(data, {
                 "type": "error",
                 "message": "word and type is required"
             })
@@ -337,26 +652,97 @@ async def websocket_endpoint(websocket: WebSocket):
         
         try:
             result = await delete_keyword(word)
-            await websocket.send_json({
+            await reply(data, {
                 "type": "keyword_deleted_success",
                 "data": {"word": word, "type": type}
             })
         except Exception as e:
-            await websocket.send_json({
+            await reply(data, {
                 "type": "error",
                 "message": str(e)
             })
     
-    async def handle_fetch_feeds():
-        """Trigger manual feed fetch"""
-        asyncio.create_task(fetch_and_broadcast())
-        await websocket.send_json({"type": "fetch_started"})
+    async def handle_import_feeds(data):
+        """Bulk-add feeds from an OPML document ("opml") or a list of URLs ("urls")"""
+        text = data["opml"] if isinstance(data.get("opml"), str) else json.dumps(data.get("urls") or [])
+        
+        async def progress(job, outcome):
+            """Per-feed progress goes to the requester only"""
+            try:
+                await reply(data, {"type": "import_progress", "job_id": job.id, **outcome})
+            except Exception:
+                pass  # The requester went away; the import carries on
+        
+        try:
+            job = start_import_feeds(text, on_progress=progress)
+        except HTTPException as e:
+            await reply(data, {
+                "type": "error",
+                "message": e.detail
+            })
+            return
+        await reply(data, {"type": "job_accepted", "data": job.to_dict()})
+        
+        # feeds_added is broadcast by the job
+        reply_when_done(data, job, lambda result: {"type": "import_result", "data": result})
+    
+    async def handle_batch(data, key, run):
+        """Run a batch endpoint on the list in data[key] and reply with its per-item results"""
+        items = data.get(key)
+        if not isinstance(items, list) or not items:
+            await reply(data, {
+                "type": "error",
+                "message": f"{key} must be a non-empty list"
+            })
+            return
+        try:
+            result = await run(items)
+        except (HTTPException, ValueError) as e:
+            await reply(data, {
+                "type": "error",
+                "message": e.detail if isinstance(e, HTTPException) else str(e)
+            })
+            return
+        # Broadcast already happens in the endpoint
+        await reply(data, {"type": f"{data['type']}_result", "data": result["results"]})
+    
+    async def handle_add_keywords(data):
+        """Add a list of {"word", "keyword_type"} in one transaction - reuses REST logic"""
+        def keyword(item):
+            if not isinstance(item, dict):
+                return Keyword(word="", type="")  # Reported as invalid
+            return Keyword(word=str(item.get("word") or ""), type=str(item.get("keyword_type") or item.get("type") or ""))
+        
+        await handle_batch(data, "keywords", lambda items: add_keywords([keyword(item) for item in items]))
+    
+    async def handle_delete_keywords(data):
+        """Delete a list of words in one transaction - reuses REST logic"""
+        await handle_batch(data, "words", lambda items: delete_keywords([str(word) for word in items]))
+    
+    async def handle_delete_feeds(data):
+        """Delete a list of feed URLs in one transaction - reuses REST logic"""
+        await handle_batch(data, "urls", lambda items: delete_feeds([str(url) for url in items]))
+    
+    async def handle_fetch_feeds(data):
+        """Trigger manual feed fetch, shared with any refresh already in flight"""
+        try:
+            status, run = await fetch_coordinator.trigger(f"ws:{id(websocket)}")
+        except RateLimited as e:
+            await reply(data, {
+                "type": "error",
+                "message": str(e),
+                "retry_after": round(e.retry_after, 1)
+            })
+            return
+        await reply(data, {"type": "fetch_started", "status": status, "fetch_id": run.id})
+        result = await asyncio.shield(run.future)
+        await reply(data, {"type": "fetch_result", "fetch_id": run.id, "data": result})
     
-    async def handle_get_setting():
+    async def handle_get_setting(data):
         """Get a setting - reuses REST logic"""
         name = data.get("name")
         if not name:
-            await websocket.send_json({
+            await reply(data, {
                 "type": "error",
                 "message": "setting name is required"
             })
@@ -364,23 +750,23 @@ async def websocket_endpoint(websocket: WebSocket):
         
         try:
             result = await get_setting(name)
-            await websocket.send_json({
+            await reply(data, {
                 "type": "setting",
                 "data": result
             })
         except HTTPException as e:
-            await websocket.send_json({
+            await reply(data, {
                 "type": "error",
                 "message": e.detail
             })
     
-    async def handle_save_setting():
+    async def handle_save_setting(data):
         """Save a setting - reuses REST logic"""
         name = data.get("name")
         value = data.get("value")
         
         if not name or value is None:
-            await websocket.send_json({
+            await reply(data, {
                 "type": "error",
                 "message": "name and value are required"
             })
@@ -390,12 +776,12 @@ async def websocket_endpoint(websocket: WebSocket):
             setting = Setting(name=name, value=value)
             await save_setting(setting)
             # Broadcast already happens in save_setting
-            await websocket.send_json({
+            await reply(data, {
                 "type": "setting_saved_success",
                 "data": {"name": name, "value": value}
             })
         except Exception as e:
-            await websocket.send_json({
+            await reply(data, {
                 "type": "error",
                 "message": str(e)
             })
@@ -408,69 +794,156 @@ async def websocket_endpoint(websocket: WebSocket):
         "get_entries": handle_get_entries,
         "add_feed": handle_add_feed,
         "delete_feed": handle_delete_feed,
+        "import_feeds": handle_import_feeds,
+        "add_feeds": handle_import_feeds,  # Validated and added like an import
+        "delete_feeds": handle_delete_feeds,
+        "add_keywords": handle_add_keywords,
+        "delete_keywords": handle_delete_keywords,
         "add_keyword": handle_add_keyword,
         "delete_keyword": handle_delete_keyword,
         "fetch_feeds": handle_fetch_feeds,
         "get_setting": handle_get_setting,
         "save_setting": handle_save_setting,
     }
+    # Messages that change nothing run concurrently; everything else goes through `commands`.
+    # fetch_feeds joins any refresh in flight, so it needn't wait behind (or hold up) mutations
+    concurrent_types = {"get_feeds", "get_keywords", "get_entries", "get_setting", "fetch_feeds"}
+    
+    def observe_message(data, started):
+        duration = time.perf_counter() - started
+        metrics.ws_message_seconds.observe(duration, data.get("type"))
+        slow_ops.record("ws", data.get("type"), duration, params=data)
     
+    async def run_handler(handler, data):
+        started = time.perf_counter()
+        try:
+            await handler(data)
+            observe_message(data, started)
+        except (WebSocketDisconnect, ConnectionClosed):
+            pass  # Client went away while the handler was running
+        except Exception as e:
+            print(f"WebSocket handler error: {e}")
+            traceback.print_exc()
+            try:
+                await reply(data, {"type": "error", "message": str(e)})
+            except Exception:
+                pass
+        finally:
+            limiter.release()
+    
+    async def run_commands():
+        while True:
+            handler, data = await commands.get()
+            await run_handler(handler, data)
+    
+    command_runner = asyncio.create_task(run_commands())
     try:
         while True:
             data = await websocket.receive_json()
             message_type = data.get("type")
             
             handler = handlers.get(message_type)
-            if handler:
-                await handler()
-            else:
-                await websocket.send_json({
+            if not handler:
+                await reply(data, {
                     "type": "error",
                     "message": f"Unknown message type: {message_type}"
                 })
+            elif message_type == "ping":
+                # Answer inline so health checks never queue behind slow handlers
+                started = time.perf_counter()
+                await handler(data)
+                observe_message(data, started)
+            else:
+                # Waiting on the limiter applies backpressure, queued commands included
+                await limiter.acquire()
+                if message_type in concurrent_types:
+                    task = asyncio.create_task(run_handler(handler, data))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                else:
+                    commands.put_nowait((handler, data))
                 
-    except WebSocketDisconnect:
+    except (WebSocketDisconnect, ConnectionClosed):
         manager.disconnect(websocket)
     except Exception as e:
         print(f"WebSocket error: {e}")
         traceback.print_exc()
         manager.disconnect(websocket)
+    finally:
+        command_runner.cancel()
+        for task in list(pending):
+            task.cancel()
 
-# REST endpoints (still available for non-WebSocket clients)
-@app.on_event("startup")
-async def startup():
-    print(VOLUME_NAME)
-    # Debug: Print environment and filesystem info
-    print("=" * 50)
-    print("ENVIRONMENT VARIABLES:")
-    for key, value in os.environ.items():
-        if 'RAILWAY' in key or 'VOLUME' in key or 'MOUNT' in key:
-            print(f"{key} = {value}")
-    
-    print("\nROOT DIRECTORY CONTENTS:")
-    print(os.listdir('/'))
-    
-    print("\nAPP DIRECTORY CONTENTS:")
-    print(os.listdir('/app'))
+# Server-Sent Events endpoint for read-only listeners
+@app.get("/events")
+async def events(request: Request, types: Optional[str] = None, feed_url: Optional[str] = None):
+    """Stream broadcast events as SSE. Filter with ?types=new_entries,fetch_complete and ?feed_url=..."""
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
     
-    print("\nCURRENT WORKING DIRECTORY:")
-    print(os.getcwd())
+    stream = EventStream(set(types.split(",")) if types else None, feed_url)
+    missed = manager.open_stream(stream, last_event_id)
     
-    print("\nCHECKING MOUNT PATHS:")
-    possible_paths = ['/data', '/app/data', '/mnt/data', '/volume/data']
-    for path in possible_paths:
-        exists = os.path.exists(path)
-        print(f"{path}: {'EXISTS' if exists else 'NOT FOUND'}")
-        if exists:
-            print(f"  Contents: {os.listdir(path)}")
-            print(f"  Writable: {os.access(path, os.W_OK)}")
+    async def generate():
+        try:
+            yield "retry: 3000\n\n"
+            for event in missed:
+                yield event.sse()
+            while stream.queue is not None:
+                try:
+                    event = await asyncio.wait_for(stream.queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield event.sse()
+        finally:
+            manager.close_stream(stream)
     
-    print("=" * 50)
+    return StreamingResponse(generate(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+# REST endpoints (still available for non-WebSocket clients)
+@app.on_event("startup")
+async def startup():
+    if STARTUP_DIAGNOSTICS:
+        with profile.phase("diagnostics"):
+            print_startup_diagnostics()
     #dump_database_to_file()
-    seed_initial_data()  # Add this line
-    init_db()
-    load_settings()
-    asyncio.create_task(background_fetch_loop())
+    with profile.phase("seed_initial_data"):
+        seed_initial_data()
+    with profile.phase("init_db"):
+        init_db()
+        readiness.mark("database")
+    with profile.phase("load_config"):
+        load_config()
+        readiness.mark("config")
+    with profile.phase("warm_entry_window"):
+        await reload_entry_window()
+        readiness.mark("entry_window")
+    with profile.phase("start_bus"):
+        await bus.start()
+        await fetch_lease.start()
+    with profile.phase("schedule_fetch_loop"):
+        asyncio.create_task(scheduler.run(initial_delay=10))  # Wait for startup
+        asyncio.create_task(pruner.run(fetch_lease, RETENTION_INTERVAL, initial_delay=60, on_pruned=announce_pruned))
+        if websub.enabled:
+            asyncio.create_task(websub.run(
+                fetch_lease, lambda: fetcher.create_session(FETCH_TIMEOUT), lambda: config.feeds, WEBSUB_CHECK_INTERVAL
+            ))
+    profile.complete()
+    profile.log()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await fetch_lease.stop()
+    await bus.stop()
+    await asyncio.to_thread(stop_writers)
 
 @app.get("/")
 async def root():
@@ -482,369 +955,688 @@ async def root():
 
 @app.get("/feeds", response_model=List[Feed])
 async def get_feeds():
-    feeds = get_feeds_from_db()
-    return feeds
+    return [{"url": url} for url in config.feeds]
 
-@app.post("/feeds", response_model=Feed)
-async def add_feed(feed: Feed):
-    conn = get_db()
-    
-    parsed_feed = feedparser.parse(feed.url)
-    if not parsed_feed.entries:
-        raise HTTPException(status_code=400, detail="The provided URL does not appear to be a valid RSS/Atom feed.")
-    try:
-        cursor = conn.execute("INSERT INTO feeds (url) VALUES (?)", (feed.url,))
-        conn.commit()
-        feed_id = cursor.lastrowid
-        
-        # Notify all WebSocket clients
-        await manager.broadcast({
-            "type": "feed_added",
-            "data": {"id": feed_id, "url": feed.url}
-        })
-        
-        conn.close()
-        return {"id": feed_id, "url": feed.url}
-    except sqlite3.IntegrityError:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Feed already exists")
+@app.post("/feeds", status_code=202)
+async def add_feed(feed: Feed, response: Response):
+    """Start adding a feed; poll /jobs/{id} or watch job_updated events for the outcome"""
+    job = start_add_feed(feed.url)
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job.to_dict()
+
+@app.get("/feeds/export")
+async def export_feeds():
+    """All feeds as an OPML document"""
+    return Response(build_opml(config.feeds), media_type="text/x-opml", headers={
+        "Content-Disposition": "attachment; filename=feeds.opml",
+    })
+
+@app.post("/feeds/import", status_code=202)
+async def import_feeds(request: Request, response: Response):
+    """Start adding feeds from an OPML document, a JSON array of URLs or one URL per line.
+
+    Poll the job at /jobs/{id} for progress; its result has every feed's outcome.
+    """
+    body = await request.body()
+    job = start_import_feeds(body.decode("utf-8", errors="replace"))
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job.to_dict()
+
+@app.get("/websub")
+async def get_websub():
+    """Hub subscriptions of pushed feeds"""
+    return {
+        "enabled": websub.enabled,
+        "callback_url": websub.callback_url,
+        "subscriptions": await asyncio.to_thread(websub.subscriptions),
+    }
+
+@app.get("/websub/callback/{sub_id}")
+async def websub_verify(sub_id: str, request: Request):
+    """Hub verification of intent: echo hub.challenge for subscriptions we asked for"""
+    challenge = await websub.verify(sub_id, dict(request.query_params))
+    if challenge is None:
+        raise HTTPException(status_code=404, detail="Unknown subscription")
+    return PlainTextResponse(challenge)
+
+@app.post("/websub/callback/{sub_id}", status_code=202)
+async def websub_push(sub_id: str, request: Request):
+    """Content pushed by a hub, ingested and broadcast like a polled feed"""
+    body = await request.body()
+    sub = await asyncio.to_thread(websub.get, sub_id)
+    if sub is None or not config.has_feed(sub["feed_url"]):
+        metrics.websub_pushes.inc("unknown")
+        # 410 tells the hub to drop the subscription
+        raise HTTPException(status_code=410, detail="Unknown subscription")
+    if not websub.authentic(sub, body, request.headers.get("x-hub-signature")):
+        # Hubs must get a 2xx either way; unsigned or forged content is just ignored
+        metrics.websub_pushes.inc("rejected")
+        print(f"Ignored WebSub push for {sub['feed_url']} with a bad signature")
+        return {"status": "ignored"}
+    metrics.websub_pushes.inc("accepted")
+    new_entries = await ingest_pushed(sub["feed_url"], body, dict(request.headers))
+    await websub.pushed(sub_id)
+    return {"status": "accepted", "new_entries": len(new_entries)}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 @app.delete("/feeds/by-url")
 async def delete_feed_by_url(url: str):
     """Delete a feed by URL"""
-    conn = get_db()
-    
-    # Delete the feed
-    conn.execute("DELETE FROM feeds WHERE url = ?", (url,))
-    conn.commit()
+    if not config.has_feed(url):
+        raise HTTPException(status_code=404, detail="Feed not found")
 
-    #if rowcount 0 nothing deleted
-    deleted = conn.cursor().rowcount
-    
-    conn.close()
+    # Delete the feed
+    deleted, _, version = await config_write("DELETE FROM feeds WHERE url = ?", (url,))
     if not deleted:
         raise HTTPException(status_code=404, detail="Feed not found")
+    await apply_config_change("feed_deleted", {"url": url}, version)
+
+    # Its entries go too (archived first if archiving is on), in batches
+    entries_removed = await asyncio.to_thread(pruner.remove_feed, url)
     
     # Notify all WebSocket clients
     await manager.broadcast({
         "type": "feed_deleted",
-        "data": {"url": url}
+        "data": {"url": url, "entries_removed": entries_removed},
+        "config_version": version
     })
     
-    return {"status": "deleted", "url": url}
+    return {"status": "deleted", "url": url, "entries_removed": entries_removed}
+
+@app.post("/feeds/batch-delete")
+async def delete_feeds(urls: List[str]):
+    """Delete many feeds in one transaction with one feeds_deleted event. Returns per-feed results"""
+    check_batch_size(urls)
+    urls = list(dict.fromkeys(urls))
+    known = [url for url in urls if config.has_feed(url)]
+    rowcounts, version = await config_batch_write("DELETE FROM feeds WHERE url = ?", [(url,) for url in known])
+    deleted = [url for url, rowcount in zip(known, rowcounts) if rowcount]
+    results = {url: {"url": url, "status": "not_found"} for url in urls}
+    if deleted:
+        await apply_config_change("feeds_deleted", {"feeds": [{"url": url} for url in deleted]}, version)
+
+        # Their entries go too (archived first if archiving is on), in batches
+        entries_removed = await asyncio.to_thread(lambda: {url: pruner.remove_feed(url) for url in deleted})
+        feeds = [{"url": url, "entries_removed": entries_removed[url]} for url in deleted]
+        for feed in feeds:
+            results[feed["url"]] = {**feed, "status": "deleted"}
+        
+        # Notify all WebSocket clients
+        await manager.broadcast({
+            "type": "feeds_deleted",
+            "data": {"feeds": feeds},
+            "config_version": version
+        })
+    return {"results": list(results.values())}
+
+@app.put("/feeds/retention")
+async def set_feed_retention(url: str, policy: RetentionPolicy):
+    """Override the retention limits of one feed; null inherits the default, 0 is unlimited"""
+    if not config.has_feed(url):
+        raise HTTPException(status_code=404, detail="Feed not found")
+    updated, _, version = await config_write(
+        "UPDATE feeds SET max_age_days = ?, max_entries = ? WHERE url = ?",
+        (policy.max_age_days, policy.max_entries, url),
+    )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Feed not found")
+    data = {"url": url, **policy.model_dump()}
+    await apply_config_change("feed_retention_updated", data, version)
+    await manager.broadcast({
+        "type": "feed_retention_updated",
+        "data": data,
+        "config_version": version
+    })
+    return data
+
+@app.get("/retention")
+async def get_retention():
+    """Default policy, per-feed overrides and the result of the last pruning run"""
+    overrides = {
+        url: {"max_age_days": feed["max_age_days"], "max_entries": feed["max_entries"]}
+        for url, feed in config.feeds.items()
+        if feed["max_age_days"] is not None or feed["max_entries"] is not None
+    }
+    return {**pruner.status(), "feed_overrides": overrides}
+
+@app.post("/retention/run", dependencies=[Depends(require_admin)])
+async def run_retention():
+    """Prune now instead of waiting for the next scheduled run"""
+    result = await asyncio.to_thread(pruner.prune)
+    if removed_any(result):
+        await announce_pruned(result)
+    return result
 
 @app.get("/keywords", response_model=List[Keyword])
 async def get_keywords():
     """Get all keywords"""
-    return get_keywords_from_db()
+    return [{"word": word, "type": type} for word, type in config.keywords.items()]
 
 @app.post("/keywords", response_model=Keyword)
 async def add_keyword(keyword: Keyword):
     """Add a new keyword"""
-    conn = get_db()
-                
     if keyword.word and keyword.type:
+        if config.has_keyword(keyword.word):
+            raise HTTPException(status_code=400, detail="Keyword already exists")
         try:
-            conn.execute(
+            _, _, version = await config_write(
                 "INSERT INTO keywords (word, type) VALUES (?, ?)",
                 (keyword.word, keyword.type)
             )
-            conn.commit()
-            conn.close()
-            
-            # Notify all WebSocket clients
-            await manager.broadcast({
-                "type": "keyword_added",
-                "data": {"word": keyword.word, "type": keyword.type}
-            })
-            
-            return {"word": keyword.word, "type": keyword.type}
         except Exception as e:
-            conn.close()
             raise HTTPException(status_code=400, detail=str(e))
+        data = {"word": keyword.word, "type": keyword.type}
+        await apply_config_change("keyword_added", data, version)
+            
+        # Notify all WebSocket clients
+        await manager.broadcast({
+            "type": "keyword_added",
+            "data": data,
+            "config_version": version
+        })
+        
+        return {"word": keyword.word, "type": keyword.type}
     
+@app.post("/keywords/batch")
+async def add_keywords(keywords: List[Keyword]):
+    """Add many keywords in one transaction with one keywords_added event. Returns per-keyword results"""
+    check_batch_size(keywords)
+    results, pending = [], {}
+    for keyword in keywords:
+        result = {"word": keyword.word, "type": keyword.type}
+        if not keyword.word or not keyword.type:
+            result.update(status="invalid", error="word and type are required")
+        elif config.has_keyword(keyword.word) or keyword.word in pending:
+            result.update(status="exists", error="Keyword already exists")
+        else:
+            pending[keyword.word] = result
+        results.append(result)
+    rowcounts, version = await config_batch_write(
+        "INSERT OR IGNORE INTO keywords (word, type) VALUES (?, ?)",
+        [(word, result["type"]) for word, result in pending.items()]
+    )
+    added = []
+    for result, rowcount in zip(pending.values(), rowcounts):
+        if rowcount:
+            result["status"] = "added"
+            added.append({"word": result["word"], "type": result["type"]})
+        else:
+            result.update(status="exists", error="Keyword already exists")  # Added by someone else meanwhile
+    if added:
+        data = {"keywords": added}
+        await apply_config_change("keywords_added", data, version)
+        
+        # Notify all WebSocket clients
+        await manager.broadcast({
+            "type": "keywords_added",
+            "data": data,
+            "config_version": version
+        })
+    return {"results": results}
+
+@app.post("/keywords/batch-delete")
+async def delete_keywords(words: List[str]):
+    """Delete many keywords in one transaction with one keywords_deleted event. Returns per-keyword results"""
+    check_batch_size(words)
+    words = list(dict.fromkeys(words))
+    known = [word for word in words if config.has_keyword(word)]
+    rowcounts, version = await config_batch_write("DELETE FROM keywords WHERE word = ?", [(word,) for word in known])
+    deleted = [{"word": word, "type": config.keywords[word]} for word, rowcount in zip(known, rowcounts) if rowcount]
+    results = {word: {"word": word, "status": "not_found"} for word in words}
+    for keyword in deleted:
+        results[keyword["word"]] = {**keyword, "status": "deleted"}
+    if deleted:
+        data = {"keywords": deleted}
+        await apply_config_change("keywords_deleted", data, version)
+        
+        # Notify all WebSocket clients
+        await manager.broadcast({
+            "type": "keywords_deleted",
+            "data": data,
+            "config_version": version
+        })
+    return {"results": list(results.values())}
+
+def check_batch_size(items):
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+
 @app.delete("/keywords/{word}")
 async def delete_keyword(word: str):
     """Delete a keyword"""
-    conn = get_db()
-
-    conn.execute("DELETE FROM keywords WHERE word = ?", (word,))
-    conn.commit()
-
-    #if rowcount 0 nothing deleted
-    deleted = conn.cursor().rowcount
-    
-    conn.close()
+    if not config.has_keyword(word):
+        raise HTTPException(status_code=404, detail="Keyword not found")
+    deleted, _, version = await config_write("DELETE FROM keywords WHERE word = ?", (word,))
     if not deleted:
         raise HTTPException(status_code=404, detail="Keyword not found")
+    await apply_config_change("keyword_deleted", {"word": word}, version)
     
     # Notify all WebSocket clients
     await manager.broadcast({
         "type": "keyword_deleted",
-        "data": {"word": word}
+        "data": {"word": word},
+        "config_version": version
     })
     
     return {"status": "deleted", "word": word}
 
 @app.get("/entries", response_model=List[Entry])
 async def get_entries(keyword: Optional[str] = None, limit: int = 100):
-    return get_entries_from_db(keyword, limit)
+    entries = entry_window.query(keyword, limit)
+    if entries is None:
+        # Deeper than the window, or the window is reloading
+        entries = await asyncio.to_thread(get_entries_from_db, keyword, limit)
+        metrics.entry_reads.inc("database")
+    else:
+        metrics.entry_reads.inc("window")
+    profile.first_request("/entries")
+    return entries
+
+@app.get("/entries/export")
+async def export_entries(keyword: Optional[str] = None, limit: Optional[int] = None, format: str = "json"):
+    """Stream entries (all by default) as a JSON array or, with format=ndjson, one object per line"""
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    return StreamingResponse(iter_entries_export(keyword, limit, format), media_type=media_type, headers={
+        "Content-Disposition": f"attachment; filename=entries.{format}",
+    })
+
+# Declared after /entries/export, since ids are URLs and the path converter would match "export" too
+@app.get("/entries/{entry_id:path}", response_model=EntryDetail)
+async def get_entry(entry_id: str):
+    """Full entry, including the detail fields left out of list responses"""
+    entry = await asyncio.to_thread(get_entry_detail_from_db, entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return entry
 
 @app.post("/fetch")
-async def trigger_fetch():
-    asyncio.create_task(fetch_and_broadcast())
-    return {"status": "fetch triggered"}
+async def trigger_fetch(request: Request, wait: bool = False):
+    """Trigger a refresh; with wait=true, respond with the shared result once it finishes"""
+    client_id = f"http:{request.client.host}" if request.client else "http"
+    try:
+        status, run = await fetch_coordinator.trigger(client_id)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after) + 1)}
+        )
+    response = {"status": "fetch triggered", "fetch": status, "fetch_id": run.id}
+    if wait:
+        response["result"] = await asyncio.shield(run.future)
+    return response
+
+@app.get("/scheduler")
+async def get_scheduler():
+    """Scheduled refresh status: interval, last completed run and next due run"""
+    return {**scheduler.status(), "running": fetch_coordinator.running}
 
 @app.get("/settings/{name}")
 async def get_setting(name: str):
-    conn = get_db()
-    row = conn.execute("SELECT value FROM settings WHERE name = ?", (name,)).fetchone()
-    conn.close()
-    if row:
-        return {"name": name, "value": row["value"]}
+    if name in config.settings:
+        return {"name": name, "value": config.settings[name]}
     raise HTTPException(status_code=404, detail="Setting not found")
 
 @app.put("/settings")
 async def save_setting(setting: Setting):
-    conn = get_db()
-    conn.execute(
+    _, _, version = await config_write(
         "INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)",
         (setting.name, setting.value)
     )
-    conn.commit()
-    conn.close()
+    data = {"name": setting.name, "value": setting.value}
+    await apply_config_change("setting_updated", data, version)
 
     if setting.name == "refresh_rate":
-        state.settings["refresh_rate"] = setting.value
+        scheduler.reschedule()
     
     # Notify all WebSocket clients
     await manager.broadcast({
         "type": "setting_updated",
-        "data": {"name": setting.name, "value": setting.value}
+        "data": data,
+        "config_version": version
     })
     
     return {"status": "saved"}
 
 # Helper functions
-def get_feeds_from_db():
-    conn = get_db()
-    rows = conn.execute("SELECT id, url FROM feeds").fetchall()
-    conn.close()
-    return [{"url": row["url"]} for row in rows]
+def get_entries_from_db(keyword: Optional[str] = None, limit: int = 100):
+    return [codec.decode_row(LIST_COLUMNS, row) for row in storage.iter_newest(keyword, limit)]
 
-def get_keywords_from_db():
-    conn = get_db()
-    rows = conn.execute("SELECT word, type FROM keywords").fetchall()
-    conn.close()
-    return [{"word": row["word"], "type": row["type"]} for row in rows]
+async def reload_entry_window():
+    await entry_window.reload(lambda limit: get_entries_from_db(limit=limit))
 
-def get_entries_from_db(keyword: Optional[str] = None, limit: int = 100):
-    conn = get_db()
-    
-    if keyword:
-        query = """
-            SELECT id, feed_url, title, link, published, published_parsed_tz, summary
-            FROM entries
-            WHERE title LIKE ?
-            ORDER BY published_parsed_tz DESC
-            LIMIT ?
-        """
-        rows = conn.execute(query, (f"%{keyword}%", limit)).fetchall()
-    else:
-        query = """
-            SELECT id, feed_url, title, link, published, published_parsed_tz, summary
-            FROM entries
-            ORDER BY published_parsed_tz DESC
-            LIMIT ?
-        """
-        rows = conn.execute(query, (limit,)).fetchall()
-    
-    conn.close()
-    
-    state.time_since_refresh = time.time()
-
-    return [
-        {
-            "id": row["id"],
-            "feed_url": row["feed_url"],
-            "title": row["title"],
-            "link": row["link"],
-            "published": row["published"],
-            "published_parsed_tz": row["published_parsed_tz"],
-            "summary": row["summary"]
-        }
-        for row in rows
-    ]
-
-async def fetch_and_broadcast():
-    """Fetch feeds and broadcast updates to clients"""
-    # Notify clients that fetch is starting
+async def announce_pruned(result):
+    """Tell clients and every worker's entry window that retention removed entries"""
+    await manager.broadcast({"type": "entries_pruned", "data": result})
+
+def get_entry_detail_from_db(entry_id: str):
+    """One entry with its detail columns, JSON fields decoded; None if unknown"""
+    found = storage.get(entry_id)
+    if found is None:
+        return None
+    entry = decode_json_columns(codec.decode_row(*found))
+    if entry["guidislink"] is not None:
+        entry["guidislink"] = bool(entry["guidislink"])
+    return entry
+
+def iter_entries_export(keyword: Optional[str], limit: Optional[int], format: str):
+    """Encode matching entries chunk by chunk as a JSON array or NDJSON.
+
+    Rows are pulled from storage EXPORT_CHUNK_SIZE at a time, so memory stays
+    constant however many rows are exported. Starlette advances the generator
+    from its threadpool, hence check_same_thread=False.
+    """
+    rows = storage.iter_newest(keyword, limit, check_same_thread=False)
+    try:
+        encode = json.JSONEncoder().encode
+        separator = "\n" if format == "ndjson" else ","
+        first = True
+        if format == "json":
+            yield "["
+        while True:
+            chunk_rows = list(islice(rows, EXPORT_CHUNK_SIZE))
+            if not chunk_rows:
+                break
+            chunk = separator.join(encode(codec.decode_row(LIST_COLUMNS, row)) for row in chunk_rows)
+            if format == "ndjson":
+                yield chunk + "\n"
+            else:
+                yield chunk if first else separator + chunk
+            first = False
+        if format == "json":
+            yield "]"
+    finally:
+        rows.close()
+
+async def store_new_entries(feed_url, entries):
+    """Normalize a feed's entries and save the ones not yet stored in the next group commit. Returns the new records"""
+    records = await asyncio.to_thread(normalize_entries, entries, feed_url)
+    return await storage.write(records)
+
+def start_add_feed(url):
+    """Start (or join) the background job adding url"""
+    # Checked before downloading the feed; the UNIQUE constraint still has the last word
+    if config.has_feed(url):
+        raise HTTPException(status_code=400, detail="Feed already exists")
+    return jobs.active("add_feed", url) or jobs.start("add_feed", url, lambda job: add_feed_job(url))
+
+async def add_feed_job(url):
+    """Validate a feed with the async fetcher, add it and ingest the entries already parsed"""
+    async with fetcher.create_session(FETCH_TIMEOUT) as session:
+        result = await fetcher.fetch_feed(session, url)
+    if result.error:
+        raise JobError(f"Could not fetch the feed: {result.error}")
+    if not result.entries:
+        raise JobError("The provided URL does not appear to be a valid RSS/Atom feed.")
+    metrics.feed_download_seconds.observe(result.download_time, url)
+    metrics.feed_parse_seconds.observe(result.parse_time, url)
+    try:
+        _, feed_id, version = await config_write("INSERT INTO feeds (url) VALUES (?)", (url,))
+    except sqlite3.IntegrityError:
+        raise JobError("Feed already exists")
+    data = {"id": feed_id, "url": url}
+    await apply_config_change("feed_added", data, version)
+
+    # Notify all WebSocket clients
     await manager.broadcast({
-        "type": "fetch_started",
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "type": "feed_added",
+        "data": data,
+        "config_version": version
     })
-    
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.execute("SELECT url FROM feeds")
-    urls = [row[0] for row in cursor.fetchall()]
-    
-    new_entries_count = 0
-    new_entries = []
+
+    new_entries = await store_new_entries(url, result.entries)
+    await broadcast_new_entries(url, new_entries)
+    if websub.enabled:
+        async with fetcher.create_session(FETCH_TIMEOUT) as session:
+            await discover_hub(session, url, result.parsed)
+    return {**data, "entries": len(result.entries), "new_entries": len(new_entries)}
+
+def start_import_feeds(text, on_progress=None):
+    """Start the background job importing the feeds listed in text.
+
+    on_progress, if given, is awaited with (job, outcome) as each feed is validated.
+    """
+    try:
+        urls = parse_feed_urls(text)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not urls:
+        raise HTTPException(status_code=400, detail="No feed URLs found")
+    if len(urls) > FEED_IMPORT_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {FEED_IMPORT_MAX} feeds can be imported at once")
+    return jobs.start("import_feeds", None, lambda job: import_feeds_job(job, urls, on_progress))
+
+def insert_feeds(conn, urls):
+    """Insert the feeds not stored yet, bumping the config version once. Returns (added, version)"""
+    added = []
     for url in urls:
-        try:
-            feed = feedparser.parse(url)
-            for entry in feed.entries:
-                # Check if entry is new
-                entry_id = entry.get("id") 
-                
-                existing = conn.execute(
-                    "SELECT id FROM entries WHERE id = ?", 
-                    (entry_id,)
-                ).fetchone()
-                
-                if not existing:
-                    save_entry(conn, url, entry)
-                    new_entries_count += 1
-                    new_entries.append(entry)
+        cursor = conn.execute("INSERT OR IGNORE INTO feeds (url) VALUES (?)", (url,))
+        if cursor.rowcount:
+            added.append({"id": cursor.lastrowid, "url": url})
+    return added, bump_version(conn) if added else None
 
-        except Exception as e:
-            print(f"Error fetching {url}: {e}")
-    
-    conn.commit()
-    conn.close()
-    
-    state.time_since_refresh = time.time()
-    # Notify clients that fetch is complete
-    await manager.broadcast({
-        "type": "fetch_complete",
-        "new_entries": new_entries_count,
-        "timestamp": datetime.now(timezone.utc).isoformat()
-    })
+async def import_feeds_job(job, urls, on_progress=None):
+    """Validate feeds concurrently, add the valid ones in one transaction and ingest their entries"""
+    outcomes = {}  # url -> {"url", "status", "error"}
+    parsed = {}  # url -> FeedResult of the valid feeds
+    limiter = asyncio.Semaphore(FEED_IMPORT_CONCURRENCY)
+    job.progress = {"done": 0, "total": len(urls)}
 
-    await manager.broadcast({
-        "type": "new_entries",
-        "data": new_entries
-    })
+    async def validate(session, url):
+        if config.has_feed(url):
+            return url, None, "Feed already exists"
+        if not url.startswith(("http://", "https://")):
+            return url, None, "Not an http(s) URL"
+        async with limiter:
+            result = await fetcher.fetch_feed(session, url)
+        if result.error:
+            return url, None, f"Could not fetch the feed: {result.error}"
+        if not result.entries:
+            return url, None, "Not a valid RSS/Atom feed"
+        return url, result, None
 
-def entry_to_dict(entry, feed_url):
-    """Convert entry to dict for broadcasting"""
-    def attr(e, name, default=""):
-        try:
-            return e.get(name, default) if isinstance(e, dict) else getattr(e, name, default)
-        except Exception:
-            return default
-    
-    published_parsed_tz_iso = None
-    if attr(entry, "published", ""):
-        try:
-            dt = parsedate_to_datetime(attr(entry, "published"))
-            published_parsed_tz_iso = dt.astimezone(timezone.utc).isoformat()
-        except Exception:
-            pass
-    
+    async with fetcher.create_session(FETCH_TIMEOUT) as session:
+        for finished in asyncio.as_completed([validate(session, url) for url in urls]):
+            url, result, error = await finished
+            if result is not None:
+                parsed[url] = result
+            status = "valid" if result is not None else "exists" if error == "Feed already exists" else "invalid"
+            outcomes[url] = {"url": url, "status": status, "error": error}
+            job.progress["done"] += 1
+            if on_progress is not None:
+                await on_progress(job, {"feed_url": url, **job.progress, "status": status, "error": error})
+
+    valid = [url for url in urls if url in parsed]
+    added, version = await db_writer.execute(insert_feeds, valid, rows=len(valid)) if valid else ([], None)
+    if added:
+        data = {"feeds": added, "job_id": job.id}
+        await apply_config_change("feeds_added", data, version)
+        # One event for the whole import instead of a feed_added per feed
+        await manager.broadcast({"type": "feeds_added", "data": data, "config_version": version})
+    added_urls = {feed["url"] for feed in added}
+    for url in valid:
+        if url in added_urls:
+            outcomes[url].update(status="added", new_entries=0)
+        else:
+            outcomes[url].update(status="exists", error="Feed already exists")  # Added by someone else meanwhile
+
+    # Ingest the entries validation already parsed, in one write
+    records = await asyncio.to_thread(lambda: [
+        record for feed in added for record in normalize_entries(parsed[feed["url"]].entries, feed["url"])
+    ])
+    new_entries = defaultdict(list)
+    for record in await storage.write(records):
+        new_entries[record.feed_url].append(record)
+    for url, feed_records in new_entries.items():
+        outcomes[url]["new_entries"] = len(feed_records)
+        await broadcast_new_entries(url, feed_records)
+
+    feeds = [outcomes[url] for url in urls]
     return {
-        "id": attr(entry, "id") or attr(entry, "guid") or attr(entry, "link", ""),
-        "feed_url": feed_url,
-        "title": attr(entry, "title", ""),
-        "link": attr(entry, "link", ""),
-        "published": attr(entry, "published", ""),
-        "published_parsed_tz": published_parsed_tz_iso,
-        "summary": attr(entry, "summary", "")
+        "total": len(urls),
+        **{status: sum(feed["status"] == status for feed in feeds) for status in ("added", "exists", "invalid")},
+        "feeds": feeds,
     }
 
-def save_entry(conn, feed_url, entry):
-    """Save entry to database"""
-    def attr(e, name, default=""):
-        try:
-            return e.get(name, default) if isinstance(e, dict) else getattr(e, name, default)
-        except Exception:
-            return default
-    
-    def to_json(attr_name):
+async def ingest_pushed(feed_url, body, headers):
+    """Parse pushed content, store its new entries and broadcast them like a refresh would"""
+    started = time.perf_counter()
+    parsed = await asyncio.to_thread(fetcher.parse, body, {key.lower(): value for key, value in headers.items()})
+    metrics.feed_parse_seconds.observe(time.perf_counter() - started, feed_url)
+    new_entries = await store_new_entries(feed_url, parsed.entries)
+    await broadcast_new_entries(feed_url, new_entries)
+    return new_entries
+
+async def discover_hub(session, feed_url, parsed):
+    """Subscribe to the WebSub hub of a freshly fetched feed, if it has one"""
+    try:
+        await websub.discover(session, feed_url, parsed)
+    except Exception as e:
+        print(f"WebSub discovery for {feed_url} failed: {e}")
+
+async def broadcast_new_entries(feed_url, records, fetch_id: Optional[int] = None):
+    # Bound message size so one busy feed can't produce a huge frame
+    for i in range(0, len(records), NEW_ENTRIES_CHUNK_SIZE):
+        await manager.broadcast({
+            "type": "new_entries",
+            "fetch_id": fetch_id,
+            "feed_url": feed_url,
+            "data": [record.to_dict() for record in records[i:i + NEW_ENTRIES_CHUNK_SIZE]]
+        })
+
+async def fetch_and_store_feed(session, url):
+    """Fetch one feed, commit its new entries and return them with a progress report"""
+    started = time.perf_counter()
+    result = await fetcher.fetch_feed(session, url)
+    new_entries = []
+    store_time = 0.0
+    if result.error:
+        print(f"Error fetching {url}: {result.error}")
+    else:
+        metrics.feed_download_seconds.observe(result.download_time, url)
+        metrics.feed_parse_seconds.observe(result.parse_time, url)
+        stored = time.perf_counter()
         try:
-            val = attr(entry, attr_name)
-            return json.dumps(val) if val else None
-        except Exception:
-            return None
+            new_entries = await store_new_entries(url, result.entries)
+        except Exception as e:
+            print(f"Error storing {url}: {e}")
+            result.error = str(e)
+        store_time = time.perf_counter() - stored
+        await discover_hub(session, url, result.parsed)
+    if result.error:
+        metrics.feed_errors.inc(url)
+    total_time = time.perf_counter() - started
+    progress = {
+        "feed_url": url,
+        "entries": len(result.entries),
+        "new_entries": len(new_entries),
+        "error": result.error,
+        "timings_ms": {
+            "download": round(result.download_time * 1000, 1),
+            "parse": round(result.parse_time * 1000, 1),
+            "store": round(store_time * 1000, 1),
+            "total": round(total_time * 1000, 1),
+        },
+    }
+    slow_ops.record("fetch", url, total_time, breakdown=progress["timings_ms"])
+    return new_entries, progress
+
+async def fetch_and_broadcast(fetch_id: Optional[int] = None):
+    """Fetch feeds concurrently and stream each feed's new entries to clients as soon as it finishes.
+
+    Use fetch_coordinator.trigger() to start one.
+    """
+    started = time.perf_counter()
+    # Notify clients that fetch is starting
+    await manager.broadcast({
+        "type": "fetch_started",
+        "fetch_id": fetch_id,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    })
     
-    published_parsed_tz_iso = None
-    if attr(entry, "published", ""):
-        try:
-            dt = parsedate_to_datetime(attr(entry, "published"))
-            published_parsed_tz_iso = dt.astimezone(timezone.utc).isoformat()
-        except Exception:
-            pass
+    # Feeds pushed over WebSub are only polled now and then, as a safety net
+    urls = await websub.urls_to_poll(list(config.feeds))
+    limiter = asyncio.Semaphore(FETCH_CONCURRENCY)
     
-    published_parsed_iso = None
-    if attr(entry, "published_parsed", None):
-        try:
-            published_parsed_iso = datetime.fromtimestamp(
-                mktime(attr(entry, "published_parsed"))
-            ).isoformat()
-        except Exception:
-            pass
+    async def process(session, url):
+        async with limiter:
+            return await fetch_and_store_feed(session, url)
     
-    tags_json = None
-    try:
-        tags_json = json.dumps([t.term for t in entry.tags]) if hasattr(entry, "tags") else None
-    except Exception:
-        pass
+    new_entries_count = 0
+    parsed_count = 0
+    done = 0
+    async with fetcher.create_session(FETCH_TIMEOUT) as session:
+        for finished in asyncio.as_completed([process(session, url) for url in urls]):
+            new_entries, progress = await finished
+            done += 1
+            new_entries_count += len(new_entries)
+            parsed_count += progress["entries"]
+            
+            await broadcast_new_entries(progress["feed_url"], new_entries, fetch_id)
+            await manager.broadcast({
+                "type": "fetch_progress",
+                "fetch_id": fetch_id,
+                "done": done,
+                "total": len(urls),
+                **progress
+            })
     
+    duration = time.perf_counter() - started
+    metrics.fetch_cycle_seconds.observe(duration)
+    slow_ops.record("fetch", "refresh", duration, params={"fetch_id": fetch_id, "feeds": len(urls)})
+    metrics.fetch_cycle_entries.observe(parsed_count, "parsed")
+    metrics.fetch_cycle_entries.observe(new_entries_count, "inserted")
+    metrics.fetch_cycle_entries.observe(parsed_count - new_entries_count, "deduplicated")
+    result = {
+        "fetch_id": fetch_id,
+        "feeds": len(urls),
+        "new_entries": new_entries_count,
+        "duration_ms": round(duration * 1000, 1),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+    # Notify clients that fetch is complete
+    await manager.broadcast({"type": "fetch_complete", **result})
+    return result
+
+fetch_coordinator = FetchCoordinator(
+    fetch_and_broadcast,
+    fetch_run_lock,
+    join_window=FETCH_JOIN_WINDOW,
+    client_interval=FETCH_CLIENT_MIN_INTERVAL,
+    global_max_triggers=FETCH_GLOBAL_MAX_TRIGGERS,
+    global_period=FETCH_GLOBAL_PERIOD,
+    lost_check_interval=LEASE_TTL / 3,
+)
+
+def refresh_interval():
+    """Seconds between scheduled refreshes, from the refresh_rate setting in minutes"""
     try:
-        conn.execute("""
-            INSERT OR IGNORE INTO entries (
-                id, feed_url, title, title_detail, link, links, authors, author, author_detail,
-                published, published_parsed, published_parsed_tz, tags, guidislink, summary, 
-                summary_detail, content, fetched_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            attr(entry, "id", None) or attr(entry, "guid", None) or attr(entry, "link", ""),
-            feed_url,
-            attr(entry, "title", ""),
-            to_json("title_detail"),
-            attr(entry, "link", ""),
-            to_json("links"),
-            to_json("authors"),
-            attr(entry, "author", ""),
-            to_json("author_detail"),
-            attr(entry, "published", ""),
-            published_parsed_iso,
-            published_parsed_tz_iso,
-            tags_json,
-            int(attr(entry, "guidislink", False)),
-            attr(entry, "summary", ""),
-            to_json("summary_detail"),
-            to_json("content"),
-            datetime.now(timezone.utc).isoformat()
-        ))
-    except Exception as e:
-        print(f"Error saving entry: {e}")
+        return int(config.settings["refresh_rate"]) * 60
+    except (KeyError, TypeError, ValueError):
+        return 0
 
-async def background_fetch_loop():
-    """Background task to fetch feeds periodically"""
-    await asyncio.sleep(10)  # Wait for startup
-    while True:
-        try:
-            refresh = int(state.settings['refresh_rate'])
-            if refresh <= 0:
-                    await asyncio.sleep(30)
-                    continue
-            if refresh > 0:
-                if (time.time() - state.time_since_refresh) > float((refresh * 60)):
-                    print(f"Auto-fetching feeds... (interval: {refresh} mins)")
-                    await fetch_and_broadcast()
-                await asyncio.sleep(1)
-            else:
-                await asyncio.sleep(30)
-        except Exception as e:
-            print(f"Background fetch error: {e}")
-            traceback.print_exc()
-            if len(manager.active_connections) > 0:  
-                await manager.broadcast({
-                    "type": "error",
-                    "message": "background fetch error"
-                })
-            await asyncio.sleep(30)
+async def broadcast_fetch_error(error):
+    if len(manager.active_connections) > 0:  
+        await manager.broadcast({
+            "type": "error",
+            "message": "background fetch error"
+        })
+
+scheduler = FetchScheduler(
+    refresh_interval,
+    fetch_coordinator.trigger,
+    fetch_lease,
+    lease_check_interval=LEASE_TTL / 3,
+    on_error=broadcast_fetch_error,
+)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,5 +1,5 @@
 from pydantic import BaseModel  
-from typing import Optional     
+from typing import Optional
 
 class Keyword(BaseModel):
     word: str
@@ -18,6 +18,23 @@ class Entry(BaseModel):
     published_parsed_tz: Optional[str]
     summary: Optional[str]
 
+class EntryDetail(Entry):
+    fetched_at: Optional[str]
+    author: Optional[str]
+    published_parsed: Optional[str]
+    guidislink: Optional[bool]
+    tags: Optional[list]
+    title_detail: Optional[dict]
+    links: Optional[list]
+    authors: Optional[list]
+    author_detail: Optional[dict]
+    summary_detail: Optional[dict]
+    content: Optional[list]
+
+class RetentionPolicy(BaseModel):
+    max_age_days: Optional[float] = None
+    max_entries: Optional[int] = None
+
 class Setting(BaseModel):
     name: str
     value: str
@@ -0,0 +1,82 @@
+import os
+import time
+from contextlib import contextmanager
+
+
+def process_age():
+    """Seconds since this process was started, from /proc (None elsewhere)"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfile:
+    """Times module imports and startup phases so slow boots can be explained"""
+
+    def __init__(self):
+        self.created = time.perf_counter()
+        # How long the interpreter and uvicorn ran before this module was imported
+        self.before_import = process_age()
+        self.phases = []
+        self.completed = None
+        self.first_requests = {}
+
+    def elapsed(self):
+        return time.perf_counter() - self.created
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def complete(self):
+        self.completed = self.elapsed()
+
+    def first_request(self, route: str):
+        """Record when a route was first served after boot"""
+        if route not in self.first_requests:
+            self.first_requests[route] = self.elapsed()
+
+    def summary(self):
+        to_ms = lambda seconds: None if seconds is None else round(seconds * 1000, 1)
+        return {
+            "before_import_ms": to_ms(self.before_import),
+            "phases_ms": {name: to_ms(duration) for name, duration in self.phases},
+            "startup_complete_ms": to_ms(self.completed),
+            "first_request_ms": {route: to_ms(at) for route, at in self.first_requests.items()},
+        }
+
+    def log(self):
+        print("Startup profile:")
+        for name, duration in self.phases:
+            print(f"  {name:<24} {duration * 1000:8.1f} ms")
+        if self.completed is not None:
+            print(f"  {'total since import':<24} {self.completed * 1000:8.1f} ms")
+
+
+class Readiness:
+    """Named checks that must all pass before the instance should receive traffic"""
+
+    def __init__(self, *checks: str):
+        self.checks = {name: False for name in checks}
+
+    def require(self, name: str):
+        self.checks.setdefault(name, False)
+
+    def mark(self, name: str, ready: bool = True):
+        self.checks[name] = ready
+
+    @property
+    def ready(self):
+        return all(self.checks.values())
+
+
+profile = StartupProfile()
@@ -0,0 +1,452 @@
+"""
+Entry storage layouts.
+
+    single   one entries / entry_details table pair in the main database
+    monthly  one pair per calendar month (entries_p202511, entry_details_p202511)
+             in the main database, keyed on published_parsed_tz; undated entries
+             go to entries_p000000, which is read last
+    sharded  entries spread over N database files by feed URL hash, each with
+             its own write lock; reads k-way merge the shards on the timestamp
+
+Every layout is a list of partitions per database file. Monthly readers
+walk partitions newest first and stop as soon as `limit` rows were produced,
+so "newest N" queries touch only the most recent months however much
+history is kept, and dropping a month is a DROP TABLE instead of a
+row-by-row delete.
+
+Change the shard count of an existing deployment with
+    python storage.py rebalance <main db> <shard count> [shard dir]
+or simply restart with the new STORAGE_SHARDS; either moves entries to
+their new shards.
+"""
+import asyncio
+import heapq
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+from collections import defaultdict, namedtuple
+from itertools import islice
+
+from metrics import TimedConnection
+from migrations import ENTRIES_SCHEMA, ENTRY_DETAILS_SCHEMA
+from records import DETAIL_COLUMNS, ENTRY_COLUMNS, LIST_COLUMNS
+from seeding import get_meta, set_meta
+from writer import get_writer
+
+# A pair of entry tables in one database file. key orders partitions (None for unpartitioned)
+Partition = namedtuple("Partition", ["db_file", "entries", "details", "key"])
+
+# Monthly partition of undated entries; sorts after every month, as NULL dates do in ORDER BY ... DESC
+UNDATED_KEY = "000000"
+
+
+def insert_sql(table, columns):
+    return f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+def list_query(table, keyword=None, feed_url=None):
+    """Newest-first list columns of one partition; the LIMIT parameter goes last"""
+    where, params = [], []
+    if keyword:
+        where.append("title LIKE ?")
+        params.append(f"%{keyword}%")
+    if feed_url:
+        where.append("feed_url = ?")
+        params.append(feed_url)
+    sql = f"SELECT {', '.join(LIST_COLUMNS)} FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY published_parsed_tz DESC LIMIT ?", params
+
+
+def detail_query(partition):
+    return f"""
+        SELECT {", ".join("e." + column for column in ENTRY_COLUMNS)}, {", ".join("d." + column for column in DETAIL_COLUMNS[1:])}
+        FROM {partition.entries} e
+        LEFT JOIN {partition.details} d ON d.id = e.id
+        WHERE e.id IN ({{placeholders}})
+    """
+
+
+class EntryStorage:
+    """Entries in the entries / entry_details pair of the main database"""
+    mode = "single"
+
+    def __init__(self, db_file: str, codec):
+        self.db_file = db_file
+        self.codec = codec  # Encodes compressed columns on insert
+
+    def connect(self, db_file: str, check_same_thread: bool = True):
+        return sqlite3.connect(db_file, factory=TimedConnection, check_same_thread=check_same_thread)
+
+    def db_files(self):
+        """Database files holding entries"""
+        return [self.db_file]
+
+    def partitions(self, conn, db_file: str):
+        """Partitions stored in db_file, newest first"""
+        return [Partition(db_file, "entries", "entry_details", None)]
+
+    def partition_for(self, record):
+        return Partition(self.db_file, "entries", "entry_details", None)
+
+    def ensure_partition(self, conn, partition):
+        pass  # Created by init_db
+
+    def init(self):
+        """Prepare the layout once the main database is migrated"""
+
+    def existing_ids(self, conn, db_file: str, ids):
+        """Subset of ids already stored in db_file, checked in batches below SQLite's parameter limit"""
+        existing = set()
+        ids = list(ids)
+        for partition in self.partitions(conn, db_file):
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT id FROM {partition.entries} WHERE id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                existing.update(row[0] for row in rows)
+        return existing
+
+    def store_in(self, conn, db_file: str, records):
+        """Insert the records not stored in db_file yet, without committing. Returns the new records"""
+        existing = self.existing_ids(conn, db_file, {record.id for record in records})
+        by_partition = defaultdict(list)
+        for record in records:
+            if record.id not in existing:
+                existing.add(record.id)  # Skip duplicates within the feed too
+                by_partition[self.partition_for(record)].append(record)
+        new_records = []
+        for partition, partition_records in by_partition.items():
+            self.ensure_partition(conn, partition)
+            self.insert(conn, partition, partition_records)
+            new_records.extend(partition_records)
+        return new_records
+
+    def records_by_file(self, records):
+        by_file = defaultdict(list)
+        for record in records:
+            by_file[self.partition_for(record).db_file].append(record)
+        return by_file
+
+    async def write(self, records):
+        """Store records through each file's group-commit writer. Returns the new records"""
+        results = await asyncio.gather(*(
+            get_writer(db_file).execute(self.store_in, db_file, file_records, rows=len(file_records))
+            for db_file, file_records in self.records_by_file(records).items()
+        ))
+        return [record for new_records in results for record in new_records]
+
+    def store(self, records):
+        """Insert the records not stored yet and commit, on a connection of its own. Returns the new records"""
+        new_records = []
+        for db_file, file_records in self.records_by_file(records).items():
+            conn = self.connect(db_file)
+            try:
+                new_records.extend(self.store_in(conn, db_file, file_records))
+                conn.commit()
+            finally:
+                conn.close()
+        return new_records
+
+    def insert(self, conn, partition, records):
+        codec = self.codec
+        entries_sql = insert_sql(partition.entries, ENTRY_COLUMNS)
+        details_sql = insert_sql(partition.details, DETAIL_COLUMNS)
+        try:
+            conn.executemany(entries_sql, [codec.encode_row(ENTRY_COLUMNS, record.row()) for record in records])
+            conn.executemany(details_sql, [codec.encode_row(DETAIL_COLUMNS, record.detail_row()) for record in records])
+        except Exception as e:
+            print(f"Error saving entries: {e}")
+            # Fall back to one by one so a single bad row doesn't drop the batch
+            for record in records:
+                try:
+                    conn.execute(entries_sql, codec.encode_row(ENTRY_COLUMNS, record.row()))
+                    conn.execute(details_sql, codec.encode_row(DETAIL_COLUMNS, record.detail_row()))
+                except Exception as e:
+                    print(f"Error saving entry: {e}")
+
+    def iter_newest(self, keyword: str = None, limit: int = None, feed_url: str = None, check_same_thread: bool = True):
+        """Rows in LIST_COLUMNS order, newest first. Later partitions are only queried while rows are still needed"""
+        conn = self.connect(self.db_file, check_same_thread)
+        try:
+            remaining = limit
+            for partition in self.partitions(conn, self.db_file):
+                if remaining is not None and remaining <= 0:
+                    return
+                sql, params = list_query(partition.entries, keyword, feed_url)
+                for row in conn.execute(sql, params + [-1 if remaining is None else remaining]):
+                    yield row
+                    if remaining is not None:
+                        remaining -= 1
+        finally:
+            conn.close()
+
+    def get(self, entry_id: str):
+        """(columns, row) of one entry with its details, or None"""
+        for db_file in self.db_files():
+            conn = self.connect(db_file)
+            try:
+                for partition in self.partitions(conn, db_file):
+                    cursor = conn.execute(detail_query(partition).format(placeholders="?"), (entry_id,))
+                    row = cursor.fetchone()
+                    if row is not None:
+                        return [description[0] for description in cursor.description], row
+            finally:
+                conn.close()
+        return None
+
+    def expired_partitions(self, conn, db_file: str, cutoff: str):
+        """Partitions whose every entry is older than cutoff and can be dropped whole"""
+        return []
+
+    def drop_partition(self, conn, partition):
+        raise NotImplementedError(f"{self.mode} storage has no droppable partitions")
+
+
+def month_after(key: str):
+    """ISO timestamp of the start of the month following partition key YYYYMM"""
+    year, month = int(key[:4]), int(key[4:])
+    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year:04d}-{month:02d}-01T00:00:00+00:00"
+
+
+class MonthlyStorage(EntryStorage):
+    """Entries partitioned into one table pair per month"""
+    mode = "monthly"
+
+    def partitions(self, conn, db_file: str):
+        keys = sorted(
+            (row[0][len("entries_p"):] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'entries_p[0-9][0-9][0-9][0-9][0-9][0-9]'"
+            )),
+            reverse=True,
+        )
+        return [Partition(db_file, f"entries_p{key}", f"entry_details_p{key}", key) for key in keys]
+
+    def partition_key(self, timestamp: str):
+        return timestamp[:4] + timestamp[5:7]
+
+    def partition_for(self, record):
+        key = self.partition_key(record.published_parsed_tz) if record.published_parsed_tz else UNDATED_KEY
+        return Partition(self.db_file, f"entries_p{key}", f"entry_details_p{key}", key)
+
+    def ensure_partition(self, conn, partition):
+        conn.execute(ENTRIES_SCHEMA.format(name=partition.entries))
+        conn.execute(ENTRY_DETAILS_SCHEMA.format(name=partition.details))
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {partition.entries}_published ON {partition.entries} (published_parsed_tz)")
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {partition.entries}_feed_published ON {partition.entries} (feed_url, published_parsed_tz)"
+        )
+
+    def init(self):
+        """Move rows from the unpartitioned tables (older databases, seed restores) into monthly partitions"""
+        conn = self.connect(self.db_file)
+        try:
+            month = f"coalesce(nullif(substr(e.published_parsed_tz, 1, 4) || substr(e.published_parsed_tz, 6, 2), ''), '{UNDATED_KEY}')"
+            keys = [row[0] for row in conn.execute(f"SELECT DISTINCT {month} FROM entries e")]
+            for key in keys:
+                partition = Partition(self.db_file, f"entries_p{key}", f"entry_details_p{key}", key)
+                self.ensure_partition(conn, partition)
+                entry_columns = ", ".join(ENTRY_COLUMNS)
+                detail_columns = ", ".join(DETAIL_COLUMNS)
+                conn.execute(
+                    f"INSERT OR IGNORE INTO {partition.entries} ({entry_columns}) "
+                    f"SELECT {', '.join('e.' + column for column in ENTRY_COLUMNS)} FROM entries e WHERE {month} = ?",
+                    (key,),
+                )
+                conn.execute(
+                    f"INSERT OR IGNORE INTO {partition.details} ({detail_columns}) "
+                    f"SELECT {', '.join('d.' + column for column in DETAIL_COLUMNS)} FROM entry_details d "
+                    f"JOIN entries e ON e.id = d.id WHERE {month} = ?",
+                    (key,),
+                )
+                conn.execute(f"DELETE FROM entry_details WHERE id IN (SELECT e.id FROM entries e WHERE {month} = ?)", (key,))
+                conn.execute(f"DELETE FROM entries WHERE id IN (SELECT e.id FROM entries e WHERE {month} = ?)", (key,))
+                conn.commit()
+            if keys:
+                print(f"Moved entries into {len(keys)} monthly partitions")
+        finally:
+            conn.close()
+
+    def expired_partitions(self, conn, db_file: str, cutoff: str):
+        # Undated entries expire one by one on fetched_at instead
+        return [
+            partition for partition in self.partitions(conn, db_file)
+            if partition.key != UNDATED_KEY and month_after(partition.key) <= cutoff
+        ]
+
+    def drop_partition(self, conn, partition):
+        conn.execute(f"DROP TABLE IF EXISTS {partition.details}")
+        conn.execute(f"DROP TABLE IF EXISTS {partition.entries}")
+
+
+def shard_file(shard_dir: str, index: int):
+    return os.path.join(shard_dir, f"entries-shard-{index}.db")
+
+
+class ShardedStorage(EntryStorage):
+    """Entries spread over shard_count database files by a hash of the feed URL.
+
+    Each shard is a separate SQLite file with its own write lock, so feeds on
+    different shards are stored in parallel. Feeds, keywords and settings
+    stay in the main database.
+    """
+    mode = "sharded"
+
+    def __init__(self, db_file: str, codec, shard_dir: str, shard_count: int):
+        super().__init__(db_file, codec)
+        self.shard_dir = shard_dir
+        self.shard_count = shard_count
+
+    def shard_index(self, feed_url: str, shard_count: int = None):
+        # crc32 rather than hash(), which is salted per process
+        return zlib.crc32((feed_url or "").encode()) % (shard_count or self.shard_count)
+
+    def db_files(self):
+        return [shard_file(self.shard_dir, index) for index in range(self.shard_count)]
+
+    def partition_for(self, record):
+        return Partition(shard_file(self.shard_dir, self.shard_index(record.feed_url)), "entries", "entry_details", None)
+
+    def create_shard(self, db_file: str):
+        conn = sqlite3.connect(db_file)
+        try:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")  # Only applies before the first table
+            conn.execute("PRAGMA journal_mode=WAL")  # Readers don't wait for the shard's writer
+            conn.execute(ENTRIES_SCHEMA.format(name="entries"))
+            conn.execute(ENTRY_DETAILS_SCHEMA.format(name="entry_details"))
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_published ON entries (published_parsed_tz)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_feed_published ON entries (feed_url, published_parsed_tz)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def init(self):
+        """Create missing shards, rebalance if the shard count changed and move in unsharded rows"""
+        os.makedirs(self.shard_dir, exist_ok=True)
+        for db_file in self.db_files():
+            self.create_shard(db_file)
+        conn = sqlite3.connect(self.db_file)
+        try:
+            stored_count = get_meta(conn, "shard_count")
+        finally:
+            conn.close()
+        if stored_count is not None and int(stored_count) != self.shard_count:
+            print(f"Shard count changed from {stored_count} to {self.shard_count}, rebalancing")
+            self.rebalance()
+        # Entries in the main database (older databases, seed restores) belong in the shards
+        moved = self.move_rows(self.db_file, keep=None)
+        if moved:
+            print(f"Moved {moved} entries into {self.shard_count} shards")
+        conn = sqlite3.connect(self.db_file)
+        try:
+            set_meta(conn, "shard_count", str(self.shard_count))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def rebalance(self):
+        """Move every entry to the shard its feed hashes to under the current shard count.
+
+        Shard files beyond the current count are emptied and removed.
+        Returns the number of entries moved.
+        """
+        moved = 0
+        pattern = re.compile(r"entries-shard-(\d+)\.db$")
+        for name in sorted(os.listdir(self.shard_dir)):
+            match = pattern.match(name)
+            if not match:
+                continue
+            index = int(match.group(1))
+            source = os.path.join(self.shard_dir, name)
+            moved += self.move_rows(source, keep=index if index < self.shard_count else None)
+            if index >= self.shard_count:
+                for path in (source, source + "-wal", source + "-shm"):
+                    if os.path.exists(path):
+                        os.remove(path)
+        return moved
+
+    def move_rows(self, source: str, keep: int = None):
+        """Move rows of source's entry tables that hash to another shard than `keep`"""
+        conn = sqlite3.connect(source)
+        moved = 0
+        try:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entries'").fetchone():
+                return 0
+            conn.create_function("shard_of", 1, self.shard_index, deterministic=True)
+            entry_columns = ", ".join(ENTRY_COLUMNS)
+            detail_columns = ", ".join(DETAIL_COLUMNS)
+            for index in range(self.shard_count):
+                if index == keep:
+                    continue
+                conn.execute("ATTACH DATABASE ? AS target", (shard_file(self.shard_dir, index),))
+                try:
+                    conn.execute(
+                        f"INSERT OR IGNORE INTO target.entry_details ({detail_columns}) "
+                        f"SELECT {', '.join('d.' + column for column in DETAIL_COLUMNS)} FROM main.entry_details d "
+                        f"JOIN main.entries e ON e.id = d.id WHERE shard_of(e.feed_url) = ?",
+                        (index,),
+                    )
+                    moved += conn.execute(
+                        f"INSERT OR IGNORE INTO target.entries ({entry_columns}) "
+                        f"SELECT {entry_columns} FROM main.entries WHERE shard_of(feed_url) = ?",
+                        (index,),
+                    ).rowcount
+                    conn.execute(
+                        "DELETE FROM main.entry_details WHERE id IN (SELECT id FROM main.entries WHERE shard_of(feed_url) = ?)",
+                        (index,),
+                    )
+                    conn.execute("DELETE FROM main.entries WHERE shard_of(feed_url) = ?", (index,))
+                    conn.commit()
+                finally:
+                    conn.execute("DETACH DATABASE target")
+        finally:
+            conn.close()
+        return moved
+
+    def iter_newest(self, keyword: str = None, limit: int = None, feed_url: str = None, check_same_thread: bool = True):
+        """Rows in LIST_COLUMNS order, newest first, k-way merged across shards.
+
+        Each shard returns at most `limit` rows already sorted, so the merge
+        reads no more than limit rows per shard and stops at limit overall.
+        """
+        db_files = [shard_file(self.shard_dir, self.shard_index(feed_url))] if feed_url else self.db_files()
+        conns = [self.connect(db_file, check_same_thread) for db_file in db_files]
+        merged = None
+        try:
+            sql, params = list_query("entries", keyword, feed_url)
+            cursors = [conn.execute(sql, params + [-1 if limit is None else limit]) for conn in conns]
+            # NULL dates come last within each shard; "" keeps them last in the merge too
+            merged = heapq.merge(*cursors, key=lambda row: row[5] or "", reverse=True)
+            yield from (merged if limit is None else islice(merged, limit))
+        finally:
+            if merged is not None:
+                merged.close()  # Before the cursors it reads from go away
+            for conn in conns:
+                conn.close()
+
+
+def create_storage(mode: str, db_file: str, codec, shard_dir: str = None, shard_count: int = 4):
+    if mode == "single":
+        return EntryStorage(db_file, codec)
+    if mode == "monthly":
+        return MonthlyStorage(db_file, codec)
+    if mode == "sharded":
+        return ShardedStorage(db_file, codec, shard_dir or os.path.dirname(os.path.abspath(db_file)), shard_count)
+    raise ValueError(f"Unknown storage mode '{mode}', expected single, monthly or sharded")
+
+
+if __name__ == "__main__":
+    # python storage.py rebalance <main db> <shard count> [shard dir]
+    if len(sys.argv) < 4 or sys.argv[1] != "rebalance":
+        print("Usage: python storage.py rebalance <main db> <shard count> [shard dir]")
+        sys.exit(1)
+    storage = create_storage("sharded", sys.argv[2], None, sys.argv[4] if len(sys.argv) > 4 else None, int(sys.argv[3]))
+    started = time.perf_counter()
+    storage.init()
+    print(f"Rebalanced into {storage.shard_count} shards in {(time.perf_counter() - started) * 1000:.0f} ms")
@@ -0,0 +1,50 @@
+import asyncio
+import random
+
+from bus import LocalBus, SQLiteBus
+
+
+def recorder(received):
+    async def handler(event):
+        await asyncio.sleep(random.random() / 200)  # A slow subscriber, like a WebSocket send
+        received.append(event.id)
+    return handler
+
+
+def resumed(received, last_event_id):
+    """What an SSE client resuming with Last-Event-ID gets from a worker's replay buffer"""
+    return [event_id for event_id in received if event_id > last_event_id]
+
+
+def test_sqlite_bus_delivers_every_workers_events_in_log_order(tmp_path):
+    async def run():
+        path = str(tmp_path / "bus.db")
+        workers = [SQLiteBus(path, poll_interval=0.2), SQLiteBus(path, poll_interval=0.2)]
+        received = [[], []]
+        for bus, events in zip(workers, received):
+            bus.subscribe(recorder(events))
+            await bus.start()
+        try:
+            await asyncio.gather(*[workers[i % 2].publish({"type": f"event_{i}"}) for i in range(30)])
+            await asyncio.sleep(0.3)  # Let each worker's poller catch up with the other's events
+        finally:
+            for bus in workers:
+                await bus.stop()
+        return received
+
+    first, second = asyncio.run(run())
+    assert first == second == sorted(first)
+    assert len(set(first)) == 30
+    for last_event_id in first:
+        assert resumed(first, last_event_id) == first[first.index(last_event_id) + 1:]
+
+
+def test_local_bus_delivers_in_publish_order():
+    async def run():
+        bus = LocalBus()
+        received = []
+        bus.subscribe(recorder(received))
+        await asyncio.gather(*[bus.publish({"type": f"event_{i}"}) for i in range(20)])
+        return received
+
+    assert asyncio.run(run()) == list(range(1, 21))
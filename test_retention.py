@@ -0,0 +1,55 @@
+from compression import ColumnCodec
+from migrations import ENTRIES_SCHEMA, ENTRY_DETAILS_SCHEMA
+from records import normalize_entry
+from retention import Policy, Pruner
+from storage import create_storage
+
+NEW_FEED = "http://example.com/new"
+GONE_FEED = "http://example.com/gone"
+
+
+def stored_feeds(storage):
+    feeds = set()
+    for db_file in storage.db_files():
+        conn = storage.connect(db_file)
+        feeds.update(row[0] for row in conn.execute("SELECT feed_url FROM entries"))
+        conn.close()
+    return sorted(feeds)
+
+
+def create(mode, tmp_path):
+    db_file = str(tmp_path / "feeds.db")
+    options = {"shard_count": 2, "shard_dir": str(tmp_path)} if mode == "sharded" else {}
+    storage = create_storage(mode, db_file, ColumnCodec(), **options)
+    conn = storage.connect(db_file)
+    conn.execute("CREATE TABLE feeds (id INTEGER PRIMARY KEY, url TEXT UNIQUE, max_age_days REAL, max_entries INTEGER)")
+    if mode == "single":
+        conn.execute(ENTRIES_SCHEMA.format(name="entries"))
+        conn.execute(ENTRY_DETAILS_SCHEMA.format(name="entry_details"))
+    conn.commit()
+    conn.close()
+    if mode == "sharded":
+        storage.init()
+    return storage
+
+
+def test_orphan_pass_keeps_entries_of_a_feed_added_during_the_prune(tmp_path):
+    for mode in ("single", "sharded"):
+        directory = tmp_path / mode
+        directory.mkdir()
+        storage = create(mode, directory)
+        storage.store([
+            normalize_entry({"id": f"{url}#{i}", "title": str(i)}, url, "2025-06-01T00:00:00+00:00")
+            for url in (NEW_FEED, GONE_FEED) for i in range(5)
+        ])
+        pruner = Pruner(storage, Policy(0, 0), batch_size=2, pause=0)
+        # The policies were read before NEW_FEED was added, so both feeds look orphaned
+        pruner.policies = lambda: {}
+        conn = storage.connect(storage.db_file)
+        conn.execute("INSERT INTO feeds (url) VALUES (?)", (NEW_FEED,))
+        conn.commit()
+        conn.close()
+
+        result = pruner.prune()
+        assert result["orphaned"] == 5, mode
+        assert stored_feeds(storage) == [NEW_FEED], mode
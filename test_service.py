@@ -0,0 +1,72 @@
+import asyncio
+import os
+import tempfile
+import time
+
+# service reads its configuration at import time
+DATA_DIR = tempfile.mkdtemp()
+os.environ["OVERRIDE_DB_FILE"] = os.path.join(DATA_DIR, "feeds.db")
+os.environ["MOUNT_PATH"] = DATA_DIR
+
+import fetcher
+import service
+from bus import LocalBus
+from fastapi.testclient import TestClient
+
+SLOW_FEED = "http://slow.example.com/rss"
+
+
+def rss(url):
+    items = "".join(
+        f"<item><guid>{url}#{i}</guid><title>t{i}</title><pubDate>Wed, 12 Nov 2025 02:25:0{i} +0000</pubDate></item>"
+        for i in range(3)
+    )
+    return f"<?xml version='1.0'?><rss version='2.0'><channel><title>x</title>{items}</channel></rss>".encode()
+
+
+async def download(session, url):
+    await asyncio.sleep(2 if url == SLOW_FEED else 0.01)
+    return rss(url), {"content-type": "application/rss+xml"}
+
+
+def test_mutations_apply_in_order_without_waiting_for_slow_jobs(monkeypatch):
+    monkeypatch.setattr(fetcher, "download", download)
+    with TestClient(service.app) as client, client.websocket_connect("/ws") as ws:
+        started = time.perf_counter()
+        ws.send_json({"type": "add_feed", "request_id": "feed", "url": SLOW_FEED})
+        for i in range(5):
+            ws.send_json({"type": "add_keywords", "request_id": f"add{i}", "keywords": [{"word": "hol", "keyword_type": "whitelist"}]})
+            ws.send_json({"type": "delete_keywords", "request_id": f"delete{i}", "words": ["hol"]})
+        replies = {}
+        while len(replies) < 10:
+            message = ws.receive_json()
+            if message["type"].endswith("_result"):
+                replies[message["request_id"]] = message["data"][0]["status"]
+        assert time.perf_counter() - started < 1.5  # Not held up behind the slow download
+        assert {replies[f"add{i}"] for i in range(5)} == {"added"}
+        assert {replies[f"delete{i}"] for i in range(5)} == {"deleted"}
+        while True:
+            message = ws.receive_json()
+            if message.get("request_id") == "feed" and message["type"] != "job_accepted":
+                break
+        assert message["type"] == "feed_added_success"
+
+
+class SlowWebSocket:
+    async def send_text(self, text):
+        await asyncio.sleep(0.001 * (hash(text) % 5))
+
+
+def test_event_stream_resumes_after_last_event_id():
+    async def run():
+        manager = service.ConnectionManager()
+        manager.active_connections.add(SlowWebSocket())
+        bus = LocalBus()
+        bus.subscribe(manager.deliver)
+        await asyncio.gather(*[bus.publish({"type": "new_entries", "n": i}) for i in range(20)])
+        return manager
+
+    manager = asyncio.run(run())
+    for last_event_id in range(21):
+        replayed = manager.open_stream(service.EventStream(), last_event_id)
+        assert [event.id for event in replayed] == list(range(last_event_id + 1, 21))
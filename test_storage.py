@@ -0,0 +1,42 @@
+from compression import ColumnCodec
+from records import normalize_entry
+from storage import create_storage
+from migrations import ENTRIES_SCHEMA, ENTRY_DETAILS_SCHEMA
+
+
+def mixed_records():
+    """Dated entries over three months and undated ones fetched after all of them"""
+    entries = [
+        {"id": "dated-0", "title": "a", "published": "Sun, 05 Jan 2025 10:00:00 +0000"},
+        {"id": "dated-1", "title": "b", "published": "Fri, 14 Feb 2025 10:00:00 +0000"},
+        {"id": "dated-2", "title": "c", "published": "Sat, 15 Mar 2025 10:00:00 +0000"},
+        {"id": "dated-3", "title": "d", "published": "Sun, 16 Mar 2025 10:00:00 +0000"},
+    ] + [{"id": f"undated-{i}", "title": f"u{i}"} for i in range(3)]
+    return [normalize_entry(entry, "http://example.com/feed", "2025-06-01T00:00:00+00:00") for entry in entries]
+
+
+def newest_ids(mode, tmp_path, **options):
+    db_file = str(tmp_path / "feeds.db")
+    storage = create_storage(mode, db_file, ColumnCodec(), **options)
+    if mode == "single":
+        conn = storage.connect(db_file)
+        conn.execute(ENTRIES_SCHEMA.format(name="entries"))
+        conn.execute(ENTRY_DETAILS_SCHEMA.format(name="entry_details"))
+        conn.close()
+    elif mode == "sharded":
+        storage.init()
+    storage.store(mixed_records())
+    return [row[0] for row in storage.iter_newest()], [row[0] for row in storage.iter_newest(limit=5)]
+
+
+def test_undated_entries_come_last_in_every_layout(tmp_path):
+    expected = ["dated-3", "dated-2", "dated-1", "dated-0"]
+    for mode, options in (("single", {}), ("monthly", {}), ("sharded", {"shard_count": 2})):
+        directory = tmp_path / mode
+        directory.mkdir()
+        if mode == "sharded":
+            options["shard_dir"] = str(directory)
+        ids, limited = newest_ids(mode, directory, **options)
+        assert ids[:4] == expected, mode
+        assert sorted(ids[4:]) == ["undated-0", "undated-1", "undated-2"], mode
+        assert limited[:4] == expected and limited[4].startswith("undated-"), mode
@@ -0,0 +1,256 @@
+"""
+WebSub (PubSubHubbub) subscriptions: hubs push feed updates instead of us polling.
+
+Feeds advertising a hub (a Link header or <link rel="hub">) are subscribed
+at that hub with a callback of CALLBACK_URL/websub/callback/<id>. The hub
+verifies our intent with a GET carrying hub.challenge, then POSTs new
+content signed with the subscription's secret (X-Hub-Signature). Pushed
+content goes through the same normalization, storage and broadcast path as
+polled content.
+
+Subscription state lives in the websub_subscriptions table, so the hub's
+verification and push requests can land on any worker. Subscriptions are
+renewed renew_before seconds before their lease runs out (halfway through
+shorter leases), and feeds with a live subscription are only polled every
+safety_poll_interval seconds, in case the hub misses an update. Try it
+locally with websub_hub.py.
+"""
+import asyncio
+import hashlib
+import hmac
+import re
+import secrets
+import sqlite3
+import time
+import traceback
+
+from metrics import TimedConnection
+
+LINK_HEADER_PATTERN = re.compile(r'<([^>]*)>\s*;\s*rel="?([^";]*)"?')
+SIGNATURE_METHODS = {"sha1": hashlib.sha1, "sha256": hashlib.sha256, "sha384": hashlib.sha384, "sha512": hashlib.sha512}
+PENDING_RETRY = 3600  # Resend a subscription request the hub never verified after this long
+
+
+def hub_links(parsed, feed_url: str):
+    """(hub, topic) advertised by a parsed feed, Link headers first; hub is None if there is none"""
+    hub = topic = None
+    for url, rels in LINK_HEADER_PATTERN.findall(parsed.get("headers", {}).get("link", "")):
+        rels = rels.split()
+        if "hub" in rels:
+            hub = hub or url
+        if "self" in rels:
+            topic = topic or url
+    for link in parsed.get("feed", {}).get("links", []):
+        if link.get("rel") == "hub":
+            hub = hub or link.get("href")
+        elif link.get("rel") == "self":
+            topic = topic or link.get("href")
+    return hub, topic or feed_url
+
+
+def save_request(conn, feed_url, hub, topic, state, requested_at):
+    """Record a (re)subscription or unsubscription request; id and secret are kept across renewals"""
+    conn.execute("""
+        INSERT INTO websub_subscriptions (id, feed_url, hub, topic, secret, state, requested_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (feed_url) DO UPDATE SET
+            hub = excluded.hub, topic = excluded.topic, state = excluded.state, requested_at = excluded.requested_at
+    """, (secrets.token_urlsafe(16), feed_url, hub, topic, secrets.token_hex(20), state, requested_at))
+    return conn.execute("SELECT id, secret FROM websub_subscriptions WHERE feed_url = ?", (feed_url,)).fetchone()
+
+
+def save_verified(conn, sub_id, lease_seconds, expires_at):
+    conn.execute(
+        "UPDATE websub_subscriptions SET state = 'subscribed', lease_seconds = ?, expires_at = ? WHERE id = ?",
+        (lease_seconds, expires_at, sub_id),
+    )
+
+
+def save_state(conn, sub_id, state):
+    conn.execute("UPDATE websub_subscriptions SET state = ? WHERE id = ?", (state, sub_id))
+
+
+def save_push(conn, sub_id, pushed_at):
+    conn.execute("UPDATE websub_subscriptions SET last_push_at = ? WHERE id = ?", (pushed_at, sub_id))
+
+
+def delete_subscription(conn, sub_id):
+    conn.execute("DELETE FROM websub_subscriptions WHERE id = ?", (sub_id,))
+
+
+class WebSubManager:
+    def __init__(self, db_file: str, callback_url: str, write, lease_seconds: int = 604800,
+                 renew_before: float = 86400, safety_poll_interval: float = 21600):
+        self.db_file = db_file
+        self.callback_url = callback_url.rstrip("/") if callback_url else None  # Public base URL of this service
+        self.write = write  # async write(fn, *args): runs fn(conn, *args) in a group commit
+        self.lease_seconds = lease_seconds
+        self.renew_before = renew_before
+        self.safety_poll_interval = safety_poll_interval
+        self.last_polled = {}  # feed_url -> time of its last safety poll
+
+    @property
+    def enabled(self):
+        return bool(self.callback_url)
+
+    def callback(self, sub_id: str):
+        return f"{self.callback_url}/websub/callback/{sub_id}"
+
+    def query(self, sql, params=()):
+        conn = sqlite3.connect(self.db_file, factory=TimedConnection)
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def get(self, sub_id: str):
+        rows = self.query("SELECT * FROM websub_subscriptions WHERE id = ?", (sub_id,))
+        return rows[0] if rows else None
+
+    def by_feed(self, feed_url: str):
+        rows = self.query("SELECT * FROM websub_subscriptions WHERE feed_url = ?", (feed_url,))
+        return rows[0] if rows else None
+
+    def subscriptions(self):
+        """Every subscription, without secrets"""
+        return self.query("""
+            SELECT id, feed_url, hub, topic, state, lease_seconds, expires_at, requested_at, last_push_at
+            FROM websub_subscriptions ORDER BY feed_url
+        """)
+
+    def pushed_feeds(self):
+        """Feed URL -> time its live subscription was verified, including ones being renewed"""
+        rows = self.query("""
+            SELECT feed_url, expires_at - lease_seconds AS verified_at FROM websub_subscriptions
+            WHERE state IN ('subscribed', 'subscribing') AND expires_at > ?
+        """, (time.time(),))
+        return {row["feed_url"]: row["verified_at"] for row in rows}
+
+    def needs_renewal(self, sub, now):
+        # Hubs may grant shorter leases than asked; renew those halfway through
+        return sub["expires_at"] - now <= min(self.renew_before, sub["lease_seconds"] / 2)
+
+    async def urls_to_poll(self, urls):
+        """The feeds a refresh should poll: all unpushed ones, pushed ones only when a safety poll is due"""
+        if not self.enabled:
+            return urls
+        pushed = await asyncio.to_thread(self.pushed_feeds)
+        now = time.time()
+        due = [
+            url for url in urls
+            if url not in pushed or now - max(pushed[url], self.last_polled.get(url, 0)) >= self.safety_poll_interval
+        ]
+        for url in due:
+            if url in pushed:
+                self.last_polled[url] = now
+        return due
+
+    async def discover(self, session, feed_url: str, parsed):
+        """Subscribe to the hub a freshly polled feed advertises, unless already (being) subscribed there"""
+        if not self.enabled:
+            return
+        hub, topic = hub_links(parsed, feed_url)
+        if not hub:
+            return
+        existing = await asyncio.to_thread(self.by_feed, feed_url)
+        if existing and existing["hub"] == hub and existing["topic"] == topic:
+            if existing["state"] == "denied":
+                return
+            if existing["state"] == "subscribing" and time.time() - existing["requested_at"] < PENDING_RETRY:
+                return
+            if existing["state"] == "subscribed" and not self.needs_renewal(existing, time.time()):
+                return
+        await self.request(session, feed_url, hub, topic, "subscribe")
+
+    async def request(self, session, feed_url: str, hub: str, topic: str, mode: str):
+        """Send a subscribe or unsubscribe request; the hub confirms through verify()"""
+        state = "subscribing" if mode == "subscribe" else "unsubscribing"
+        sub_id, secret = await self.write(save_request, feed_url, hub, topic, state, time.time())
+        data = {
+            "hub.mode": mode,
+            "hub.topic": topic,
+            "hub.callback": self.callback(sub_id),
+            "hub.lease_seconds": str(self.lease_seconds),
+            "hub.secret": secret,
+        }
+        async with session.post(hub, data=data) as response:
+            if response.status not in (202, 204):
+                raise RuntimeError(f"Hub {hub} refused to {mode} {topic}: HTTP {response.status}")
+        print(f"WebSub {mode} requested for {feed_url} at {hub}")
+
+    async def verify(self, sub_id: str, params: dict):
+        """Answer a hub's verification of intent. Returns the challenge to echo, or None to refuse"""
+        sub = await asyncio.to_thread(self.get, sub_id)
+        mode = params.get("hub.mode")
+        if sub is None or params.get("hub.topic") != sub["topic"]:
+            return None
+        if mode == "denied":
+            await self.write(save_state, sub_id, "denied")
+            print(f"WebSub subscription to {sub['feed_url']} denied: {params.get('hub.reason')}")
+            return ""
+        challenge = params.get("hub.challenge")
+        if not challenge:
+            return None
+        if mode == "subscribe" and sub["state"] in ("subscribing", "subscribed"):
+            try:
+                lease_seconds = int(params.get("hub.lease_seconds") or self.lease_seconds)
+            except ValueError:
+                lease_seconds = self.lease_seconds  # Garbled by the hub; assume it granted what we asked for
+            await self.write(save_verified, sub_id, lease_seconds, time.time() + lease_seconds)
+            return challenge
+        if mode == "unsubscribe" and sub["state"] == "unsubscribing":
+            await self.write(delete_subscription, sub_id)
+            return challenge
+        return None
+
+    def authentic(self, sub: dict, body: bytes, signature: str):
+        """Whether pushed content is signed with the subscription's secret"""
+        if not sub["secret"]:
+            return True
+        method, _, digest = (signature or "").partition("=")
+        hash_function = SIGNATURE_METHODS.get(method.lower())
+        if hash_function is None:
+            return False
+        expected = hmac.new(sub["secret"].encode(), body, hash_function).hexdigest()
+        return hmac.compare_digest(expected, digest.lower())
+
+    async def pushed(self, sub_id: str):
+        await self.write(save_push, sub_id, time.time())
+
+    def due(self, known_feeds):
+        """Subscriptions to renew or retry, and ones whose feed was deleted"""
+        now = time.time()
+        renew, orphaned = [], []
+        for sub in self.query("SELECT * FROM websub_subscriptions WHERE state != 'denied'"):
+            if sub["feed_url"] not in known_feeds:
+                if sub["state"] != "unsubscribing" or now - sub["requested_at"] > PENDING_RETRY:
+                    orphaned.append(sub)
+            elif sub["state"] == "subscribed" and self.needs_renewal(sub, now):
+                renew.append(sub)
+            elif sub["state"] in ("subscribing", "unsubscribing") and now - sub["requested_at"] > PENDING_RETRY:
+                renew.append(sub)
+        return renew, orphaned
+
+    async def maintain(self, session, known_feeds):
+        """Renew expiring subscriptions and unsubscribe from deleted feeds"""
+        renew, orphaned = await asyncio.to_thread(self.due, known_feeds)
+        for sub, mode in [(sub, "subscribe") for sub in renew] + [(sub, "unsubscribe") for sub in orphaned]:
+            try:
+                await self.request(session, sub["feed_url"], sub["hub"], sub["topic"], mode)
+            except Exception as e:
+                print(f"WebSub {mode} of {sub['feed_url']} failed: {e}")
+                if mode == "unsubscribe":
+                    await self.write(delete_subscription, sub["id"])  # The hub's lease will run out anyway
+
+    async def run(self, lease, create_session, known_feeds, interval: float):
+        """Maintain subscriptions every `interval` seconds while holding the leader lease"""
+        while True:
+            if lease.is_leader:
+                try:
+                    async with create_session() as session:
+                        await self.maintain(session, known_feeds())
+                except Exception:
+                    print("Error maintaining WebSub subscriptions")
+                    traceback.print_exc()
+            await asyncio.sleep(interval)
@@ -0,0 +1,157 @@
+"""
+Local WebSub hub stand-in, for trying push ingestion end to end offline.
+
+It also hosts topics, so no real publisher is needed:
+
+    python websub_hub.py --port 8090
+    WEBSUB_CALLBACK_URL=http://localhost:8000 uvicorn service:app --port 8000
+    curl -X PUT --data-binary @feed.xml http://localhost:8090/topics/demo
+    curl -X POST http://localhost:8000/feeds -H 'content-type: application/json' \\
+         -d '{"url": "http://localhost:8090/topics/demo"}'
+    curl -X PUT --data-binary @feed-with-new-items.xml http://localhost:8090/topics/demo
+
+GET /topics/<name> serves the stored document with Link headers naming this
+hub and the topic, which is how the service discovers the hub. The hub
+accepts subscribe / unsubscribe requests on POST /, verifies intent with a
+challenge GET to the callback, and pushes every PUT (or publish ping,
+hub.mode=publish&hub.url=<topic>) to the topic's subscribers, signed with
+their secret as X-Hub-Signature: sha256=<hex>.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import secrets
+import time
+
+import aiohttp
+from aiohttp import web
+
+
+class LocalHub:
+    def __init__(self, base_url: str, max_lease_seconds: int = 86400):
+        self.base_url = base_url.rstrip("/")
+        self.max_lease_seconds = max_lease_seconds
+        self.subscriptions = {}  # (topic, callback) -> {"secret", "expires_at"}
+        self.topics = {}  # topic URL -> (body, content type)
+        self.session = None
+        self.tasks = set()
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/", self.handle_hub)
+        app.router.add_get("/topics/{name}", self.handle_get_topic)
+        app.router.add_put("/topics/{name}", self.handle_put_topic)
+        app.on_startup.append(self.start)
+        app.on_cleanup.append(self.stop)
+        return app
+
+    async def start(self, app):
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+
+    async def stop(self, app):
+        await self.session.close()
+
+    def topic_url(self, name: str):
+        return f"{self.base_url}/topics/{name}"
+
+    def spawn(self, coroutine):
+        # Hubs verify and deliver asynchronously, after answering the request
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def handle_hub(self, request):
+        form = await request.post()
+        mode = form.get("hub.mode")
+        if mode in ("subscribe", "unsubscribe"):
+            topic, callback = form.get("hub.topic"), form.get("hub.callback")
+            if not topic or not callback:
+                return web.Response(status=400, text="hub.topic and hub.callback are required")
+            lease_seconds = min(int(form.get("hub.lease_seconds") or self.max_lease_seconds), self.max_lease_seconds)
+            self.spawn(self.verify(mode, topic, callback, form.get("hub.secret"), lease_seconds))
+            return web.Response(status=202)
+        if mode == "publish":
+            topic = form.get("hub.url") or form.get("hub.topic")
+            if not topic:
+                return web.Response(status=400, text="hub.url is required")
+            self.spawn(self.publish_url(topic))
+            return web.Response(status=204)
+        return web.Response(status=400, text=f"Unsupported hub.mode {mode!r}")
+
+    async def verify(self, mode, topic, callback, secret, lease_seconds):
+        challenge = secrets.token_hex(16)
+        params = {"hub.mode": mode, "hub.topic": topic, "hub.challenge": challenge, "hub.lease_seconds": str(lease_seconds)}
+        try:
+            async with self.session.get(callback, params=params) as response:
+                confirmed = 200 <= response.status < 300 and (await response.text()) == challenge
+        except aiohttp.ClientError as e:
+            print(f"Verification of {callback} failed: {e}")
+            return
+        if not confirmed:
+            print(f"{callback} did not confirm {mode} of {topic}")
+        elif mode == "subscribe":
+            self.subscriptions[(topic, callback)] = {"secret": secret, "expires_at": time.time() + lease_seconds}
+            print(f"Subscribed {callback} to {topic} for {lease_seconds}s")
+        else:
+            self.subscriptions.pop((topic, callback), None)
+            print(f"Unsubscribed {callback} from {topic}")
+
+    async def handle_get_topic(self, request):
+        topic = self.topic_url(request.match_info["name"])
+        if topic not in self.topics:
+            raise web.HTTPNotFound()
+        body, content_type = self.topics[topic]
+        return web.Response(body=body, content_type=content_type, headers={
+            "Link": f'<{self.base_url}/>; rel="hub", <{topic}>; rel="self"',
+        })
+
+    async def handle_put_topic(self, request):
+        topic = self.topic_url(request.match_info["name"])
+        body = await request.read()
+        self.topics[topic] = (body, request.content_type or "application/rss+xml")
+        delivered = await self.distribute(topic, body, self.topics[topic][1])
+        return web.json_response({"topic": topic, "delivered": delivered})
+
+    async def publish_url(self, topic):
+        async with self.session.get(topic) as response:
+            body = await response.read()
+            content_type = response.content_type
+        await self.distribute(topic, body, content_type)
+
+    async def distribute(self, topic, body: bytes, content_type: str):
+        """POST content to every live subscriber of topic. Returns the number that accepted it"""
+        delivered = 0
+        for (subscribed_topic, callback), subscription in list(self.subscriptions.items()):
+            if subscribed_topic != topic:
+                continue
+            if subscription["expires_at"] < time.time():
+                del self.subscriptions[(subscribed_topic, callback)]
+                continue
+            headers = {"Content-Type": content_type, "Link": f'<{self.base_url}/>; rel="hub", <{topic}>; rel="self"'}
+            if subscription["secret"]:
+                digest = hmac.new(subscription["secret"].encode(), body, hashlib.sha256).hexdigest()
+                headers["X-Hub-Signature"] = f"sha256={digest}"
+            try:
+                async with self.session.post(callback, data=body, headers=headers) as response:
+                    if response.status == 410:
+                        del self.subscriptions[(subscribed_topic, callback)]  # Subscriber gave up on it
+                    elif 200 <= response.status < 300:
+                        delivered += 1
+            except aiohttp.ClientError as e:
+                print(f"Delivery to {callback} failed: {e}")
+        return delivered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--max-lease", type=int, default=86400, help="longest lease granted, in seconds")
+    args = parser.parse_args()
+    hub = LocalHub(f"http://{args.host}:{args.port}", args.max_lease)
+    web.run_app(hub.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
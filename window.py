@@ -0,0 +1,112 @@
+"""
+In-memory window of the newest entries, so "latest N" reads skip SQLite.
+
+The window keeps up to `size` entries in list shape, in two parallel lists
+sorted oldest to newest on published_parsed_tz (undated entries sort first,
+as NULLs do in the SQL ORDER BY). It is warmed from storage at startup,
+updated from new_entries events and reloaded after deletes, since removed
+entries leave room for older ones the window never held.
+
+A query is answered from the window when it can be answered exactly: the
+window holds every stored entry, or it found `limit` matches (anything older
+than the window can only rank below them). Otherwise, and while the window
+is (re)loading, query() returns None and the caller falls back to SQLite.
+"""
+import asyncio
+from bisect import bisect_right
+
+ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+def sort_key(entry):
+    return entry["published_parsed_tz"] or ""
+
+
+class EntryWindow:
+    def __init__(self, size: int):
+        self.size = size
+        self.keys = []  # sort_key per entry, ascending
+        self.entries = []
+        self.ids = set()
+        self.complete = False  # True when the window holds every stored entry
+        self.loaded = False
+        self.pending = None  # Entries added while a reload is reading storage
+        self.lock = asyncio.Lock()
+
+    def load(self, entries):
+        """Replace the contents with entries read newest first, at most size + 1 of them"""
+        entries = list(reversed(entries))
+        self.complete = len(entries) <= self.size
+        self.entries = entries[-self.size:] if self.size else []
+        self.keys = [sort_key(entry) for entry in self.entries]
+        self.ids = {entry["id"] for entry in self.entries}
+        self.loaded = True
+
+    async def reload(self, read):
+        """Reload from read(limit) in a thread, keeping entries added meanwhile.
+
+        Reads fall back to SQLite until it is done, so removed entries are
+        never served from the stale contents.
+        """
+        self.invalidate()
+        async with self.lock:
+            self.pending = []
+            try:
+                entries = await asyncio.to_thread(read, self.size + 1)
+                pending, self.pending = self.pending, None
+                self.load(entries)
+                self.add(pending)
+            finally:
+                self.pending = None
+
+    def add(self, entries):
+        """Insert newly stored entries, evicting the oldest beyond size"""
+        if self.pending is not None:
+            self.pending.extend(entries)
+            return
+        if not self.loaded:
+            return
+        for entry in entries:
+            if entry["id"] in self.ids:
+                continue
+            key = sort_key(entry)
+            if len(self.entries) >= self.size:
+                self.complete = False
+                if not self.entries or key < self.keys[0]:
+                    continue  # Older than everything kept
+                self.ids.discard(self.entries[0]["id"])
+                del self.keys[0], self.entries[0]
+            position = bisect_right(self.keys, key)
+            self.keys.insert(position, key)
+            self.entries.insert(position, entry)
+            self.ids.add(entry["id"])
+
+    def invalidate(self):
+        """Stop serving reads until the next reload"""
+        self.loaded = False
+
+    def query(self, keyword=None, limit: int = 100):
+        """Newest entries whose title contains keyword, or None if only storage can answer"""
+        if not self.loaded or limit < 0:
+            return None
+        if keyword and ("%" in keyword or "_" in keyword):
+            return None  # LIKE wildcards; leave those to SQLite
+        # Like SQLite's LIKE: case-insensitive for ASCII only
+        needle = keyword.translate(ASCII_LOWER) if keyword else None
+        found = []
+        for entry in reversed(self.entries):
+            if len(found) >= limit:
+                break
+            if needle is None or needle in (entry["title"] or "").translate(ASCII_LOWER):
+                found.append(entry)
+        if len(found) < limit and not self.complete:
+            return None
+        return found
+
+    def status(self):
+        return {
+            "size": self.size,
+            "entries": len(self.entries),
+            "loaded": self.loaded,
+            "complete": self.complete,
+            "oldest": self.keys[0] if self.keys else None,
+        }
@@ -0,0 +1,149 @@
+"""
+Group-commit writer: one thread per database file owns the only write
+connection and applies queued mutations in shared transactions.
+
+Callers submit a function taking the connection and await its result (or
+block on it from a thread, with submit()). The
+writer takes the first pending operation, keeps collecting for up to
+max_delay seconds or until max_rows rows are pending, then runs them all in
+one BEGIN IMMEDIATE ... COMMIT. Each operation gets its own savepoint, so a
+failing one (say an IntegrityError) only rolls back itself and raises in its
+caller. Writers never contend for the SQLite lock with each other, and a
+burst of small writes costs one fsync instead of one each.
+"""
+import asyncio
+import concurrent.futures
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+import metrics
+
+# Latency budget of a group commit: wait at most this long for more operations, or until this many rows
+WRITE_MAX_DELAY = float(os.getenv("WRITE_MAX_DELAY_MS", 5)) / 1000
+WRITE_MAX_ROWS = int(os.getenv("WRITE_MAX_ROWS", 500))
+
+Operation = namedtuple("Operation", ["fn", "args", "rows", "loop", "future"])
+
+
+class Writer:
+    def __init__(self, db_file: str, max_delay: float = WRITE_MAX_DELAY, max_rows: int = WRITE_MAX_ROWS):
+        self.db_file = db_file
+        self.max_delay = max_delay
+        self.max_rows = max_rows
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name=f"writer {self.db_file}", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    async def execute(self, fn, *args, rows: int = 1):
+        """Run fn(conn, *args) in the next group commit and return its result once committed"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.queue.put(Operation(fn, args, rows, loop, future))
+        return await future
+
+    def submit(self, fn, *args, rows: int = 1):
+        """Blocking execute() for worker threads, like the pruner's"""
+        self.start()
+        future = concurrent.futures.Future()
+        self.queue.put(Operation(fn, args, rows, None, future))
+        return future.result()
+
+    def run(self):
+        conn = sqlite3.connect(self.db_file, factory=metrics.TimedConnection, check_same_thread=False)
+        conn.isolation_level = None  # Transactions are managed here
+        try:
+            stopping = False
+            while not stopping:
+                operation = self.queue.get()
+                if operation is None:
+                    break
+                batch, rows = [operation], operation.rows
+                deadline = time.perf_counter() + self.max_delay
+                while rows < self.max_rows:
+                    timeout = deadline - time.perf_counter()
+                    if timeout <= 0:
+                        break
+                    try:
+                        operation = self.queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if operation is None:
+                        stopping = True
+                        break
+                    batch.append(operation)
+                    rows += operation.rows
+                self.commit(conn, batch, rows)
+        finally:
+            conn.close()
+
+    def commit(self, conn, batch, rows):
+        started = time.perf_counter()
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for operation in batch:
+                conn.execute("SAVEPOINT operation")
+                try:
+                    value = operation.fn(conn, *operation.args)
+                    conn.execute("RELEASE operation")
+                    results.append((operation, value, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO operation")
+                    conn.execute("RELEASE operation")
+                    results.append((operation, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(operation, None, e) for operation in batch]
+        metrics.write_batch_operations.observe(len(batch))
+        metrics.write_batch_rows.observe(rows)
+        metrics.write_commit_seconds.observe(time.perf_counter() - started)
+        for operation, value, error in results:
+            if operation.loop is None:
+                resolve(operation.future, value, error)  # submit(): a thread-safe future
+                continue
+            try:
+                operation.loop.call_soon_threadsafe(resolve, operation.future, value, error)
+            except RuntimeError:
+                pass  # The caller's event loop has closed
+
+
+def resolve(future, value, error):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(value)
+
+
+writers = {}
+
+
+def get_writer(db_file: str):
+    """The writer for db_file, so every mutation of one file goes through one queue"""
+    writer = writers.get(db_file)
+    if writer is None:
+        writer = writers[db_file] = Writer(db_file)
+    return writer
+
+
+def stop_writers():
+    for writer in writers.values():
+        writer.stop()